@@ -0,0 +1,178 @@
+# bandwidth.py
+# 跨 worker 带宽调度：主进程创建一个共享内存令牌桶（multiprocessing RawArray + Lock），
+# 各 worker 继承后 install()；下载与上传各自一份预算，直播优先于点播。
+# 下载侧接入 yt-dlp：ratelimit 取按权重分到的份额，progress_hooks 按实际字节扣共享令牌；
+# ffmpeg 分段直播录制不经过 yt-dlp，按分段文件的增长量记账（meter_bytes），点播据此让出带宽；
+# 上传侧 biliup_rs 是外部进程、无法逐字节限速，按 BW_UP_PER_JOB 把上传预算折算成并发名额。
+
+import os, time, multiprocessing as mp
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Optional
+from yt_dlp.utils import parse_bytes
+
+# -------- 可调参数 --------
+BW_DOWN            = parse_bytes(os.getenv("BW_DOWN", "0") or "0") or 0          # 下载总预算（字节/秒），0 为不限
+BW_UP              = parse_bytes(os.getenv("BW_UP", "0") or "0") or 0            # 上传总预算（字节/秒），0 为不限
+BW_UP_PER_JOB      = parse_bytes(os.getenv("BW_UP_PER_JOB", "4M") or "4M")       # 单个 biliup_rs 上传大致占用
+BW_LIVE_WEIGHT     = float(os.getenv("BW_LIVE_WEIGHT", "3"))                     # 直播与点播的份额权重比
+BW_LIVE_RESERVE    = 0.5        # 有直播在下载时，点播只能动用桶里高于该比例的令牌
+BW_BURST_SEC       = 2.0        # 桶容量 = 预算 × 该秒数
+BW_THROTTLE_DETECT = parse_bytes(os.getenv("BW_THROTTLE_DETECT", "100K") or "0") or 0   # yt-dlp 判定被限速、重新提取的速度下限
+# -------------------------
+
+DOWN, UP = 0, 1
+
+# 共享数组里每个方向的字段
+_TOKENS, _STAMP, _LIVE, _VOD, _WAIT_LIVE = range(5)
+_NF = 5
+
+class BandwidthGovernor:
+    """
+    必须在 fork worker 之前于主进程创建，并作为 Process 参数传给各 worker。
+    - consume(direction, n, live)：扣令牌（允许欠账），欠账期间阻塞调用方
+    - session(direction, live)：登记一个在途任务，决定份额；上传方向还会等待并发名额
+    - share(direction, live)：当前按权重分到的字节/秒
+    """
+
+    def __init__(self, down_bps: int = BW_DOWN, up_bps: int = BW_UP, burst_sec: float = BW_BURST_SEC):
+        self._rates = (float(down_bps or 0), float(up_bps or 0))
+        self._burst = burst_sec
+        self._lock = mp.Lock()
+        self._state = mp.RawArray("d", 2 * _NF)
+        now = time.monotonic()      # CLOCK_MONOTONIC 全机共享，跨进程可比
+        for d in (DOWN, UP):
+            self._state[d * _NF + _TOKENS] = self._rates[d] * burst_sec
+            self._state[d * _NF + _STAMP] = now
+
+    def _get(self, d: int, f: int) -> float:
+        return self._state[d * _NF + f]
+
+    def _add(self, d: int, f: int, v: float):
+        self._state[d * _NF + f] += v
+
+    def _refill(self, d: int) -> float:
+        """持锁调用：按流逝时间补令牌，返回当前余额。"""
+        rate = self._rates[d]
+        now = time.monotonic()
+        i = d * _NF
+        tokens = min(rate * self._burst, self._state[i + _TOKENS] + (now - self._state[i + _STAMP]) * rate)
+        self._state[i + _TOKENS] = tokens
+        self._state[i + _STAMP] = now
+        return tokens
+
+    def enabled(self, direction: int) -> bool:
+        return self._rates[direction] > 0
+
+    def share(self, direction: int, live: bool) -> Optional[int]:
+        rate = self._rates[direction]
+        if rate <= 0:
+            return None
+        with self._lock:
+            n_live, n_vod = self._get(direction, _LIVE), self._get(direction, _VOD)
+        total = max(1.0, n_live * BW_LIVE_WEIGHT + n_vod)
+        return int(rate * (BW_LIVE_WEIGHT if live else 1.0) / total)
+
+    def consume(self, direction: int, nbytes: int, live: bool, wait: bool = True):
+        rate = self._rates[direction]
+        if rate <= 0 or nbytes <= 0:
+            return
+        with self._lock:
+            self._refill(direction)
+            self._add(direction, _TOKENS, -float(nbytes))
+        if not wait:
+            return
+        floor_frac = 0.0 if live else BW_LIVE_RESERVE
+        while True:
+            with self._lock:
+                tokens = self._refill(direction)
+                reserve = floor_frac * rate * self._burst if self._get(direction, _LIVE) > 0 else 0.0
+            if tokens >= reserve:
+                return
+            time.sleep(min(1.0, (reserve - tokens) / rate))
+
+    def _up_slot_free(self, live: bool) -> bool:
+        active = self._get(UP, _LIVE) + self._get(UP, _VOD)
+        if active == 0:
+            return True     # 预算再小也至少放一个
+        if not live and self._get(UP, _WAIT_LIVE) > 0:
+            return False    # 有直播在等名额，点播让路
+        return (active + 1) * BW_UP_PER_JOB <= self._rates[UP]
+
+    @contextmanager
+    def session(self, direction: int, live: bool):
+        field = _LIVE if live else _VOD
+        if direction == UP and self.enabled(UP):
+            waited = False
+            while True:
+                with self._lock:
+                    if waited and live:
+                        self._add(UP, _WAIT_LIVE, -1)
+                    if self._up_slot_free(live):
+                        self._add(UP, field, 1)
+                        break
+                    if live:
+                        self._add(UP, _WAIT_LIVE, 1)
+                if not waited:
+                    print("[带宽] 上传名额已满，等待中…")
+                waited = True
+                time.sleep(1.0)
+        else:
+            with self._lock:
+                self._add(direction, field, 1)
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._add(direction, field, -1)
+
+# ---------------- 本进程接入 ----------------
+
+_gov: Optional[BandwidthGovernor] = None
+_live = False                   # 本进程当前下载任务的优先级（worker 一次只处理一个任务）
+_seen_bytes: Dict[str, int] = {}
+
+def install(gov: Optional[BandwidthGovernor]):
+    """worker 启动时调用；未安装时本模块所有接口都是空操作。"""
+    global _gov
+    _gov = gov
+
+def session(direction: int, live: bool):
+    global _live
+    if _gov is None:
+        return nullcontext()
+    if direction == DOWN:
+        _live = live
+    return _gov.session(direction, live)
+
+class _Meter:
+    """progress hook：把每个文件新增的字节数记到共享令牌桶上（分片并发时由多个线程回调）。"""
+
+    def __call__(self, d: Dict[str, Any]):
+        if _gov is None:
+            return
+        key = d.get("tmpfilename") or d.get("filename") or ""
+        got = d.get("downloaded_bytes") or 0
+        delta = got - _seen_bytes.get(key, 0)
+        if d.get("status") == "finished":
+            _seen_bytes.pop(key, None)
+        else:
+            _seen_bytes[key] = got
+        if delta > 0:
+            _gov.consume(DOWN, delta, _live)
+
+_meter = _Meter()
+
+def meter_bytes(nbytes: int):
+    """yt-dlp 之外的下载（ffmpeg 分段直播录制）按落盘增量扣共享令牌；只记账不等待，ffmpeg 本身无法被拖慢。"""
+    if _gov is not None:
+        _gov.consume(DOWN, nbytes, _live, wait=False)
+
+def ydl_opts(live: bool) -> Dict[str, Any]:
+    """合并进 YoutubeDL 选项：ratelimit = 当前份额；被调度压低时相应降低 throttledratelimit，免得误判 YouTube 限速。"""
+    if _gov is None or not _gov.enabled(DOWN):
+        return {}
+    share = _gov.share(DOWN, live)
+    opts: Dict[str, Any] = {"ratelimit": share, "progress_hooks": [_meter]}
+    if BW_THROTTLE_DETECT:
+        opts["throttledratelimit"] = min(BW_THROTTLE_DETECT, share // 4) or None
+    return opts
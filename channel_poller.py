@@ -0,0 +1,153 @@
+# channel_poller.py
+# 并发轮询引擎：线程池并发拉取各频道，限制在途请求数，并对同一 host 做礼貌限流；
+# 每轮打印耗时统计（总耗时 / 最慢频道 / 失败数），便于对比串行版本。
+# BurstWindow：每个频道一次请求拉取的条目窗口，频道连发时自动放大，安静后慢慢回落。
+
+import os, time, threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# -------- 可调参数 --------
+POLL_CONCURRENCY  = int(os.getenv("POLL_CONCURRENCY", "16"))       # 同时在途的频道请求上限
+POLL_PER_HOST     = int(os.getenv("POLL_PER_HOST", "16"))          # 同一 host 的并发上限
+POLL_HOST_GAP_SEC = float(os.getenv("POLL_HOST_GAP_SEC", "0.2"))   # 同一 host 两次请求起始的最小间隔
+POLL_WINDOW_MIN   = int(os.getenv("POLL_WINDOW_MIN", "3"))         # 每次拉取的最少条目数
+POLL_WINDOW_MAX   = int(os.getenv("POLL_WINDOW_MAX", "15"))        # 上限（与 RSS feed 的 15 条对齐）
+POLL_WINDOW_DECAY = 30                                             # 连续多少轮无新视频后窗口缩小一档
+POLL_GAP_FILL     = int(os.getenv("POLL_GAP_FILL", "50"))          # 拉到的条目全是新视频（停机 / 连发）时，补拉这么多条找回断档
+# -------------------------
+
+def _host_of(url: str) -> str:
+    try:
+        return (urlparse(url).hostname or "").lower()
+    except Exception:
+        return ""
+
+class _HostGate:
+    """按 host 限并发 + 错开起始时间，避免同一时刻对 YouTube 打出一排请求。"""
+
+    def __init__(self, per_host: int, gap_sec: float):
+        self._per_host = max(1, per_host)
+        self._gap = max(0.0, gap_sec)
+        self._lock = threading.Lock()
+        self._sems: Dict[str, threading.Semaphore] = {}
+        self._next_at: Dict[str, float] = {}
+
+    def _sem(self, host: str) -> threading.Semaphore:
+        with self._lock:
+            sem = self._sems.get(host)
+            if sem is None:
+                sem = self._sems[host] = threading.Semaphore(self._per_host)
+            return sem
+
+    def acquire(self, host: str):
+        self._sem(host).acquire()
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at.get(host, 0.0))
+            self._next_at[host] = start_at + self._gap
+        wait = start_at - now
+        if wait > 0:
+            time.sleep(wait)
+
+    def release(self, host: str):
+        self._sem(host).release()
+
+def diff_new(entries: List[Tuple[str, str, str]], is_seen: Callable[[str], bool]) -> List[Tuple[str, str, str]]:
+    """
+    entries 为 [(title, vid, vurl), ...]，最新在前；取到第一个已见 ID 为止，
+    返回这些新条目并按发布顺序（旧→新）排列。
+    """
+    new = []
+    for e in entries:
+        if is_seen(e[1]):
+            break
+        new.append(e)
+    new.reverse()
+    return new
+
+class BurstWindow:
+    """按频道记录拉取窗口：窗口内全是新视频说明可能漏了，下轮翻倍；连发 N 条则至少留 N+2。"""
+
+    def __init__(self, min_size: int = POLL_WINDOW_MIN, max_size: int = POLL_WINDOW_MAX,
+                 decay_after: int = POLL_WINDOW_DECAY):
+        self._min = max(1, min_size)
+        self._max = max(self._min, max_size)
+        self._decay_after = decay_after
+        self._lock = threading.Lock()
+        self._size: Dict[str, int] = {}
+        self._quiet: Dict[str, int] = {}
+
+    def size(self, url: str) -> int:
+        with self._lock:
+            return self._size.get(url, self._min)
+
+    def observe(self, url: str, new_count: int, fetched: int):
+        with self._lock:
+            cur = self._size.get(url, self._min)
+            if new_count == 0:
+                q = self._quiet.get(url, 0) + 1
+                if q >= self._decay_after and cur > self._min:
+                    cur, q = cur - 1, 0
+                self._quiet[url] = q
+            else:
+                self._quiet[url] = 0
+                if fetched and new_count >= fetched:
+                    cur = cur * 2
+                if new_count >= 2:
+                    cur = max(cur, new_count + 2)
+            cur = min(self._max, max(self._min, cur))
+            if cur != self._size.get(url, self._min):
+                print(f"[轮询] 窗口调整 {url} -> {cur}")
+            self._size[url] = cur
+
+class ChannelPoller:
+    """
+    fetch(url) 在线程池中并发执行；sweep() 按输入顺序返回 (url, result, error)。
+    - max_in_flight: 线程池大小，即同时在途的频道数
+    - per_host / host_gap_sec: 同一 host 的并发上限与起始间隔
+    """
+
+    def __init__(self, fetch: Callable[[str], Any],
+                 max_in_flight: int = POLL_CONCURRENCY,
+                 per_host: int = POLL_PER_HOST,
+                 host_gap_sec: float = POLL_HOST_GAP_SEC):
+        self._fetch = fetch
+        self._gate = _HostGate(per_host, host_gap_sec)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="poll")
+
+    def _timed_fetch(self, url: str) -> Tuple[Any, Optional[BaseException], float]:
+        host = _host_of(url)
+        self._gate.acquire(host)
+        t0 = time.monotonic()
+        try:
+            return self._fetch(url), None, time.monotonic() - t0
+        except Exception as e:
+            return None, e, time.monotonic() - t0
+        finally:
+            self._gate.release(host)
+
+    def sweep(self, urls: Iterable[str]) -> List[Tuple[str, Any, Optional[BaseException]]]:
+        # 订阅清单里可能有重复项，一轮只拉一次
+        uniq = list(dict.fromkeys(urls))
+        t0 = time.monotonic()
+        futs = [(u, self._pool.submit(self._timed_fetch, u)) for u in uniq]
+
+        out: List[Tuple[str, Any, Optional[BaseException]]] = []
+        slowest_url, slowest_sec, failed = "", 0.0, 0
+        for u, fut in futs:
+            result, err, cost = fut.result()
+            if err is not None:
+                failed += 1
+            if cost > slowest_sec:
+                slowest_url, slowest_sec = u, cost
+            out.append((u, result, err))
+
+        total = time.monotonic() - t0
+        print(f"[轮询] 本轮 {len(uniq)} 个频道，耗时 {total:.1f}s"
+              f"（最慢 {slowest_sec:.1f}s: {slowest_url}，失败 {failed}）")
+        return out
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
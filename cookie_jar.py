@@ -0,0 +1,163 @@
+# cookie_jar.py
+# 共享 cookies：浏览器 cookies 只导出一次为 Netscape 文件，所有进程只读共享；
+# 文件过期（TTL）或浏览器 cookies 库有更新（且导出文件已用满 COOKIE_MIN_AGE_SEC）时才重新导出。
+# 替代每次 YoutubeDL 都 cookiesfrombrowser（每次都要打开并解密 Firefox 的 SQLite 库）。
+# 导出的是解密后的明文 cookies：默认放在仓库外的用户缓存目录，只保留 COOKIE_DOMAINS 下的条目，权限 0600。
+# 浏览器库几乎每分钟都在变（任何网站的 cookie），重导出的内容没变时沿用原文件与原 cookie 对象，
+# 对象身份不变，ydl_pool 按选项分组的键就不变，池里的实例继续复用。
+
+import os, glob, time, fcntl, threading
+from typing import Any, Dict, Iterator, Optional
+
+# -------- 可调参数 --------
+COOKIE_BROWSER     = os.getenv("COOKIE_BROWSER", "firefox")
+COOKIE_EXPORT_PATH = os.getenv("COOKIE_EXPORT_PATH", os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "ytb2bili", "youtube_cookies.txt"))
+COOKIE_DOMAINS     = [d.strip().lstrip(".") for d in os.getenv("COOKIE_DOMAINS", "youtube.com,google.com").split(",")
+                      if d.strip()]                                      # 只导出这些域（含子域）的 cookies
+COOKIE_TTL_SEC     = int(os.getenv("COOKIE_TTL_SEC", str(6 * 3600)))   # 导出文件最长使用时间
+COOKIE_MIN_AGE_SEC = int(os.getenv("COOKIE_MIN_AGE_SEC", "3600"))       # 浏览器库有更新时，导出文件至少用这么久再重导
+COOKIE_CHECK_SEC   = 30                                                  # 同一进程内多久 stat 一次
+# -------------------------
+
+# 浏览器 cookies 库位置（用于判断是否需要重新导出）
+_BROWSER_DB_GLOBS = {
+    "firefox": ["~/.mozilla/firefox/*/cookies.sqlite", "~/snap/firefox/common/.mozilla/firefox/*/cookies.sqlite"],
+    "chrome":  ["~/.config/google-chrome/*/Cookies"],
+    "chromium": ["~/.config/chromium/*/Cookies"],
+}
+
+def _browser_db_mtime(browser: str) -> float:
+    latest = 0.0
+    for patt in _BROWSER_DB_GLOBS.get(browser, []):
+        for p in glob.glob(os.path.expanduser(patt)):
+            try:
+                latest = max(latest, os.path.getmtime(p))
+            except OSError:
+                pass
+    return latest
+
+def _wanted(domain: str) -> bool:
+    d = domain.lstrip(".")
+    return any(d == x or d.endswith("." + x) for x in COOKIE_DOMAINS)
+
+class _ReadOnlyCookies:
+    """
+    以文件对象形式交给 yt-dlp 的 cookiefile：可被任意多个 YoutubeDL 反复读取，
+    YoutubeDL.close() 时的回写被吞掉，共享文件始终只读。
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self._lines = text.splitlines(keepends=True)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._lines)
+
+    def truncate(self, *_):
+        return 0
+
+    def write(self, s: str) -> int:
+        return len(s)
+
+def _same_content(a: str, b: str) -> bool:
+    """两个导出文件的 cookie 行是否一致（忽略 yt-dlp 写入的注释头）。"""
+    def _rows(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return sorted(ln for ln in f if ln.strip() and (not ln.startswith("#") or ln.startswith("#HttpOnly_")))
+    try:
+        return _rows(a) == _rows(b)
+    except OSError:
+        return False
+
+class CookieJarService:
+    def __init__(self, browser: str = COOKIE_BROWSER, path: str = COOKIE_EXPORT_PATH,
+                 ttl_sec: int = COOKIE_TTL_SEC):
+        self._browser = browser
+        self._path = path
+        self._ttl = ttl_sec
+        self._lock = threading.Lock()
+        self._loaded_mtime = 0.0
+        self._checked_at = 0.0
+        self._failed_at = 0.0       # 上次导出 / 读取失败的时刻；冷却期内直接退回，不再抢锁重试
+        self._cookies: Optional[_ReadOnlyCookies] = None
+
+    def _stale(self) -> bool:
+        try:
+            mtime = os.path.getmtime(self._path)
+        except OSError:
+            return True
+        age = time.time() - mtime
+        if age > self._ttl:
+            return True
+        return age > COOKIE_MIN_AGE_SEC and _browser_db_mtime(self._browser) > mtime
+
+    def _export(self):
+        """文件锁内导出（多个 worker 同时发现过期时只导出一次），写临时文件后原子替换。"""
+        from yt_dlp.cookies import extract_cookies_from_browser
+        d = os.path.dirname(os.path.abspath(self._path))
+        os.makedirs(d, exist_ok=True)
+        with open(self._path + ".lock", "w") as lk:
+            fcntl.flock(lk, fcntl.LOCK_EX)
+            try:
+                if not self._stale():
+                    return      # 别的进程刚导出过
+                jar = extract_cookies_from_browser(self._browser)
+                for c in list(jar):
+                    if not _wanted(c.domain):
+                        jar.clear(c.domain, c.path, c.name)
+                tmp = f"{self._path}.{os.getpid()}.tmp"
+                jar.save(tmp, ignore_discard=True, ignore_expires=True)
+                os.chmod(tmp, 0o600)
+                if _same_content(tmp, self._path):
+                    # 内容没变：只续期原文件，读到的 cookie 对象保持不变
+                    os.remove(tmp)
+                    os.utime(self._path)
+                    return
+                os.replace(tmp, self._path)
+                print(f"[Cookies] 已从 {self._browser} 导出 {len(jar)} 条 → {self._path}")
+            finally:
+                fcntl.flock(lk, fcntl.LOCK_UN)
+
+    def _refresh(self, path: str, export: bool):
+        now = time.time()
+        if self._cookies is not None and now - self._checked_at < COOKIE_CHECK_SEC:
+            return
+        self._checked_at = now
+        if export and self._stale():
+            self._export()
+        mtime = os.path.getmtime(path)
+        if self._cookies is None or mtime != self._loaded_mtime:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            if self._cookies is None or text != self._cookies.text:
+                self._cookies = _ReadOnlyCookies(text)
+            self._loaded_mtime = mtime
+
+    def ydl_opts(self) -> Dict[str, Any]:
+        """合并进 YoutubeDL 选项；导出失败时退回 cookiesfrombrowser。"""
+        # 手动提供的 cookies 文件（YTDLP_COOKIES）优先，同样只读共享、不导出
+        user_file = os.getenv("YTDLP_COOKIES")
+        use_user = bool(user_file and os.path.exists(user_file))
+        with self._lock:
+            if self._cookies is None and time.time() - self._failed_at < COOKIE_CHECK_SEC:
+                return {"cookiesfrombrowser": (self._browser,)}
+            try:
+                self._refresh(user_file if use_user else self._path, export=not use_user)
+                return {"cookiefile": self._cookies}
+            except Exception as e:
+                self._failed_at = time.time()
+                if self._cookies is not None:
+                    print(f"[Cookies] 导出/读取失败，继续用上次的 cookies：{e}")
+                    return {"cookiefile": self._cookies}
+                print(f"[Cookies] 导出/读取失败，{COOKIE_CHECK_SEC}s 内退回 cookiesfrombrowser：{e}")
+                return {"cookiesfrombrowser": (self._browser,)}
+
+_service: Optional[CookieJarService] = None
+
+def cookie_opts() -> Dict[str, Any]:
+    """本进程共享的 CookieJarService（首次调用时创建）。"""
+    global _service
+    if _service is None:
+        _service = CookieJarService()
+    return _service.ydl_opts()
@@ -0,0 +1,95 @@
+# cover_art.py
+# 封面流水线：直接按 info 里的缩略图 URL 拉进内存（与视频下载并行），Pillow 解码一次，
+# 居中裁成 B 站封面比例、缩到尺寸上限内，编码成体积受控的 JPEG（或 PNG）写到暂存目录。
+# 取代 writethumbnail + FFmpegThumbnailsConvertor（每个任务起一次 ffmpeg）再 webp→png 的落盘转换。
+
+import io, os, threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import requests
+from PIL import Image
+
+# -------- 可调参数 --------
+COVER_SIZE       = tuple(int(x) for x in os.getenv("COVER_SIZE", "1920x1080").lower().split("x"))  # 输出尺寸上限（同时决定裁剪比例）
+COVER_MIN_WIDTH  = int(os.getenv("COVER_MIN_WIDTH", "960"))          # 原图更小时放大到该宽度
+COVER_FORMAT     = os.getenv("COVER_FORMAT", "jpg")                 # jpg / png
+COVER_MAX_BYTES  = int(os.getenv("COVER_MAX_BYTES", str(2 << 20)))   # 编码后体积上限，JPEG 逐步降质量压到以内
+COVER_TIMEOUT    = 15
+# -------------------------
+
+_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cover")
+_local = threading.local()
+
+def _session() -> requests.Session:
+    s = getattr(_local, "session", None)
+    if s is None:
+        s = requests.Session()
+        s.trust_env = False         # 与下载一致，不走任何代理
+        _local.session = s
+    return s
+
+def thumbnail_urls(info: Dict[str, Any]) -> List[str]:
+    """info 里的缩略图 URL，最好的在前（preference，再按像素数）。"""
+    thumbs = [t for t in (info.get("thumbnails") or []) if t.get("url")]
+    thumbs.sort(key=lambda t: (t.get("preference") or 0, (t.get("width") or 0) * (t.get("height") or 0)),
+                reverse=True)
+    urls = [t["url"] for t in thumbs]
+    if info.get("thumbnail") and info["thumbnail"] not in urls:
+        urls.append(info["thumbnail"])
+    return urls
+
+def render(data: bytes, size=COVER_SIZE, fmt: str = COVER_FORMAT) -> bytes:
+    """解码 → 居中裁到 size 的比例 → 缩放（不超过 size，不小于 COVER_MIN_WIDTH）→ 编码。"""
+    im = Image.open(io.BytesIO(data))
+    im.load()
+    im = im.convert("RGB")
+    tw, th = size
+    w, h = im.size
+    ratio = tw / th
+    if w / h > ratio:
+        cw, ch = int(h * ratio), h
+    else:
+        cw, ch = w, int(w / ratio)
+    left, top = (w - cw) // 2, (h - ch) // 2
+    im = im.crop((left, top, left + cw, top + ch))
+    out_w = max(min(cw, tw), min(COVER_MIN_WIDTH, tw))
+    if out_w != cw:
+        im = im.resize((out_w, int(round(out_w / ratio))), Image.LANCZOS)
+
+    buf = io.BytesIO()
+    if fmt == "png":
+        im.save(buf, "PNG", optimize=True)
+        return buf.getvalue()
+    for q in (90, 85, 80, 70, 60):
+        buf.seek(0)
+        buf.truncate()
+        im.save(buf, "JPEG", quality=q, optimize=True, progressive=True)
+        if buf.tell() <= COVER_MAX_BYTES:
+            break
+    return buf.getvalue()
+
+def cover_name(fmt: str = COVER_FORMAT) -> str:
+    return "cover.png" if fmt == "png" else "cover.jpg"
+
+def fetch_cover(info: Dict[str, Any], work_dir: str) -> Optional[str]:
+    """按优先级逐个尝试缩略图 URL（maxresdefault 常 404），成功返回封面文件路径。"""
+    dest = os.path.join(work_dir, cover_name())
+    for url in thumbnail_urls(info):
+        try:
+            r = _session().get(url, timeout=COVER_TIMEOUT)
+            if r.status_code != 200 or not r.content:
+                continue
+            out = render(r.content)
+        except Exception as e:
+            print(f"[封面] {url} 处理失败：{e}")
+            continue
+        tmp = dest + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(out)
+        os.replace(tmp, dest)
+        print(f"[封面] {os.path.basename(dest)} {len(out) / 1024:.0f} KiB ← {url}")
+        return dest
+    return None
+
+def fetch_cover_async(info: Dict[str, Any], work_dir: str) -> "Future[Optional[str]]":
+    return _pool.submit(fetch_cover, info, work_dir)
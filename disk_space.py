@@ -0,0 +1,144 @@
+# disk_space.py
+# 磁盘空间准入：下载前按格式元数据预估的体积登记“预留”，所有进程（各 worker / main.py）共用一份账本；
+# 卷上“已用 + 他人未落盘的预留 + 本次预留”超过高水位时等待，超时则推迟任务；清理阶段释放预留。
+# 账本是一个目录，每个进程一个 <pid>.json（flock 保证检查 + 登记原子），进程崩溃后按 pid 失效自动忽略。
+
+import os, json, time, fcntl, shutil
+from typing import Dict, List, Optional
+
+# -------- 可调参数 --------
+DISK_LEDGER_DIR       = os.getenv("DISK_LEDGER_DIR", ".disk_reservations")   # 不能放在 downloads 里（会被清空）
+DISK_HIGH_WATER       = float(os.getenv("DISK_HIGH_WATER", "0.90"))         # 卷使用率高水位
+DISK_MIN_FREE         = int(os.getenv("DISK_MIN_FREE", str(2 << 30)))        # 预留后至少还剩这么多
+DISK_WAIT_SEC         = int(os.getenv("DISK_WAIT_SEC", "600"))              # 空间不足时最多等待多久再推迟
+DISK_UNKNOWN_RESERVE  = int(os.getenv("DISK_UNKNOWN_RESERVE", str(2 << 30)))  # 体积未知时的预留
+DISK_MERGE_FACTOR     = 2.0     # 音视频分开下载再合并：合并时分轨与成品同时在盘上
+DISK_EXTRA_BYTES      = 64 << 20  # info.json / 缩略图 / 封面等杂项
+# -------------------------
+
+class DiskSpaceDeferred(RuntimeError):
+    """等待 DISK_WAIT_SEC 后空间仍不足；任务应重新排队而不是判失败。"""
+
+def reserve_bytes(size: Optional[int], merged: bool) -> int:
+    """由预估体积换算出需要预留的字节数。"""
+    if size is None:
+        return DISK_UNKNOWN_RESERVE
+    return int(size * (DISK_MERGE_FACTOR if merged else 1.0)) + DISK_EXTRA_BYTES
+
+def _du(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class DiskReservations:
+    def __init__(self, ledger_dir: str = DISK_LEDGER_DIR):
+        self._dir = ledger_dir
+        os.makedirs(ledger_dir, exist_ok=True)
+        self.pid = os.getpid()
+        self._mine = os.path.join(ledger_dir, f"{self.pid}.json")
+
+    def _entries(self) -> List[Dict]:
+        """持锁调用：其他存活进程的预留；死进程的条目顺手删掉。"""
+        out = []
+        for name in os.listdir(self._dir):
+            if not name.endswith(".json"):
+                continue
+            p = os.path.join(self._dir, name)
+            if p == self._mine:
+                continue
+            try:
+                with open(p, "r", encoding="utf-8") as f:
+                    e = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not _alive(int(e.get("pid", 0))):
+                try: os.remove(p)
+                except OSError: pass
+                continue
+            out.append(e)
+        return out
+
+    def outstanding(self) -> int:
+        """其他进程已预留但尚未写到盘上的字节数。"""
+        return sum(max(0, int(e["bytes"]) - _du(e["dir"])) for e in self._entries())
+
+    def _fits(self, work_dir: str, nbytes: int):
+        usage = shutil.disk_usage(work_dir)
+        free_after = usage.free - self.outstanding() - nbytes
+        used_frac = (usage.total - free_after) / usage.total if usage.total else 1.0
+        return free_after >= DISK_MIN_FREE and used_frac <= DISK_HIGH_WATER, free_after, used_frac
+
+    def reserve(self, work_dir: str, nbytes: int, wait_sec: int = DISK_WAIT_SEC):
+        """登记预留（覆盖本进程旧的预留）；空间不足时每 10 秒重试，超时抛 DiskSpaceDeferred。"""
+        os.makedirs(work_dir, exist_ok=True)
+        deadline = time.time() + wait_sec
+        warned = False
+        while True:
+            with open(os.path.join(self._dir, ".lock"), "w") as lk:
+                fcntl.flock(lk, fcntl.LOCK_EX)
+                try:
+                    self._release_locked()
+                    ok, free_after, used_frac = self._fits(work_dir, nbytes)
+                    if ok:
+                        tmp = self._mine + ".tmp"
+                        with open(tmp, "w", encoding="utf-8") as f:
+                            json.dump({"pid": os.getpid(), "dir": os.path.abspath(work_dir),
+                                       "bytes": int(nbytes), "at": time.time()}, f)
+                        os.replace(tmp, self._mine)
+                        print(f"[磁盘] 预留 {nbytes / (1 << 30):.2f} GiB，预留后剩余 {free_after / (1 << 30):.1f} GiB")
+                        return
+                finally:
+                    fcntl.flock(lk, fcntl.LOCK_UN)
+            if time.time() >= deadline:
+                raise DiskSpaceDeferred(
+                    f"磁盘空间不足：需预留 {nbytes / (1 << 30):.2f} GiB，预留后使用率 {used_frac:.0%}，已推迟")
+            if not warned:
+                print(f"[磁盘] 超过高水位（预留后使用率 {used_frac:.0%}），等待其他任务释放空间…")
+                warned = True
+            time.sleep(10)
+
+    def _release_locked(self):
+        try:
+            os.remove(self._mine)
+        except FileNotFoundError:
+            pass
+
+    def release(self):
+        with open(os.path.join(self._dir, ".lock"), "w") as lk:
+            fcntl.flock(lk, fcntl.LOCK_EX)
+            try:
+                self._release_locked()
+            finally:
+                fcntl.flock(lk, fcntl.LOCK_UN)
+
+_ledger: Optional[DiskReservations] = None
+
+def _get() -> DiskReservations:
+    """本进程的账本句柄（首次调用时创建；fork 后 pid 变了要重建）。"""
+    global _ledger
+    if _ledger is None or _ledger.pid != os.getpid():
+        _ledger = DiskReservations()
+    return _ledger
+
+def reserve(work_dir: str, nbytes: int, wait_sec: int = DISK_WAIT_SEC):
+    _get().reserve(work_dir, nbytes, wait_sec)
+
+def release():
+    try:
+        _get().release()
+    except Exception as e:
+        print(f"[磁盘] 释放预留失败（忽略）：{e}")
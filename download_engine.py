@@ -0,0 +1,215 @@
+# download_engine.py
+# 下载引擎参数层：分片并发、可选 aria2c（连接数）、http_chunk_size、缓冲区大小，
+# 按协议（https 直链 / m3u8 分片 / 直播）给出默认值，合并进 yt-dlp 选项。
+# 测速：python download_engine.py bench [MB]  —— 起本地 HTTP 夹具，逐个配置报告 MB/s。
+
+import os, sys, time, shutil, tempfile, threading
+from dataclasses import dataclass, replace
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from yt_dlp.utils import parse_bytes
+
+# -------- 可调参数 --------
+DL_FRAGMENTS      = int(os.getenv("DL_FRAGMENTS", "8"))          # VOD 的 DASH/HLS 同时下载的分片数
+DL_LIVE_FRAGMENTS = int(os.getenv("DL_LIVE_FRAGMENTS", "2"))     # 直播分片并发（跟着直播边缘走，开大无益）
+DL_EXTERNAL       = os.getenv("DL_EXTERNAL", "native")           # VOD 下载器：native / aria2c（找不到 aria2c 自动退回 native）
+DL_ARIA2_CONNS    = int(os.getenv("DL_ARIA2_CONNS", "8"))        # aria2c 单文件连接数（-x / -s）
+DL_HTTP_CHUNK     = parse_bytes(os.getenv("DL_HTTP_CHUNK", "10M") or "0") or None   # 直链分块请求大小，绕开单连接限速
+DL_BUFFER         = parse_bytes(os.getenv("DL_BUFFER", "1M") or "0") or None        # 读缓冲（固定大小，不自动缩放）
+# -------------------------
+
+@dataclass(frozen=True)
+class EngineSettings:
+    fragments: int = 1                  # concurrent_fragment_downloads
+    external: str = "native"            # native / aria2c
+    connections: int = 1                # 仅 aria2c 有效
+    http_chunk: Optional[int] = None    # 仅 native 直链有效
+    buffersize: Optional[int] = None
+
+    def label(self) -> str:
+        parts = [self.external]
+        if self.external != "native":
+            parts.append(f"x{self.connections}")
+        if self.fragments > 1:
+            parts.append(f"frag={self.fragments}")
+        if self.http_chunk:
+            parts.append(f"chunk={self.http_chunk >> 20}M")
+        return " ".join(parts)
+
+PROFILES: Dict[str, EngineSettings] = {
+    "https": EngineSettings(external=DL_EXTERNAL, connections=DL_ARIA2_CONNS,
+                            http_chunk=DL_HTTP_CHUNK, buffersize=DL_BUFFER),
+    "m3u8":  EngineSettings(fragments=DL_FRAGMENTS, external=DL_EXTERNAL, connections=DL_ARIA2_CONNS,
+                            buffersize=DL_BUFFER),
+    # 直播：yt-dlp 本身只允许 native / ffmpeg，外部下载器不参与
+    "live":  EngineSettings(fragments=DL_LIVE_FRAGMENTS, buffersize=DL_BUFFER),
+}
+
+_warned = set()
+
+def _usable(name: str) -> str:
+    if name == "native" or shutil.which(name):
+        return name
+    if name not in _warned:
+        _warned.add(name)
+        print(f"[警告] 未找到外部下载器 {name}，退回 native")
+    return "native"
+
+def _aria2_args(connections: int) -> List[str]:
+    n = str(max(1, min(16, connections)))
+    return ["-x", n, "-s", n, "-k", "1M", "--file-allocation=none"]
+
+def _common(s: EngineSettings) -> Dict[str, Any]:
+    opts: Dict[str, Any] = {"concurrent_fragment_downloads": max(1, s.fragments)}
+    if s.buffersize:
+        opts["buffersize"] = s.buffersize
+        opts["noresizebuffer"] = True
+    return opts
+
+def settings_opts(s: EngineSettings) -> Dict[str, Any]:
+    """单个配置 → yt-dlp 选项（所有协议同一下载器）；测速与直播用。"""
+    ext = _usable(s.external)
+    opts = _common(s)
+    opts["external_downloader"] = {"default": ext}
+    if ext == "aria2c":
+        opts["external_downloader_args"] = {"aria2c": _aria2_args(s.connections)}
+    elif s.http_chunk:
+        opts["http_chunk_size"] = s.http_chunk
+    return opts
+
+def engine_opts(is_live: bool = False) -> Dict[str, Any]:
+    """合并进 YoutubeDL 选项：直播用 live 档；否则 https 直链与 m3u8 分片各按自己的档位选下载器。"""
+    if is_live:
+        return settings_opts(PROFILES["live"])
+    https, hls = PROFILES["https"], PROFILES["m3u8"]
+    ext_http, ext_hls = _usable(https.external), _usable(hls.external)
+    opts = _common(hls)
+    # yt-dlp 按简化协议名（http / m3u8 / dash）选下载器
+    opts["external_downloader"] = {"default": "native", "http": ext_http, "m3u8": ext_hls}
+    if "aria2c" in (ext_http, ext_hls):
+        opts["external_downloader_args"] = {"aria2c": _aria2_args(max(https.connections, hls.connections))}
+    if ext_http == "native" and https.http_chunk:
+        opts["http_chunk_size"] = https.http_chunk
+    return opts
+
+# ---------------- 测速 ----------------
+
+class _RangeHandler(SimpleHTTPRequestHandler):
+    """支持单段 Range 的静态文件服务（http_chunk_size / aria2c 分段都依赖 Range）。"""
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        rng = self.headers.get("Range", "")
+        if not rng.startswith("bytes=") or not os.path.isfile(path):
+            return super().do_GET()
+        size = os.path.getsize(path)
+        a, _, b = rng[6:].split(",")[0].partition("-")
+        start = int(a) if a else max(0, size - int(b))
+        end = min(int(b), size - 1) if (a and b) else size - 1
+        if start >= size:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return
+        self.send_response(206)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        with open(path, "rb") as f:
+            f.seek(start)
+            left = end - start + 1
+            while left > 0:
+                buf = f.read(min(1 << 20, left))
+                if not buf:
+                    break
+                self.wfile.write(buf)
+                left -= len(buf)
+
+def _make_fixture(root: str, mb: int, seg_mb: int = 2):
+    """blob.bin：单文件直链；index.m3u8 + seg_*.ts：HLS 分片，总量相同。"""
+    chunk = os.urandom(1 << 20)
+    with open(os.path.join(root, "blob.bin"), "wb") as f:
+        for _ in range(mb):
+            f.write(chunk)
+    n = max(1, mb // seg_mb)
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4", "#EXT-X-MEDIA-SEQUENCE:0"]
+    for i in range(n):
+        with open(os.path.join(root, f"seg_{i}.ts"), "wb") as f:
+            for _ in range(seg_mb):
+                f.write(chunk)
+        lines += ["#EXTINF:4.0,", f"seg_{i}.ts"]
+    lines.append("#EXT-X-ENDLIST")
+    with open(os.path.join(root, "index.m3u8"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+def _bench_cases() -> List[tuple]:
+    base_https, base_hls = PROFILES["https"], PROFILES["m3u8"]
+    cases = [
+        ("https", replace(base_https, external="native", http_chunk=None)),
+        ("https", replace(base_https, external="native", http_chunk=DL_HTTP_CHUNK or (10 << 20))),
+        ("m3u8", replace(base_hls, external="native", fragments=1)),
+        ("m3u8", replace(base_hls, external="native", fragments=4)),
+        ("m3u8", replace(base_hls, external="native", fragments=max(DL_FRAGMENTS, 8))),
+    ]
+    if shutil.which("aria2c"):
+        cases += [
+            ("https", replace(base_https, external="aria2c", connections=4)),
+            ("https", replace(base_https, external="aria2c", connections=DL_ARIA2_CONNS)),
+            ("m3u8", replace(base_hls, external="aria2c", connections=DL_ARIA2_CONNS)),
+        ]
+    else:
+        print("[测速] 未安装 aria2c，跳过 aria2c 配置")
+    return list(dict.fromkeys(cases))
+
+def bench(mb: int = 64) -> List[tuple]:
+    """对本地夹具逐个配置下载一遍，返回 [(协议, 配置说明, MB/s), ...]。"""
+    import yt_dlp
+    root = tempfile.mkdtemp(prefix="dl-bench-")
+    out_dir = tempfile.mkdtemp(prefix="dl-bench-out-")
+    _make_fixture(root, mb)
+    handler = lambda *a, **kw: _RangeHandler(*a, directory=root, **kw)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    results = []
+    try:
+        for proto, s in _bench_cases():
+            info = {
+                "id": "bench", "title": "bench", "ext": "mp4",
+                "url": f"{base}/blob.bin" if proto == "https" else f"{base}/index.m3u8",
+                "protocol": "http" if proto == "https" else "m3u8_native",
+            }
+            dest = os.path.join(out_dir, "out.mp4")
+            opts = {**settings_opts(s), "quiet": True, "noprogress": True, "proxy": ""}
+            t0 = time.perf_counter()
+            try:
+                with yt_dlp.YoutubeDL(opts) as ydl:
+                    ydl.dl(dest, info)
+                dt = time.perf_counter() - t0
+                got = os.path.getsize(dest) / (1 << 20)
+                rate = got / dt if dt > 0 else 0.0
+                print(f"[测速] {proto:<5} {s.label():<28} {got:6.0f} MiB  {dt:6.2f}s  {rate:8.1f} MB/s")
+                results.append((proto, s.label(), rate))
+            except Exception as e:
+                print(f"[测速] {proto:<5} {s.label():<28} 失败：{e}")
+            finally:
+                for p in os.listdir(out_dir):
+                    os.remove(os.path.join(out_dir, p))
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "bench":
+        bench(int(sys.argv[2]) if len(sys.argv) >= 3 else 64)
+    else:
+        print("用法：python download_engine.py bench [MB]")
@@ -1,16 +1,32 @@
 # download_video.py
-# 功能：多客户端尝试取高清；支持直播录制“限时 + 进度钩子”双保险；下载后做帧数熔断；固化输出名；缩略图处理
+# 功能：多客户端并发预检取高清（先到先得，记住各频道胜出客户端）；支持直播录制“限时 + 进度钩子”双保险；下载后做帧数熔断；固化输出名；缩略图处理
 # 本版：彻底禁用一切代理（环境变量与 yt-dlp 内部）。保留 IPv4 强制与其余逻辑。
 
-import os, glob, json, subprocess
+import os, re, glob, json, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional, List, Dict, Any
-import yt_dlp
 from yt_dlp.utils import DownloadError
-from PIL import Image
+
+from cookie_jar import cookie_opts
+from ydl_pool import lease as ydl_lease
+from download_engine import engine_opts
+import bandwidth
+import disk_space
+import page_cache
+import cover_art
+import live_recorder
+from seen_store import SeenStore
+import media_probe
 
 # -------- 可调参数 --------
-HD_MIN_HEIGHT = 720          # 认为高清的最低分辨率
-MAX_FRAMES    = 200_000      # 帧数熔断阈值，超过判定为长流/异常，放弃
+HD_MIN_HEIGHT      = 720        # 认为高清的最低分辨率
+MAX_FRAMES         = 200_000    # 帧数熔断阈值，超过判定为长流/异常，放弃
+FRAME_EST_MARGIN   = 0.05       # 元数据估算离阈值不足 5% 时改为精确计数
+FRAME_COUNT_DECODE = os.getenv("FRAME_COUNT_DECODE", "0") == "1"   # 允许最后一档完整解码计数
+PROBE_FANOUT       = int(os.getenv("PROBE_FANOUT", "3"))           # 同时预检的客户端数；1 即逐个串行
+MAX_DOWNLOAD_BYTES = int(os.getenv("MAX_DOWNLOAD_BYTES", str(8 << 30)))  # 预估体积上限（字节），0 为不限
+URL_EXPIRY_MARGIN  = 300        # 预检 info 里的签名 URL 距过期不足该秒数时，改为重新提取
+LIVE_FROM_START_MIN_SEC = int(os.getenv("LIVE_FROM_START_MIN_SEC", "1800"))  # 允许从头录制时，开播超过该秒数（真有积压）才切到 live_from_start
 # -------------------------
 
 def _disable_env_proxies():
@@ -24,41 +40,43 @@ def _disable_env_proxies():
 _disable_env_proxies()
 
 class FrameOverflowError(RuntimeError):
-    """下载完成后检测到帧数超过阈值，触发熔断。"""
+    """帧数超过阈值触发熔断（下载前按元数据预估，或下载完成后实测）。"""
 
-def _ffprobe_json(args: list) -> dict:
-    res = subprocess.run(args, capture_output=True, text=True, check=True)
-    return json.loads(res.stdout or "{}")
+class SizeOverflowError(FrameOverflowError):
+    """下载前按所选格式预估的体积超过 MAX_DOWNLOAD_BYTES，同样按熔断处理。"""
 
-def _ffprobe_vinfo(path: str) -> Optional[dict]:
+def _get_frame_count(path: str):
+    """
+    帧数兜底熔断（直播/首映录制很容易超大），分档估算，能早停就早停：
+      1) 单次 ffprobe（media_probe.inspect）的元数据估算，离 MAX_FRAMES 足够远（> FRAME_EST_MARGIN）就直接用；
+      2) 临界或元数据缺失时带 -count_packets 重新检查一次（不解码）；
+      3) 仍拿不到且 FRAME_COUNT_DECODE=1 时才 -count_frames 全量解码。
+    返回 (帧数 或 None, MediaInfo 或 None)；MediaInfo 供确认日志复用，不再单独 ffprobe。
+    """
+    mi, est = None, None
     try:
-        data = _ffprobe_json([
-            "ffprobe", "-v", "error",
-            "-select_streams", "v:0",
-            "-show_entries", "stream=width,height,codec_name,avg_frame_rate",
-            "-of", "json", path
-        ])
-        return (data.get("streams") or [None])[0]
+        mi = media_probe.inspect(path)
+        est = media_probe.estimate_frames(mi)
     except Exception as e:
-        print(f"[调试] ffprobe 失败：{e}")
-        return None
+        print(f"[调试] 元数据估算帧数失败：{e}")
+    if est is not None and abs(est - MAX_FRAMES) > MAX_FRAMES * FRAME_EST_MARGIN:
+        return est, mi
 
-def _get_frame_count(path: str) -> Optional[int]:
-    """统计真实帧数：直播/首映录制很容易超大，这里用帧数兜底熔断。"""
     try:
-        data = _ffprobe_json([
-            "ffprobe", "-v", "error",
-            "-select_streams", "v:0",
-            "-count_frames",
-            "-show_entries", "stream=nb_read_frames",
-            "-of", "json", path
-        ])
-        streams = data.get("streams") or []
-        if streams and "nb_read_frames" in streams[0]:
-            return int(streams[0]["nb_read_frames"])
+        counted = media_probe.inspect(path, count_packets=True)
+        mi = counted
+        if counted.video and counted.video.nb_read_packets is not None:
+            return counted.video.nb_read_packets, mi
     except Exception as e:
-        print(f"[警告] 统计帧数失败：{e}")
-    return None
+        print(f"[警告] 统计帧数失败（计包）：{e}")
+    if FRAME_COUNT_DECODE:
+        try:
+            n = media_probe.count_decoded_frames(path)
+            if n is not None:
+                return n, mi
+        except Exception as e:
+            print(f"[警告] 统计帧数失败（解码）：{e}")
+    return est, mi
 
 def _formats_table(formats: List[Dict[str, Any]]) -> List[str]:
     rows = []
@@ -79,7 +97,49 @@ def _has_hd(formats: List[Dict[str, Any]]) -> bool:
             return True
     return False
 
-def _pick_by_id(work_dir: str, yt_id: str, exts=("mp4","mkv","png","webp")) -> Optional[str]:
+def _selected_formats(info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """info 里 yt-dlp 已选中的格式：合并下载为 requested_formats，单文件则是 info 本身。"""
+    return info.get("requested_formats") or [info]
+
+def _estimate_download(info: Dict[str, Any], live_max_sec: Optional[int] = None):
+    """
+    按所选格式预估 (帧数, 字节数)，取不到的项为 None。
+    时长：直播取 live_max_sec（与录制上限一致），否则 info["duration"]。
+    体积：filesize → filesize_approx → tbr(kbps) × 时长。
+    """
+    dur = info.get("duration")
+    if info.get("is_live") or info.get("live_status") == "is_live":
+        dur = live_max_sec or None
+    fmts = _selected_formats(info)
+
+    frames = None
+    fps = next((f.get("fps") for f in fmts if f.get("vcodec") != "none" and f.get("fps")), None)
+    if dur and fps:
+        frames = int(dur * fps)
+
+    total, known = 0, True
+    for f in fmts:
+        size = f.get("filesize") or f.get("filesize_approx")
+        if not size and dur and f.get("tbr"):
+            size = int(f["tbr"] * 1000 / 8 * dur)
+        if not size:
+            known = False
+            break
+        total += int(size)
+    return frames, (total if known else None)
+
+def _admit(info: Dict[str, Any], live_max_sec: Optional[int] = None):
+    """下载前准入：预估帧数 / 体积超限直接熔断，一个字节都不下；实测帧数检查仍保留兜底。"""
+    frames, size = _estimate_download(info, live_max_sec)
+    if frames is not None and frames > MAX_FRAMES:
+        raise FrameOverflowError(f"预估帧数 {frames} > {MAX_FRAMES}（下载前），判定为长流，已放弃。")
+    if MAX_DOWNLOAD_BYTES and size is not None and size > MAX_DOWNLOAD_BYTES:
+        raise SizeOverflowError(f"预估体积 {size / (1 << 30):.1f} GiB > {MAX_DOWNLOAD_BYTES / (1 << 30):.1f} GiB（下载前），已放弃。")
+    print(f"[准入] 预估帧数 {frames if frames is not None else '?'}，"
+          f"体积 {f'{size / (1 << 20):.0f} MiB' if size is not None else '?'}")
+    return frames, size
+
+def _pick_by_id(work_dir: str, yt_id: str, exts=("mp4","mkv")) -> Optional[str]:
     for ext in exts:
         patt = os.path.join(work_dir, "*" + glob.escape(f" [{yt_id}].{ext}"))
         cands = sorted(glob.glob(patt))
@@ -87,8 +147,52 @@ def _pick_by_id(work_dir: str, yt_id: str, exts=("mp4","mkv","png","webp")) -> O
             return cands[0]
     return None
 
-def _base_ydl_opts(work_dir: str) -> Dict[str, Any]:
-    """所有下载调用的基础选项：禁用代理、强制 IPv4、带 cookie。"""
+_MANIFEST = "job.json"
+
+def _load_finished(work_dir: str):
+    """暂存目录里上次已完整下载并处理好的成品（上传失败后重试时直接复用，不再下载）。"""
+    try:
+        with open(os.path.join(work_dir, _MANIFEST), "r", encoding="utf-8") as f:
+            m = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(os.path.join(work_dir, m.get("video", ""))):
+        return None
+    return m["video"], m.get("cover", cover_art.cover_name()), m.get("description", ""), m.get("source_link", "")
+
+def _write_manifest(work_dir: str, name: str, data: Dict[str, Any]):
+    tmp = os.path.join(work_dir, name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(work_dir, name))
+
+def _save_finished(work_dir: str, video: str, cover: str, description: str, source_link: str):
+    _write_manifest(work_dir, _MANIFEST, {"video": video, "cover": cover, "description": description,
+                                          "source_link": source_link})
+
+# 分段直播录制的清单：第一段就绪时写入；崩溃重启 / 上传失败重试时按它把已录好的分 P 直接投稿
+_LIVE_MANIFEST = "live.json"
+
+def live_resumable(work_dir: str) -> bool:
+    """暂存目录里是否有可续传（直接投稿）的分段直播录制。"""
+    if not os.path.isfile(os.path.join(work_dir, _LIVE_MANIFEST)):
+        return False
+    return any(n.startswith(("part_", "seg_")) for n in os.listdir(work_dir))
+
+def _load_live(work_dir: str):
+    """上次中断的分段直播录制：补封装残留分段，返回 (分 P 列表, 封面, 简介, 来源)；没有可用分 P 为 None。"""
+    try:
+        with open(os.path.join(work_dir, _LIVE_MANIFEST), "r", encoding="utf-8") as f:
+            m = json.load(f)
+    except (OSError, ValueError):
+        return None
+    parts = live_recorder.salvage(work_dir)
+    if not parts:
+        return None
+    return parts, m.get("cover", cover_art.cover_name()), m.get("description", ""), m.get("source_link", "")
+
+def _base_ydl_opts(work_dir: str, is_live: bool = False) -> Dict[str, Any]:
+    """所有下载调用的基础选项：禁用代理、强制 IPv4、带 cookie、按直播/点播套用下载引擎参数。"""
     po_env = os.getenv("YTDLP_YT_PO_TOKENS", "").strip()
     po_tokens = [s.strip() for s in po_env.split(",") if s.strip()] if po_env else []
     opts: Dict[str, Any] = {
@@ -96,12 +200,14 @@ def _base_ydl_opts(work_dir: str) -> Dict[str, Any]:
         "merge_output_format": "mp4",
         "outtmpl": os.path.join(work_dir, "%(title).80s [%(id)s].%(ext)s"),
         "writeinfojson": True,
-        "writethumbnail": True,
-        "postprocessors": [{"key": "FFmpegThumbnailsConvertor", "format": "png", "when": "post_process"}],
+        # 封面由 cover_art 直接从缩略图 URL 拉取处理，不再落盘 + ffmpeg 转换
         "format_sort": ["res:desc", "fps:desc", "vcodec:av01,h264,vp9", "acodec:m4a,opus"],
         "format_sort_force": True,
         "trim_filenames": 120,
-        "cookiesfrombrowser": ("firefox",),    # 可按需换 cookies 文件
+        "continuedl": True,                    # 暂存目录按视频 ID 持久化，重试时接着 .part / 分片续传
+        **cookie_opts(),                       # 共享的只读 cookies 文件（见 cookie_jar）
+        **engine_opts(is_live),                # 分片并发 / aria2c / 分块大小（见 download_engine）
+        **bandwidth.ydl_opts(is_live),         # 跨 worker 带宽份额（未安装调度时为空）
         "proxy": "",                           # ←← 完全禁用代理（等同 --proxy ""）
         "source_address": "0.0.0.0",           # 强制 IPv4，避免 v6 判国错位
         "geo_bypass": True,
@@ -114,9 +220,13 @@ def _base_ydl_opts(work_dir: str) -> Dict[str, Any]:
             }
         },
     }
+    # 带宽计量与 drop-behind 都挂在 progress_hooks 上，合并而不是互相覆盖
+    hooks = list(opts.get("progress_hooks") or []) + page_cache.progress_hooks()
+    if hooks:
+        opts["progress_hooks"] = hooks
     return opts
 
-def _probe_formats(url: str, clients: List[str], base_opts: Dict[str, Any]) -> Dict[str, Any]:
+def _client_opts(base_opts: Dict[str, Any], clients: List[str]) -> Dict[str, Any]:
     opts = dict(base_opts)
     # 再保险：每次尝试都显式禁用代理并保持 IPv4
     opts["source_address"] = "0.0.0.0"
@@ -126,84 +236,239 @@ def _probe_formats(url: str, clients: List[str], base_opts: Dict[str, Any]) -> D
     you["player_client"] = clients
     ea["youtube"] = you
     opts["extractor_args"] = ea
-    with yt_dlp.YoutubeDL(opts) as ydl:
+    return opts
+
+def _probe_formats(url: str, clients: List[str], base_opts: Dict[str, Any]) -> Dict[str, Any]:
+    with ydl_lease(_client_opts(base_opts, clients)) as ydl:
         return ydl.extract_info(url, download=False)
 
 def _download_with_clients(url: str, base_opts: Dict[str, Any], clients: List[str]) -> Dict[str, Any]:
-    opts = dict(base_opts)
-    opts["source_address"] = "0.0.0.0"
-    opts["proxy"] = ""
-    ea = dict(opts.get("extractor_args", {}))
-    you = dict(ea.get("youtube", {}))
-    you["player_client"] = clients
-    ea["youtube"] = you
-    opts["extractor_args"] = ea
-    with yt_dlp.YoutubeDL(opts) as ydl:
+    with ydl_lease(_client_opts(base_opts, clients)) as ydl:
         return ydl.extract_info(url, download=True)
 
+def _download_from_info(info: Dict[str, Any], base_opts: Dict[str, Any], clients: List[str]) -> Dict[str, Any]:
+    """直接用预检得到的 info（格式 / 签名 URL 已解析）下载，不再重新提取。"""
+    with ydl_lease(_client_opts(base_opts, clients)) as ydl:
+        return ydl.process_ie_result(info, download=True)
+
+_EXPIRE_RE = re.compile(r"[?&/]expire[=/](\d+)")
+
+def _info_expires_at(info: Dict[str, Any]) -> Optional[int]:
+    """info 中所选格式签名 URL 的最早过期时间（googlevideo 的 expire 参数）；取不到返回 None。"""
+    fmts = info.get("requested_formats") or ([info] if info.get("url") else info.get("formats") or [])
+    stamps = []
+    for f in fmts:
+        for u in (f.get("url"), f.get("manifest_url")):
+            m = _EXPIRE_RE.search(u or "")
+            if m:
+                stamps.append(int(m.group(1)))
+    return min(stamps) if stamps else None
+
 # 先 web 再其它：某些视频只允 web
 CLIENT_TRIES: List[List[str]] = [
     ["web"], ["android"], ["ios"], ["mweb"], ["android","ios","mweb","web"],
 ]
 
+_pref_store: Optional[SeenStore] = None
+
+def _prefs() -> SeenStore:
+    """各频道上次胜出的客户端（持久化在 SeenStore，进程内懒加载）。"""
+    global _pref_store
+    if _pref_store is None:
+        _pref_store = SeenStore()
+    return _pref_store
+
+def _probe_order(channel: Optional[str]) -> List[List[str]]:
+    tries = [list(c) for c in CLIENT_TRIES]
+    pref = None
+    if channel:
+        try:
+            pref = _prefs().client_pref(channel)
+        except Exception as e:
+            print(f"[调试] 读取客户端偏好失败：{e}")
+    if pref and pref in tries:
+        tries.remove(pref)
+        tries.insert(0, pref)
+    return tries
+
+def _hedged_probe(url: str, tries: List[List[str]], base_opts: Dict[str, Any]):
+    """
+    并发预检（最多 PROBE_FANOUT 个在途），第一个达到 HD_MIN_HEIGHT 的客户端胜出，其余取消。
+    已开始的提取无法中断，放在后台跑完丢弃。
+    返回 (hd_clients 或 None, picked_info, info_clients)；无高清时 picked_info 取 tries 顺序里第一个成功的。
+    """
+    pool = ThreadPoolExecutor(max_workers=max(1, PROBE_FANOUT), thread_name_prefix="probe")
+    futs = {pool.submit(_probe_formats, url, clients, base_opts): i for i, clients in enumerate(tries)}
+    results: Dict[int, Dict[str, Any]] = {}
+    try:
+        for fut in as_completed(futs):
+            i = futs[fut]
+            clients = tries[i]
+            try:
+                info_try = fut.result()
+            except Exception as e:
+                print(f"[调试] 客户端 {clients} 预检失败：{e}")
+                continue
+            fmts = info_try.get("formats") or []
+            print("\n".join(["[可用清晰度 - clients=%s]" % ",".join(clients)] + _formats_table(fmts)))
+            if _has_hd(fmts):
+                print(f"[选择] 使用客户端 {clients}（已发现 ≥{HD_MIN_HEIGHT}p）")
+                return clients, info_try, clients
+            results[i] = info_try
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if results:
+        first = min(results)
+        return None, results[first], tries[first]
+    return None, None, None
+
+def _content_sec(d: Dict[str, Any]) -> float:
+    """进度回调里已下载内容的时长估计：字节 ÷ 该格式码率；没有码率时退回墙钟耗时（实时录制时二者相当）。"""
+    fmt = d.get("info_dict") or {}
+    tbr = fmt.get("tbr") or fmt.get("vbr") or fmt.get("abr")
+    got = d.get("downloaded_bytes")
+    if tbr and got:
+        return got * 8 / (tbr * 1000)
+    return d.get("elapsed") or 0.0
+
+def _await_cover(cover_fut, info: Dict[str, Any], work_dir: str) -> str:
+    """等并行封面任务；预检阶段没拿到就用最终 info 再取一次。返回封面文件名。"""
+    cover = None
+    if cover_fut is not None:
+        try:
+            cover = cover_fut.result(timeout=cover_art.COVER_TIMEOUT * 3)
+        except Exception as e:
+            print(f"[封面] 并行获取失败：{e}")
+    if cover is None:
+        cover = cover_art.fetch_cover(info, work_dir)
+    if cover is None:
+        print(f"[提示] 未生成 {cover_art.cover_name()}")
+    return cover_art.cover_name()
+
 def download_video(video_url: str, work_dir: str = "downloads",
                    is_live: bool = False,
-                   live_max_sec: Optional[int] = None):
+                   live_max_sec: Optional[int] = None,
+                   channel: Optional[str] = None,
+                   live_from_start: bool = False,
+                   resume_only: bool = False):
     """
-    返回: ("video.mp4", "cover.png", description, source_link)
-    - work_dir:   每个 worker 的独立下载目录
+    返回: ("video.mp4", 封面文件名（cover.jpg / cover.png，见 cover_art）, description, source_link)
+          分段直播录制时第一项是分 P 文件名列表 ["part_0000.mp4", ...]（见 live_recorder）；
+          暂存目录里有上次录好的分段（崩溃重启 / 上传失败重试）时不再录制，直接返回已有分 P
+    - work_dir:   该任务的暂存目录（见 staging，按视频 ID 持久化，可续传）
     - is_live:    是否直播任务（决定是否开启限时/从头录制）
     - live_max_sec: 直播录制的最大时长（秒）。None/0 表示不限制（不推荐）
+    - channel:    来源频道（播放列表 URL）；用于记住并优先预检该频道上次胜出的客户端
+    - live_from_start: 直播录制池使用（LIVE_FROM_START，默认关）；开播已超过 LIVE_FROM_START_MIN_SEC
+                  时用 yt-dlp live_from_start 从开播处录（此时不走分段录制，分段只能从直播边缘开始）
+    - resume_only: 直播只投稿暂存目录里已录好的分段（重启恢复 / 自动重试），没有可用分段时报错，不重新录制
     """
     os.makedirs(work_dir, exist_ok=True)
-    base_opts = _base_ydl_opts(work_dir)
+    if is_live:
+        done = _load_live(work_dir)
+        if done:
+            print(f"[续传] {work_dir} 有上次录好的 {len(done[0])} 段直播，不再录制，直接投稿")
+            return done
+        if resume_only:
+            raise RuntimeError("没有可续传的直播分段")
+    else:
+        done = _load_finished(work_dir)
+        if done:
+            print(f"[续传] {work_dir} 已有处理好的成品，跳过下载")
+            return done
+    base_opts = _base_ydl_opts(work_dir, is_live)
 
-    # —— 直播限时下载：进度钩子 + sections 双保险 ——
+    # —— 直播限时下载：按已录内容时长熔断（live_from_start 回放积压比实时快，墙钟耗时不等于内容时长）——
     def _live_limit_hook(d):
-        if not is_live or not live_max_sec:
+        if not is_live or not live_max_sec or d.get("status") != "downloading":
             return
-        elapsed = d.get("elapsed")
-        if elapsed and elapsed >= live_max_sec:
+        if _content_sec(d) >= live_max_sec:
             raise DownloadError("LIVE_TIME_LIMIT_REACHED")
 
     if is_live and live_max_sec:
-        base_opts["progress_hooks"] = [_live_limit_hook]
-        base_opts["download_sections"] = [f"*0-{live_max_sec}"]
+        base_opts["progress_hooks"] = list(base_opts.get("progress_hooks") or []) + [_live_limit_hook]
         base_opts.setdefault("hls_use_mpegts", True)
 
-    # 第一阶段：逐客户端探清晰度
-    picked_clients, picked_info = None, None
-    for clients in CLIENT_TRIES:
+    # 第一阶段：并发探清晰度（该频道上次胜出的客户端排最前）
+    picked_clients, picked_info, info_clients = _hedged_probe(video_url, _probe_order(channel), base_opts)
+    if picked_clients is not None and channel:
         try:
-            info_try = _probe_formats(video_url, clients, base_opts)
+            _prefs().set_client_pref(channel, picked_clients)
         except Exception as e:
-            print(f"[调试] 客户端 {clients} 预检失败：{e}")
-            continue
-        fmts = info_try.get("formats") or []
-        print("\n".join(["[可用清晰度 - clients=%s]" % ",".join(clients)] + _formats_table(fmts)))
-        if _has_hd(fmts):
-            picked_clients, picked_info = clients, info_try
-            print(f"[选择] 使用客户端 {clients}（已发现 ≥{HD_MIN_HEIGHT}p）")
-            break
-        if picked_info is None:
-            picked_info = info_try
+            print(f"[调试] 保存客户端偏好失败：{e}")
 
     if picked_clients is None:
         picked_clients = CLIENT_TRIES[-1]
         print(f"[提示] 未发现 ≥{HD_MIN_HEIGHT}p，用 {picked_clients} 兜底下载。")
 
-    # 第二阶段：真正下载（仅 A/B，已彻底移除“地区代理回退”）
+    # 准入：按预检 info 的所选格式估算帧数 / 体积，超限不下载
+    size = None
+    if picked_info is not None:
+        _, size = _admit(picked_info, live_max_sec if is_live else None)
+    # 磁盘预留（跨 worker 共享账本，超高水位会等待 / 抛 DiskSpaceDeferred）；由调用方清理阶段 disk_space.release()
+    merged = picked_info is not None and len(_selected_formats(picked_info)) > 1
+    disk_space.reserve(work_dir, disk_space.reserve_bytes(size, merged))
+
+    # 直播开播已久：改用 live_from_start 从头录（格式变成 DASH 分片生成器，需重新提取，不复用预检 info）
+    from_start = False
+    if is_live and live_from_start and picked_info is not None:
+        began = picked_info.get("release_timestamp")
+        behind = time.time() - began if began else 0
+        if behind > LIVE_FROM_START_MIN_SEC:
+            from_start = True
+            base_opts["live_from_start"] = True
+            print(f"[直播] 已开播 {int(behind)}s，改用 live_from_start 从头录制")
+
+    # 封面与视频并行：缩略图 URL 在预检 info 里就有
+    cover_fut = cover_art.fetch_cover_async(picked_info, work_dir) if picked_info is not None else None
+
+    # 直播：ffmpeg 分段录制，每段关闭即校验 + 封装成分 P；拿不到流地址时退回下面的 yt-dlp 整段录制
+    if is_live and not from_start and live_recorder.LIVE_SEGMENT_SEC > 0 and picked_info is not None \
+            and live_recorder.stream_inputs(picked_info):
+        live_meta = {"description": (picked_info.get("description") or "").strip(),
+                     "source_link": f"https://www.youtube.com/watch?v={picked_info.get('id', '')}"}
+
+        def _on_segment(n, path):
+            print(f"[分段] 第 {n} 段就绪：{os.path.basename(path)}")
+            if n == 1:
+                # 从这一刻起进程崩溃 / 上传失败都不会丢掉已录好的分 P（见 _load_live）
+                live_meta["cover"] = _await_cover(cover_fut, picked_info, work_dir)
+                _write_manifest(work_dir, _LIVE_MANIFEST, live_meta)
+
+        parts = live_recorder.record(picked_info, work_dir, live_max_sec, on_segment=_on_segment)
+        print(f"直播已录制：{picked_info.get('title', '')}（{len(parts)} P）")
+        cover = live_meta.get("cover") or _await_cover(cover_fut, picked_info, work_dir)
+        return parts, cover, live_meta["description"], live_meta["source_link"]
+
+    # 第二阶段：真正下载（0/A/B，已彻底移除“地区代理回退”）
     def _try_download_with_fallbacks(url, base_opts, prefer_clients):
         last_err = None
 
-        # A) IPv4 + prefer_clients
         opts_v4 = dict(base_opts)
         opts_v4["source_address"] = "0.0.0.0"
         opts_v4["proxy"] = ""
         opts_v4["geo_bypass"] = True
+
+        # 0) 直接复用预检 info 下载（少一次完整提取）；签名 URL 快过期则跳过
+        if picked_info is not None and not from_start:
+            exp = _info_expires_at(picked_info)
+            if exp is not None and exp - time.time() < URL_EXPIRY_MARGIN:
+                print(f"[复用] 预检 info 的签名 URL 即将过期（{int(exp - time.time())}s），改为重新提取")
+            else:
+                try:
+                    return _download_from_info(picked_info, opts_v4, info_clients)
+                except Exception as e:
+                    if "LIVE_TIME_LIMIT_REACHED" in str(e):
+                        raise
+                    last_err = e
+                    print(f"[复用] 用预检 info 下载失败，回退重新提取：{e}")
+
+        # A) IPv4 + prefer_clients
         try:
             return _download_with_clients(url, opts_v4, prefer_clients)
         except Exception as e:
+            if "LIVE_TIME_LIMIT_REACHED" in str(e):
+                raise       # 录满上限不是客户端的问题，换客户端只会把整段再录一遍
             last_err = e
             print(f"[回退A] IPv4 + {prefer_clients} 失败：{e}")
 
@@ -214,6 +479,8 @@ def download_video(video_url: str, work_dir: str = "downloads",
             try:
                 return _download_with_clients(url, opts_v4, clients)
             except Exception as e:
+                if "LIVE_TIME_LIMIT_REACHED" in str(e):
+                    raise
                 last_err = e
                 print(f"[回退B({clients})] 失败：{e}")
 
@@ -239,16 +506,17 @@ def download_video(video_url: str, work_dir: str = "downloads",
         if not final_path or not os.path.exists(final_path):
             raise FileNotFoundError(f"未找到合并成品（id={yt_id}）")
 
-    # 帧数熔断（直播/长视频兜底）
-    frames = _get_frame_count(final_path)
+    # 帧数熔断（直播/长视频兜底；下载前已按元数据准入过一次）
+    frames, mi = _get_frame_count(final_path)
     if frames is not None and frames > MAX_FRAMES:
         try: os.remove(final_path)
         except Exception: pass
         raise FrameOverflowError(f"帧数 {frames} > {MAX_FRAMES}，判定为长流，已放弃。")
 
-    vi = _ffprobe_vinfo(final_path)
+    vi = mi.video if mi else None
     if vi:
-        print(f"[确认] 成品：{vi.get('width')}x{vi.get('height')} codec={vi.get('codec_name')} fps={vi.get('avg_frame_rate')}")
+        print(f"[确认] 成品：{vi.width}x{vi.height} codec={vi.codec_name} fps={vi.avg_frame_rate} "
+              f"时长={mi.duration or vi.duration or '?'}s 帧数={frames if frames is not None else '?'}")
 
     # 规范输出名
     fixed_video = os.path.join(work_dir, "video.mp4")
@@ -257,22 +525,6 @@ def download_video(video_url: str, work_dir: str = "downloads",
         except Exception:
             import shutil; shutil.copy2(final_path, fixed_video)
 
-    # 缩略图：优先 png，否则 webp 转 png
-    fixed_cover = os.path.join(work_dir, "cover.png")
-    png = _pick_by_id(work_dir, yt_id, exts=("png",))
-    if png and os.path.exists(png):
-        if os.path.abspath(png) != os.path.abspath(fixed_cover):
-            try: os.replace(png, fixed_cover)
-            except Exception:
-                import shutil; shutil.copy2(png, fixed_cover)
-    else:
-        webp = _pick_by_id(work_dir, yt_id, exts=("webp",))
-        if webp and os.path.exists(webp):
-            try:
-                Image.open(webp).convert("RGB").save(fixed_cover, "PNG")
-            except Exception as e:
-                print(f"[警告] webp→png 失败：{e}")
-        else:
-            print("[提示] 未生成 cover.png")
-
-    return "video.mp4", "cover.png", description, source_link
+    cover_file = _await_cover(cover_fut, info, work_dir)
+    _save_finished(work_dir, "video.mp4", cover_file, description, source_link)
+    return "video.mp4", cover_file, description, source_link
@@ -0,0 +1,140 @@
+# enrich.py
+# 元数据补全阶段：Gemini 实体抽取 → Bangumi 资料 → 翻译 / 标签 / 分区。
+# 只依赖标题，入队时就能开始，与下载并行；LLM 与 Bangumi 的 30~90s 延迟不再压在下载之后。
+# 多进程版：独立的补全进程消费 enrich 队列，结果写进 Manager dict，上传阶段按视频 ID 取；
+# 单进程版（main.py）：enrich_async 在线程池里跑，返回 Future。
+
+import os, re, time, uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from gemini_api import gemini_extract_entities, translate_and_generate_tags
+from bangumi_api import get_bangumi_context, get_character_info
+
+# -------- 可调参数 --------
+ENRICH_WORKERS  = int(os.getenv("ENRICH_WORKERS", "2"))       # 补全并发数（进程 / 线程）
+ENRICH_WAIT_SEC = int(os.getenv("ENRICH_WAIT_SEC", "900"))    # 成品已就绪时最多再等补全多久
+# -------------------------
+
+# ----- 分区映射（与 gemini_api.py 中提示词保持一致）-----
+TID_NAME2ID = {
+    "单机游戏": 4,
+    "手机游戏": 172,
+    "网络游戏": 65,
+    "动画资讯": 51,
+    "音乐": 130,
+}
+TID_VALID = set(TID_NAME2ID.values())
+DEFAULT_TID = 51
+
+class EnrichError(RuntimeError):
+    """Gemini 翻译失败 / 返回格式异常 / 等待超时。"""
+
+def _parse_tid(line: str) -> int:
+    """第三行 “分区：<tid或中文名>”。"""
+    val = line.split("：", 1)[1].strip()
+    m = re.search(r"\d+", val)
+    if m:
+        t = int(m.group())
+        return t if t in TID_VALID else DEFAULT_TID
+    return TID_NAME2ID.get(val, DEFAULT_TID)
+
+def enrich_title(title: str) -> Dict[str, Any]:
+    """标题 → {"bili_title", "tags", "tid"}；失败抛 EnrichError。"""
+    entities = gemini_extract_entities(title)
+    print(f"[补全] 提取结果：{entities}")
+    ctx_list = []
+    if entities["work"]:
+        ctx_list.append(get_bangumi_context(entities["work"]))
+    for name in entities["characters"] or []:
+        ci = get_character_info(name)
+        if ci:
+            ctx_list.append(ci)
+    translated = translate_and_generate_tags(title, "\n".join(s for s in ctx_list if s).strip())
+    if not translated:
+        raise EnrichError("Gemini 翻译失败")
+
+    lines = [x.strip() for x in translated.strip().splitlines() if x.strip()]
+    if len(lines) < 2 or not lines[0].startswith("翻译：") or not lines[1].startswith("标签："):
+        raise EnrichError(f"Gemini 返回格式异常：{translated}")
+    return {
+        "bili_title": lines[0].replace("翻译：", "").strip(),
+        "tags": lines[1].replace("标签：", "").strip() or "YouTube搬运",
+        "tid": _parse_tid(lines[2]) if len(lines) >= 3 and lines[2].startswith("分区：") else DEFAULT_TID,
+    }
+
+# ---- 多进程：补全队列 + 结果表 ----
+# results[vid]：{"pending": 提交令牌} 表示已提交 / 进行中；完成后为元数据，失败为 {"error": 原因}
+
+def _ready(r: Optional[Dict[str, Any]]) -> bool:
+    return bool(r) and "pending" not in r
+
+def submit(enrich_q, results, vid: str, title: str):
+    """
+    提交补全（同一视频只提交一次）；生产者入队时与 worker 领任务时都会调用。
+    setdefault 在 Manager 进程里一次完成“查 + 占位”，两边同时提交时只有写进令牌的一方入队。
+    """
+    mine = {"pending": uuid.uuid4().hex}
+    if results.setdefault(vid, mine) != mine:
+        return
+    try:
+        enrich_q.put_nowait((vid, title))
+    except Exception as e:
+        results[vid] = {"error": f"补全入队失败：{e}"}
+
+def failed(results, vid: str) -> Optional[str]:
+    """补全已确定失败时返回原因（worker 据此省掉注定白费的下载）。"""
+    r = results.get(vid)
+    return r.get("error") if r else None
+
+def discard(results, vid: str):
+    results.pop(vid, None)
+
+def wait_result(results, vid: str, stop_ev, timeout: float = ENRICH_WAIT_SEC) -> Dict[str, Any]:
+    """等补全结果并取走；失败 / 超时 / 收到退出信号抛 EnrichError。"""
+    deadline = time.time() + timeout
+    while not stop_ev.is_set():
+        r = results.get(vid)
+        if r is None:
+            raise EnrichError("补全任务不存在")
+        if _ready(r):
+            results.pop(vid, None)
+            if "error" in r:
+                raise EnrichError(r["error"])
+            return r
+        if time.time() >= deadline:
+            raise EnrichError(f"补全等待超时（{timeout:.0f}s）")
+        time.sleep(0.5)
+    raise EnrichError("收到退出信号，放弃等待补全")
+
+def enrich_loop(idx: int, enrich_q, results, stop_ev):
+    print(f"[Enricher-{idx}] 启动")
+    while not stop_ev.is_set():
+        try:
+            item = enrich_q.get(timeout=1)
+        except Exception:
+            continue
+        if item is None:
+            break
+        vid, title = item
+        if _ready(results.get(vid)):
+            continue            # 已有结果（重复提交）
+        t0 = time.time()
+        try:
+            meta = enrich_title(title)
+            print(f"[Enricher-{idx}] 完成（{time.time() - t0:.0f}s）：{title} → {meta['bili_title']}")
+        except Exception as e:
+            print(f"[Enricher-{idx}] [失败] {title}：{e}")
+            meta = {"error": str(e)}
+        if vid in results:      # 期间已被丢弃的不再写回
+            results[vid] = meta
+    print(f"[Enricher-{idx}] 退出")
+
+# ---- 单进程：线程池 ----
+_pool: Optional[ThreadPoolExecutor] = None
+
+def enrich_async(title: str) -> "Future[Dict[str, Any]]":
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=max(1, ENRICH_WORKERS), thread_name_prefix="enrich")
+    return _pool.submit(enrich_title, title)
@@ -0,0 +1,172 @@
+# live_recorder.py
+# 分段直播录制：ffmpeg 直接拉预检 info 里的直播流，-f segment 按 LIVE_SEGMENT_SEC 切成 mpegts 分段；
+# 后台线程跟着 segment_list 走，每段一关闭就校验（ffprobe）并封装成 mp4 分 P，
+# 录到上限时只剩最后一段要处理，多 P 投稿几乎立即就绪；进程崩溃最多丢正在写的那一段：
+# 重启后 salvage() 把残留分段补封装，已有分 P 直接投稿（见 download_video 的直播清单）。
+# ffmpeg 不经过 yt-dlp 的进度钩子，录制字节按分段文件增长量记到带宽调度上（bandwidth.meter_bytes）。
+
+import os, csv, time, threading, subprocess
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import bandwidth
+import media_probe
+
+# -------- 可调参数 --------
+LIVE_SEGMENT_SEC   = int(os.getenv("LIVE_SEGMENT_SEC", "300"))   # 每段时长（秒）；0 则不分段，仍走 yt-dlp 整段录制
+LIVE_MIN_SEG_SEC   = 2.0        # 短于该时长的分段视为无效（开播瞬间 / 断流残片）
+LIVE_POLL_SEC      = 1.0
+# -------------------------
+
+SegmentFn = Callable[[int, str], None]
+
+def stream_inputs(info: Dict[str, Any]) -> List[Tuple[str, Dict[str, str]]]:
+    """预检 info 中所选格式的 (URL, 请求头)；合并格式（bv+ba）会有两路输入。"""
+    fmts = info.get("requested_formats") or [info]
+    out = []
+    for f in fmts:
+        url = f.get("url") or f.get("manifest_url")
+        if url:
+            out.append((url, dict(f.get("http_headers") or info.get("http_headers") or {})))
+    return out
+
+def _valid(path: str) -> bool:
+    try:
+        mi = media_probe.inspect(path)
+    except Exception as e:
+        print(f"[分段] 校验失败 {os.path.basename(path)}：{e}")
+        return False
+    dur = mi.duration or (mi.video.duration if mi.video else None) or 0
+    return mi.video is not None and dur >= LIVE_MIN_SEG_SEC
+
+def _remux(src: str, dst: str) -> bool:
+    """mpegts → mp4（只换封装，faststart），成功后删除 .ts。"""
+    r = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", src,
+         "-map", "0", "-c", "copy", "-bsf:a", "aac_adtstoasc", "-movflags", "+faststart", dst],
+        capture_output=True, text=True)
+    if r.returncode != 0:
+        print(f"[分段] 封装失败 {os.path.basename(src)}：{r.stderr.strip()[-300:]}")
+        return False
+    try: os.remove(src)
+    except OSError: pass
+    return True
+
+class SegmentRecorder:
+    def __init__(self, inputs: List[Tuple[str, Dict[str, str]]], out_dir: str, max_sec: Optional[int],
+                 segment_sec: int = LIVE_SEGMENT_SEC, on_segment: Optional[SegmentFn] = None):
+        self._inputs = inputs
+        self._dir = out_dir
+        self._max = max_sec
+        self._seg = segment_sec
+        self._on_segment = on_segment
+        self._list = os.path.join(out_dir, "segments.csv")
+        self._done: Dict[str, Optional[str]] = {}      # seg_xxxx.ts -> part_xxxx.mp4（无效为 None）
+        self._sizes: Dict[str, int] = {}               # seg_xxxx.ts -> 已记账的字节数
+        self._stop = threading.Event()
+
+    def _cmd(self) -> List[str]:
+        cmd = ["ffmpeg", "-hide_banner", "-loglevel", "warning", "-y"]
+        for url, headers in self._inputs:
+            if headers:
+                cmd += ["-headers", "".join(f"{k}: {v}\r\n" for k, v in headers.items())]
+            cmd += ["-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "10", "-i", url]
+        for i in range(len(self._inputs)):
+            cmd += ["-map", str(i)]
+        cmd += ["-c", "copy"]
+        if self._max:
+            cmd += ["-t", str(self._max)]
+        cmd += ["-f", "segment", "-segment_time", str(self._seg), "-segment_format", "mpegts",
+                "-reset_timestamps", "1", "-segment_list", self._list, "-segment_list_type", "csv",
+                os.path.join(self._dir, "seg_%04d.ts")]
+        return cmd
+
+    def _closed_segments(self) -> List[str]:
+        try:
+            with open(self._list, newline="", encoding="utf-8") as f:
+                return [os.path.basename(row[0]) for row in csv.reader(f) if row]
+        except FileNotFoundError:
+            return []
+
+    def _handle(self, name: str):
+        src = os.path.join(self._dir, name)
+        part = None
+        if os.path.exists(src) and _valid(src):
+            dst = os.path.join(self._dir, "part_" + name[len("seg_"):-len(".ts")] + ".mp4")
+            if _remux(src, dst):
+                part = os.path.basename(dst)
+        elif os.path.exists(src):
+            print(f"[分段] 丢弃无效分段 {name}")
+            try: os.remove(src)
+            except OSError: pass
+        self._done[name] = part
+        if part and self._on_segment:
+            self._on_segment(len([p for p in self._done.values() if p]), os.path.join(self._dir, part))
+
+    def _meter(self):
+        for name in os.listdir(self._dir):
+            if not (name.startswith("seg_") and name.endswith(".ts")):
+                continue
+            try:
+                size = os.path.getsize(os.path.join(self._dir, name))
+            except OSError:
+                continue
+            delta = size - self._sizes.get(name, 0)
+            if delta > 0:
+                self._sizes[name] = size
+                bandwidth.meter_bytes(delta)
+
+    def _watch(self):
+        while not self._stop.is_set():
+            self._meter()
+            for name in self._closed_segments():
+                if name not in self._done:
+                    self._handle(name)
+            self._stop.wait(LIVE_POLL_SEC)
+
+    def run(self) -> List[str]:
+        """阻塞录制到上限 / 直播结束，返回按顺序的有效分 P 文件名（相对 out_dir）。"""
+        os.makedirs(self._dir, exist_ok=True)
+        watcher = threading.Thread(target=self._watch, name="seg-watch", daemon=True)
+        watcher.start()
+        t0 = time.time()
+        proc = subprocess.Popen(self._cmd(), stdin=subprocess.DEVNULL)
+        try:
+            rc = proc.wait()
+        except BaseException:
+            proc.terminate()
+            try: proc.wait(timeout=10)
+            except subprocess.TimeoutExpired: proc.kill()
+            raise
+        finally:
+            self._stop.set()
+            watcher.join()
+        if rc != 0:
+            print(f"[分段] ffmpeg 退出码 {rc}（已录 {int(time.time() - t0)}s），处理已有分段")
+        self._meter()
+        # 剩下的：列表里还没处理的，以及异常退出时没进列表的最后一段
+        names = self._closed_segments()
+        names += sorted(n for n in os.listdir(self._dir)
+                        if n.startswith("seg_") and n.endswith(".ts") and n not in names)
+        for name in names:
+            if name not in self._done:
+                self._handle(name)
+        return [p for _, p in sorted(self._done.items()) if p]
+
+def salvage(out_dir: str) -> List[str]:
+    """上次录制被中断：残留的 seg_*.ts 校验后补封装，返回目录里按顺序的全部分 P 文件名。"""
+    rec = SegmentRecorder([], out_dir, None)
+    for name in sorted(n for n in os.listdir(out_dir) if n.startswith("seg_") and n.endswith(".ts")):
+        rec._handle(name)
+    return sorted(n for n in os.listdir(out_dir) if n.startswith("part_") and n.endswith(".mp4"))
+
+def record(info: Dict[str, Any], out_dir: str, max_sec: Optional[int],
+           on_segment: Optional[SegmentFn] = None) -> List[str]:
+    inputs = stream_inputs(info)
+    if not inputs:
+        raise RuntimeError("预检 info 中没有可录制的直播流地址")
+    print(f"[分段] 开始录制：{len(inputs)} 路输入，每段 {LIVE_SEGMENT_SEC}s，上限 {max_sec or '不限'}s")
+    parts = SegmentRecorder(inputs, out_dir, max_sec, on_segment=on_segment).run()
+    if not parts:
+        raise RuntimeError("直播录制没有得到任何有效分段")
+    print(f"[分段] 录制结束：{len(parts)} 段有效")
+    return parts
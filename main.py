@@ -1,21 +1,40 @@
 import os
 import time
 import subprocess
-import yt_dlp
 from collections import deque
-from gemini_api import gemini_extract_entities, translate_and_generate_tags
-from bangumi_api import get_bangumi_context, get_character_info
+import enrich
 from download_video import download_video, FrameOverflowError
+from cookie_jar import cookie_opts
+from ydl_pool import lease as ydl_lease
+import disk_space
+from disk_space import DiskSpaceDeferred
+import staging
+import page_cache
 from yt_dlp.utils import DownloadError
+from channel_poller import BurstWindow, diff_new, POLL_GAP_FILL
+from poll_scheduler import PollScheduler
+from seen_store import (SeenStore, video_id_from_url,
+                        JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_SKIPPED)
 
-# Maintain a record of the last video IDs for each playlist so we don't repeatedly
-# download the same video. This dict is keyed by playlist URL and stores the
-# last seen video ID from that playlist.
-last_video_ids = {}
+# Durable record of seen videos per playlist and of each job's outcome, so a
+# restart resumes where it left off instead of re-recording every playlist and
+# finished uploads are never repeated.
+seen_store = SeenStore()
+
+# Per-playlist number of entries fetched per check; grows for bursty channels.
+burst_windows = BurstWindow()
 
 # Queue used to hold videos that have been detected as new and need processing.
 video_queue = deque()
 
+# Title translation/tagging futures keyed by video ID. Enrichment only needs the
+# title, so it starts at enqueue time and runs while earlier jobs download.
+enrich_futures = {}
+
+def _start_enrichment(video_id, title):
+    if video_id not in enrich_futures:
+        enrich_futures[video_id] = enrich.enrich_async(title)
+
 # A list of YouTube playlist URLs that will be monitored. Each playlist
 # corresponds to a creator/channel whose updates we want to mirror to Bilibili.
 playlist_urls = [
@@ -75,9 +94,15 @@ playlist_urls = [
     "https://www.youtube.com/playlist?list=UUN-bFIdJM0gQlgX7h6LKcZA",
 ]
 
-# Interval (in seconds) between successive checks of each playlist for new videos.
+# Default interval (in seconds) between successive checks of a playlist. Playlists
+# with enough upload history get their own interval from the poll scheduler.
 CHECK_INTERVAL = 60
 
+# Per-playlist next-check deadlines learned from upload history, under a
+# global requests-per-minute budget.
+poll_scheduler = PollScheduler(playlist_urls, base_interval=CHECK_INTERVAL,
+                               history=seen_store.upload_times())
+
 download_dir = "downloads"
 if not os.path.exists(download_dir):
     os.makedirs(download_dir)
@@ -126,13 +151,25 @@ def get_latest_video_from_playlist(url):
     Returns a tuple (title, id, url) for the latest entry. If it fails,
     returns (None, None, None).
     """
-    ydl_opts = {'extract_flat': True, 'playlistend': 1, 'quiet': True}
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=False)
-        for entry in info.get('entries', []):
-            return entry.get('title'), entry.get('id'), f"https://www.youtube.com/watch?v={entry.get('id')}"
+    for entry in get_recent_videos_from_playlist(url, 1):
+        return entry
     return None, None, None
 
+def get_recent_videos_from_playlist(url, window):
+    """
+    Fetch up to ``window`` of the most recent playlist entries in a single
+    flat request.
+
+    Returns a list of (title, id, url) tuples, newest first.
+    """
+    ydl_opts = {'extract_flat': True, 'playlistend': window, 'quiet': True}
+    with ydl_lease(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    return [
+        (entry.get('title'), entry.get('id'), f"https://www.youtube.com/watch?v={entry.get('id')}")
+        for entry in info.get('entries', []) or [] if entry.get('id')
+    ]
+
 def get_video_duration(video_url):
     """
     Return the duration of the given YouTube video in seconds.
@@ -142,38 +179,15 @@ def get_video_duration(video_url):
     """
     ydl_opts = {
         'quiet': True,
-        'cookiesfrombrowser': ('firefox',),
+        **cookie_opts(),
     }
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with ydl_lease(ydl_opts) as ydl:
             info = ydl.extract_info(video_url, download=False)
             return info.get('duration', 0) or 0
     except Exception as e:
         raise e
 
-def clear_downloads(dir_path=download_dir):
-    """
-    Remove everything inside the downloads directory. This is called after
-    each upload (or when an error occurs) to prevent old files and caches
-    from accumulating.
-    """
-    if not os.path.exists(dir_path):
-        return
-    removed = 0
-    for name in os.listdir(dir_path):
-        path = os.path.join(dir_path, name)
-        try:
-            if os.path.isfile(path) or os.path.islink(path):
-                os.remove(path)
-                removed += 1
-            elif os.path.isdir(path):
-                import shutil
-                shutil.rmtree(path)
-                removed += 1
-        except Exception as e:
-            print(f"[清理] 无法删除 {path}: {e}")
-    print(f"[清理] 已清空 {dir_path}（共删除 {removed} 项）。")
-
 def clear_system_caches():
     """
     Clear Linux filesystem caches to free up memory. This function first
@@ -203,6 +217,28 @@ def clear_system_caches():
     except Exception as e:
         print(f"[缓存] 清理系统缓存失败：{e}")
 
+def finish_staging(video_id, job_dir):
+    """
+    Keep the staging directory only while the job will still be retried, so
+    the retry resumes its partial files; otherwise delete it, which also
+    drops its page cache.
+    """
+    if seen_store.job_status(video_id) == JOB_FAILED and seen_store.will_retry(video_id):
+        staging.keep(video_id)
+        page_cache.evict([job_dir])
+    else:
+        staging.discard(video_id)
+
+def retry_failed_jobs():
+    """
+    Queue failed jobs whose retry backoff has expired. They go through
+    enqueue_new_video again, so a job whose first duration lookup failed is
+    still held to the length and region checks.
+    """
+    for video_id, title, video_url, _ in seen_store.retry_due():
+        print(f"[重试] 重新检查并排队：{title}")
+        enqueue_new_video(seen_store.job_channel(video_id), title, video_id, video_url)
+
 def process_queue():
     """
     Process videos that have been queued for upload. Downloads the video,
@@ -210,49 +246,61 @@ def process_queue():
     """
     while video_queue:
         title, video_url = video_queue.popleft()
+        video_id = video_id_from_url(video_url)
+        if seen_store.is_finished(video_id):
+            print(f"[跳过] 已处理过：{title}")
+            continue
+        seen_store.set_job(video_id, JOB_RUNNING)
+        _start_enrichment(video_id, title)
+        # Each video gets its own staging directory that survives failures and
+        # restarts, so a retry resumes partial downloads instead of starting over.
+        job_dir = staging.job_dir(video_id)
         # Attempt to download the video. If the download routine detects
         # excessively large frame counts, it will raise FrameOverflowError.
         try:
-            video_file_name, cover_file_name, description, source_link = download_video(video_url)
+            video_file_name, cover_file_name, description, source_link = download_video(
+                video_url, work_dir=job_dir, channel=seen_store.job_channel(video_id))
         except FrameOverflowError as e:
             print(f"[跳过] {e}")
-            # Clean up partial downloads and skip to next item
-            clear_downloads(download_dir)
-            # Also free system caches to recover space/memory
-            clear_system_caches()
+            seen_store.set_job(video_id, JOB_SKIPPED, detail=str(e))
+            enrich_futures.pop(video_id, None)
+            # The job is abandoned, so its staging directory is not needed;
+            # deleting the files also drops their page cache.
+            staging.discard(video_id)
+            disk_space.release()
+            if page_cache.PAGECACHE_DROP_GLOBAL:
+                clear_system_caches()
             continue
+        except DiskSpaceDeferred as e:
+            # Not enough room right now; keep the job and retry on the next cycle.
+            print(f"[推迟] {e}")
+            video_queue.append((title, video_url))
+            seen_store.set_job(video_id, JOB_QUEUED, detail=str(e))
+            return
         except Exception as e:
             # Other exceptions should propagate to the outer handler
+            seen_store.set_job(video_id, JOB_FAILED, detail=str(e))
+            enrich_futures.pop(video_id, None)
+            finish_staging(video_id, job_dir)
+            disk_space.release()
             raise e
 
         # Compute absolute paths for the downloaded assets
-        video_file = os.path.join(download_dir, video_file_name)
-        cover_path = os.path.join(download_dir, cover_file_name)
-
-        # Extract entities from the title using Gemini API
-        entities = gemini_extract_entities(title)
-        print(f"[信息] 提取结果：{entities}")
-
-        context_info = ""
-        if entities["work"]:
-            context_info += get_bangumi_context(entities["work"]) + "\n"
-        if entities["characters"]:
-            for name in entities["characters"]:
-                char_info = get_character_info(name)
-                if char_info:
-                    context_info += char_info + "\n"
-
-        translated_data = translate_and_generate_tags(title, context_info.strip())
-        if not translated_data:
-            print("[跳过] Gemini 翻译失败，跳过该视频")
-            continue
-
-        lines = [line.strip() for line in translated_data.strip().splitlines() if line.strip()]
-        if not lines or len(lines) < 2 or not lines[0].startswith("翻译：") or not lines[1].startswith("标签："):
-            raise ValueError(f"Gemini 返回格式异常：\n{translated_data}")
+        video_file = os.path.join(job_dir, video_file_name)
+        cover_path = os.path.join(job_dir, cover_file_name)
 
-        translated_title = lines[0].replace("翻译：", "").strip()
-        tags_line = lines[1].replace("标签：", "").strip() or "YouTube搬运"
+        # Enrichment has been running alongside the download; usually it is
+        # already done by now.
+        try:
+            meta = enrich_futures.pop(video_id).result(timeout=enrich.ENRICH_WAIT_SEC)
+        except Exception as e:
+            print(f"[跳过] {e}")
+            seen_store.set_job(video_id, JOB_FAILED, detail=str(e)[:500])
+            finish_staging(video_id, job_dir)
+            disk_space.release()
+            continue
+        translated_title = meta["bili_title"]
+        tags_line = meta["tags"]
 
         # === 新增：投稿简介长度限制到 1800 字 ===
         desc_for_post = description or ""
@@ -269,72 +317,138 @@ def process_queue():
                 cover_path,
                 source_link
             )
+            seen_store.set_job(video_id, JOB_DONE)
         except Exception as e:
             print(f"[上传失败] {e}")
+            seen_store.set_job(video_id, JOB_FAILED, detail=str(e))
         finally:
-            # Always clear downloads and system caches after an upload attempt
-            clear_downloads(download_dir)
-            clear_system_caches()
-
-def check_for_new_videos():
+            # Drop the staging directory unless the job is going to be retried.
+            # The disk reservation and caches are always freed.
+            finish_staging(video_id, job_dir)
+            disk_space.release()
+            # Host-wide drop_caches is opt-in; it also evicts every other
+            # process's cache, not just the files this job touched.
+            if page_cache.PAGECACHE_DROP_GLOBAL:
+                clear_system_caches()
+
+def check_for_new_videos(urls=None):
     """
-    Iterate through each monitored playlist and enqueue videos that have not
-    been processed before. Duration and other heuristics are used to avoid
-    processing videos that exceed our desired length.
+    Iterate through the given playlists (all monitored playlists by default)
+    and enqueue videos that have not been processed before. Each playlist is
+    read with a small window so that several uploads between two checks are
+    all picked up, oldest first. The result of every check is reported to the
+    poll scheduler so it can plan that playlist's next check.
     """
-    for playlist_url in playlist_urls:
-        title, video_id, video_url = get_latest_video_from_playlist(playlist_url)
-        if not video_id:
+    for playlist_url in (playlist_urls if urls is None else urls):
+        try:
+            entries = get_recent_videos_from_playlist(playlist_url, burst_windows.size(playlist_url))
+        except Exception as e:
+            print(f"[警告] 无法获取 {playlist_url} 的最新视频：{e}")
+            poll_scheduler.reschedule_failed(playlist_url)
+            continue
+        if not entries:
             print(f"[警告] 无法获取 {playlist_url} 的最新视频")
+            poll_scheduler.reschedule_failed(playlist_url)
             continue
 
         # Initialise the record for this playlist if necessary
-        if playlist_url not in last_video_ids:
-            last_video_ids[playlist_url] = video_id
+        if not seen_store.head(playlist_url):
+            for title, video_id, _ in reversed(entries):
+                seen_store.mark_seen(playlist_url, video_id, title or "", head=False)
+            title, video_id, _ = entries[0]
+            seen_store.mark_seen(playlist_url, video_id, title or "")
             print(f"[首次记录] {playlist_url} 最新视频为 {video_id}")
+            poll_scheduler.report(playlist_url, 0)
             continue
 
-        # Skip if this is the same as the last processed video
-        if video_id == last_video_ids[playlist_url]:
-            continue
-
-        last_video_ids[playlist_url] = video_id
-
-        try:
-            duration = get_video_duration(video_url)
-        except DownloadError as e:
-            error_msg = str(e)
-            if "not made this video available in your country" in error_msg:
-                print(f"[跳过] 视频因地区限制无法访问：{title}")
-                continue
-            else:
-                print(f"[异常] 无法获取视频时长：{error_msg}")
+        # Everything newer than the first already-seen entry, in publish order
+        new = diff_new(entries, lambda v: seen_store.is_seen(playlist_url, v))
+        burst_windows.observe(playlist_url, len(new), len(entries))
+        # If the whole window is new (downtime or a burst), older uploads may lie
+        # beyond it. Fetch a longer list now: once the newest entry is marked
+        # seen, the gap could never be detected again.
+        if len(new) == len(entries) and len(entries) < POLL_GAP_FILL:
+            try:
+                wider = get_recent_videos_from_playlist(playlist_url, POLL_GAP_FILL)
+            except Exception as e:
+                print(f"[警告] 补拉 {playlist_url} 失败：{e}")
+                wider = []
+            if len(wider) > len(entries):
+                entries = wider
+                new = diff_new(entries, lambda v: seen_store.is_seen(playlist_url, v))
+                print(f"[提示] {playlist_url} 窗口内全是新视频，补拉后共 {len(new)} 条新视频")
+        poll_scheduler.report(playlist_url, len(new))
+        for title, video_id, video_url in new:
+            # The job row and the seen row are written in one transaction, before
+            # the (slow, fallible) duration lookup; see enqueue_new_video.
+            seen_store.mark_new(playlist_url, video_id, title or "", video_url,
+                                head=(video_id == entries[0][1]))
+            if seen_store.is_finished(video_id):
                 continue
-        except Exception as e:
-            print(f"[异常] 获取视频时长失败：{e}")
-            continue
+            enqueue_new_video(playlist_url, title, video_id, video_url)
 
-        print(f"[检测到新视频] {title}，时长 {duration} 秒")
-        # Skip videos longer than 60 minutes (3600 seconds)
-        if duration > 60 * 60:
-            print(f"[跳过] 视频时长超过 60 分钟，未搬运：{title}")
-            continue
+def enqueue_new_video(playlist_url, title, video_id, video_url):
+    """
+    Queue a newly detected video. Duration and other heuristics are used to
+    avoid processing videos that exceed our desired length. The job already
+    exists (see SeenStore.mark_new); if the lookup fails it is marked failed
+    and picked up again by the automatic retry.
+    """
+    try:
+        duration = get_video_duration(video_url)
+    except DownloadError as e:
+        error_msg = str(e)
+        if "not made this video available in your country" in error_msg:
+            print(f"[跳过] 视频因地区限制无法访问：{title}")
+            seen_store.set_job(video_id, JOB_SKIPPED, channel=playlist_url, title=title,
+                               url=video_url, detail="地区限制")
+            return
+        else:
+            print(f"[异常] 无法获取视频时长：{error_msg}")
+            seen_store.set_job(video_id, JOB_FAILED, detail=f"获取时长失败：{error_msg}")
+            return
+    except Exception as e:
+        print(f"[异常] 获取视频时长失败：{e}")
+        seen_store.set_job(video_id, JOB_FAILED, detail=f"获取时长失败：{e}")
+        return
 
-        video_queue.append((title, video_url))
-        print(f"[排队] 已加入搬运队列：{title}")
+    print(f"[检测到新视频] {title}，时长 {duration} 秒")
+    # Skip videos longer than 60 minutes (3600 seconds)
+    if duration > 60 * 60:
+        print(f"[跳过] 视频时长超过 60 分钟，未搬运：{title}")
+        seen_store.set_job(video_id, JOB_SKIPPED, channel=playlist_url, title=title,
+                           url=video_url, detail=f"时长 {duration}s")
+        return
+
+    seen_store.set_job(video_id, JOB_QUEUED, channel=playlist_url, title=title, url=video_url)
+    video_queue.append((title, video_url))
+    _start_enrichment(video_id, title)
+    print(f"[排队] 已加入搬运队列：{title}")
 
 def main():
     """
     Main entry point. Continuously polls for new videos and processes
-    queued items, sleeping between iterations.
+    queued items, sleeping between iterations. Jobs left queued or running
+    by a previous run are queued again first, and videos that were seen but
+    not yet looked up are looked up again.
     """
+    staging.prune(seen_store.job_status, will_retry=seen_store.will_retry)
+    for _, title, video_url, _ in seen_store.pending_jobs():
+        video_queue.append((title, video_url))
+        print(f"[恢复] 重新排队：{title}")
+    for video_id, playlist_url, title, video_url in seen_store.new_jobs():
+        print(f"[恢复] 继续处理新视频：{title}")
+        enqueue_new_video(playlist_url, title, video_id, video_url)
     while True:
         try:
-            check_for_new_videos()
+            due = poll_scheduler.pop_due()
+            if due:
+                check_for_new_videos(due)
+            retry_failed_jobs()
             process_queue()
         except Exception as e:
             print(f"[异常] 处理过程中出错: {e}")
-        time.sleep(CHECK_INTERVAL)
+        time.sleep(min(poll_scheduler.next_wakeup(), CHECK_INTERVAL))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
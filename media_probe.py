@@ -0,0 +1,140 @@
+# media_probe.py
+# 成品检查：一次 ffprobe 同时取全部流与封装信息，返回带类型的结果对象；
+# 按 (路径, 大小, mtime) 缓存，帧数熔断与最终确认日志共用同一份结果，不再对同一文件反复起 ffprobe。
+
+import os, json, threading, subprocess
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+_CACHE_MAX = 32
+
+@dataclass(frozen=True)
+class StreamInfo:
+    index: int
+    codec_type: str                     # video / audio / subtitle / data
+    codec_name: Optional[str]
+    width: Optional[int]
+    height: Optional[int]
+    avg_frame_rate: Optional[str]       # 原样保留 ffprobe 的分数形式，如 30000/1001
+    fps: Optional[float]
+    duration: Optional[float]
+    nb_frames: Optional[int]            # 容器头里记录的帧数（mp4 有，mkv/ts 通常没有）
+    nb_read_packets: Optional[int]      # 仅 count_packets=True 时有值
+
+@dataclass(frozen=True)
+class MediaInfo:
+    path: str
+    size: int
+    mtime_ns: int
+    format_name: Optional[str]
+    duration: Optional[float]
+    streams: Tuple[StreamInfo, ...]
+    packets_counted: bool
+
+    @property
+    def video(self) -> Optional[StreamInfo]:
+        return next((s for s in self.streams if s.codec_type == "video"), None)
+
+    @property
+    def audio(self) -> Optional[StreamInfo]:
+        return next((s for s in self.streams if s.codec_type == "audio"), None)
+
+def ffprobe_json(args: list) -> dict:
+    res = subprocess.run(args, capture_output=True, text=True, check=True)
+    return json.loads(res.stdout or "{}")
+
+def parse_rate(rate: Optional[str]) -> Optional[float]:
+    """'30000/1001' → 29.97；'0/0' / 空 → None。"""
+    try:
+        num, _, den = (rate or "").partition("/")
+        v = float(num) / float(den or 1)
+        return v if v > 0 else None
+    except (ValueError, ZeroDivisionError):
+        return None
+
+def _int(v) -> Optional[int]:
+    return int(v) if str(v or "").isdigit() else None
+
+def _float(v) -> Optional[float]:
+    try:
+        return float(v) if v not in (None, "", "N/A") else None
+    except (TypeError, ValueError):
+        return None
+
+_lock = threading.Lock()
+_cache: "OrderedDict[Tuple[str, int, int], MediaInfo]" = OrderedDict()
+
+def inspect(path: str, count_packets: bool = False) -> MediaInfo:
+    """
+    一次 ffprobe 拿 streams + format。count_packets=True 时附带 -count_packets（只解复用、不解码），
+    用于帧数临界时的精确计数；缓存里已有计包结果则直接复用。失败抛异常。
+    """
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None and (hit.packets_counted or not count_packets):
+            _cache.move_to_end(key)
+            return hit
+
+    args = ["ffprobe", "-v", "error", "-show_streams", "-show_format", "-of", "json"]
+    if count_packets:
+        args.append("-count_packets")
+    data = ffprobe_json(args + [path])
+
+    streams = []
+    for s in data.get("streams") or []:
+        rate = s.get("avg_frame_rate")
+        streams.append(StreamInfo(
+            index=int(s.get("index", len(streams))),
+            codec_type=s.get("codec_type") or "",
+            codec_name=s.get("codec_name"),
+            width=_int(s.get("width")),
+            height=_int(s.get("height")),
+            avg_frame_rate=rate,
+            fps=parse_rate(rate) or parse_rate(s.get("r_frame_rate")),
+            duration=_float(s.get("duration")),
+            nb_frames=_int(s.get("nb_frames")),
+            nb_read_packets=_int(s.get("nb_read_packets")),
+        ))
+    fmt = data.get("format") or {}
+    info = MediaInfo(
+        path=path, size=st.st_size, mtime_ns=st.st_mtime_ns,
+        format_name=fmt.get("format_name"),
+        duration=_float(fmt.get("duration")),
+        streams=tuple(streams),
+        packets_counted=count_packets,
+    )
+    with _lock:
+        _cache[key] = info
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_MAX:
+            _cache.popitem(last=False)
+    return info
+
+def estimate_frames(info: MediaInfo) -> Optional[int]:
+    """不解码的帧数：计包结果 > 容器 nb_frames > 时长 × 平均帧率。"""
+    v = info.video
+    if v is None:
+        return None
+    if v.nb_read_packets:
+        return v.nb_read_packets
+    if v.nb_frames:
+        return v.nb_frames
+    dur = v.duration or info.duration
+    if v.fps and dur:
+        return int(round(dur * v.fps))
+    return None
+
+def count_decoded_frames(path: str) -> Optional[int]:
+    """最后手段：-count_frames 完整解码计数，很慢。"""
+    data = ffprobe_json([
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-count_frames",
+        "-show_entries", "stream=nb_read_frames",
+        "-of", "json", path
+    ])
+    streams = data.get("streams") or []
+    return _int(streams[0].get("nb_read_frames")) if streams else None
@@ -1,18 +1,40 @@
 # multiproc_main.py
 # 生产者-消费者并行版：VOD 与直播都投递；直播限时录制；多个 worker 并发处理
 # 本版：彻底禁用代理（环境变量与 yt-dlp 内部），playlist 失败→UU→UC→RSS 回退；退出不阻塞。
-
-import os, time, signal, subprocess, multiprocessing as mp
-from collections import defaultdict
-import yt_dlp
+# 轮询：channel_poller 线程池并发拉取全部频道（在途上限 + 同 host 礼貌限流），每轮打印耗时。
+# 变化检测：默认 RSS 优先（ETag/If-Modified-Since 条件请求 + keep-alive），只有新 ID 才动用 yt-dlp。
+# 推送：WEBSUB_ENABLED=1 时订阅 WebSub hub，通知到达即入队，轮询降为低频兜底。
+# 上传：独立上传进程消费上传队列，下载 worker 交出成品即处理下一个任务，下载与上传重叠。
+# 分池：直播录制与点播各有队列和进程数（LIVE_WORKERS / NUM_WORKERS），直播不会拖慢点播。
+# 预约：尚未开播的直播 / 首映按计划时间进堆，开播前才开始查，一开播就投直播队列。
+# 分阶段：探测（生产者取 watch 信息）→ 下载（点播 / 直播池）→ 补全（翻译 / 标签，入队即开始，与下载并行）→ 上传，
+#         各阶段独立队列与并发数。
+
+import os, time, queue, signal, threading, subprocess, multiprocessing as mp
 from yt_dlp.utils import DownloadError
 import re
-import urllib.request, urllib.error
 import xml.etree.ElementTree as ET
-
-from gemini_api import gemini_extract_entities, translate_and_generate_tags
-from bangumi_api import get_bangumi_context, get_character_info
-from download_video import download_video, FrameOverflowError
+import requests
+from typing import Dict
+
+import enrich
+from enrich import EnrichError
+from download_video import download_video, live_resumable, FrameOverflowError
+from cookie_jar import cookie_opts
+from ydl_pool import lease as ydl_lease
+import bandwidth
+from bandwidth import BandwidthGovernor
+import disk_space
+from disk_space import DiskSpaceDeferred
+import staging
+import page_cache
+from channel_poller import ChannelPoller, BurstWindow, diff_new, POLL_GAP_FILL
+from rss_feed import FeedWatcher
+from poll_scheduler import PollScheduler, POLL_MIN_INTERVAL
+from websub import WebSubSubscriber, WEBSUB_ENABLED, WEBSUB_SAFETY_POLL
+from upcoming import UpcomingScheduler, UpcomingItem
+from seen_store import (SeenStore, video_id_from_url,
+                        JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_SKIPPED)
 
 def _disable_env_proxies():
     for k in (
@@ -24,21 +46,14 @@ def _disable_env_proxies():
 _disable_env_proxies()
 
 # ======== 配置 ========
-CHECK_INTERVAL     = 100                  # 轮询间隔（秒）
+CHECK_INTERVAL     = 100                  # 基础轮询间隔（秒）；无历史的频道用它，其余由 PollScheduler 自适应
 NUM_WORKERS        = max(2, os.cpu_count() // 2)
+LIVE_WORKERS       = int(os.getenv("LIVE_WORKERS", "2"))     # 直播录制专用进程数（与点播 worker 分开，互不阻塞）
+LIVE_FROM_START    = os.getenv("LIVE_FROM_START", "0") == "1"  # 直播池：积压已久时用 live_from_start 从头录（默认关，走分段录制）
+UPLOAD_WORKERS     = int(os.getenv("UPLOAD_WORKERS", "2"))   # 独立上传进程数；下载 worker 交出成品后不等上传
 BASE_DOWNLOAD_DIR  = "downloads"
 LIVE_MAX_SEC       = 30 * 60              # 直播录制最长 30 分钟（可改）
-
-# ----- 分区映射（与 gemini_api.py 中提示词保持一致）-----
-TID_NAME2ID = {
-    "单机游戏": 4,
-    "手机游戏": 172,
-    "网络游戏": 65,
-    "动画资讯": 51,
-    "音乐": 130,
-}
-TID_VALID = set(TID_NAME2ID.values())
-DEFAULT_TID = 51
+POLL_MODE          = os.getenv("POLL_MODE", "rss")   # rss：Atom feed 为主、yt-dlp 兜底；playlist：yt-dlp 为主、RSS 兜底
 
 # 你的订阅清单（省略... 与之前一致）
 playlist_urls = [
@@ -117,21 +132,6 @@ playlist_urls = [
     "https://www.youtube.com/playlist?list=UUoIkccJcBM1MBJEgQ4p5p7Q",
 ]
 
-def _clear_dir(dir_path: str):
-    if not os.path.exists(dir_path):
-        return
-    cnt = 0
-    for name in os.listdir(dir_path):
-        p = os.path.join(dir_path, name)
-        try:
-            if os.path.isfile(p) or os.path.islink(p):
-                os.remove(p); cnt += 1
-            elif os.path.isdir(p):
-                import shutil; shutil.rmtree(p); cnt += 1
-        except Exception as e:
-            print(f"[清理] 无法删除 {p}: {e}")
-    print(f"[清理] 已清空 {dir_path}（{cnt} 项）")
-
 def _clear_system_caches(non_blocking: bool = True, timeout: int = 3):
     """非阻塞清缓存；root 直写，否则 sudo -n 尝试，不要求密码。"""
     try:
@@ -163,8 +163,10 @@ def _clear_system_caches(non_blocking: bool = True, timeout: int = 3):
 def _post_to_bilibili(video_file, translated_title, description, tags_line, cover_path, source_link, tid: int = 51):
     if not tags_line:
         tags_line = "YouTube搬运"
+    # video_file 可以是分 P 文件列表（分段直播录制），biliup_rs 一次投成多 P
+    files = list(video_file) if isinstance(video_file, (list, tuple)) else [video_file]
     cmd = [
-        "biliup_rs", "upload", video_file,
+        "biliup_rs", "upload", *files,
         "--title", translated_title,
         "--desc", description,
         "--tag", tags_line,
@@ -180,12 +182,11 @@ def _post_to_bilibili(video_file, translated_title, description, tags_line, cove
 
 # ---------- playlist 取最新视频：稳健实现（禁用代理） ----------
 
-def _build_ydl_opts_for_meta():
-    """仅取元数据：禁用代理、IPv4、Cookies、重试。"""
-    cookies_txt = os.getenv("YTDLP_COOKIES")
+def _build_ydl_opts_for_meta(playlistend: int = 1):
+    """仅取元数据：禁用代理、IPv4、Cookies、重试。playlistend 为一次请求拉取的条目数。"""
     ydl_opts = {
         "extract_flat": True,
-        "playlistend": 1,
+        "playlistend": playlistend,
         "quiet": True,
         "retries": 10,
         "extractor_retries": 8,
@@ -194,11 +195,8 @@ def _build_ydl_opts_for_meta():
         "proxy": "",                      # ←← 禁用代理
         "source_address": "0.0.0.0",      # IPv4
         "geo_bypass": True,
+        **cookie_opts(),                  # 共享的只读 cookies 文件（YTDLP_COOKIES 优先）
     }
-    if cookies_txt and os.path.exists(cookies_txt):
-        ydl_opts["cookies"] = cookies_txt
-    else:
-        ydl_opts["cookiesfrombrowser"] = ("firefox",)
     return ydl_opts
 
 def _uu_to_uc(playlist_id: str) -> str | None:
@@ -207,82 +205,117 @@ def _uu_to_uc(playlist_id: str) -> str | None:
         return "UC" + pid[2:]
     return None
 
-def _rss_latest_by_uc(uc_id: str):
-    url = f"https://www.youtube.com/feeds/videos.xml?channel_id={uc_id}"
-    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-    with urllib.request.urlopen(req, timeout=10) as r:
-        data = r.read()
-    ns = {"atom": "http://www.w3.org/2005/Atom", "yt": "http://www.youtube.com/xml/schemas/2015"}
-    root = ET.fromstring(data)
-    entry = root.find("atom:entry", ns)
-    if entry is None:
-        return None
-    vid = entry.findtext("yt:videoId", default="", namespaces=ns)
-    title = entry.findtext("atom:title", default="", namespaces=ns)
-    if not vid:
+_feed_watcher = None
+
+def _feeds() -> FeedWatcher:
+    """生产者进程内懒加载（避免 fork 给 worker 带去连接池）。"""
+    global _feed_watcher
+    if _feed_watcher is None:
+        _feed_watcher = FeedWatcher()
+    return _feed_watcher
+
+# 每个频道一次请求拉几条：连发的频道自动放大窗口
+_windows = BurstWindow()
+
+def _playlist_uc(url: str) -> str | None:
+    m = re.search(r"(?:[?&]list=|^)([0-9A-Za-z_-]{24})", url.strip())
+    pid = m.group(1) if m else (url.strip() if re.fullmatch(r"[0-9A-Za-z_-]{24}", url.strip()) else "")
+    return _uu_to_uc(pid) if pid else None
+
+def _get_watch_meta(vurl: str):
+    """watch 页取 is_live/live_status/duration/计划开播时间；较重，只对新出现的 ID（和到点的预约）调用。"""
+    # 预约直播 / 首映没有可用格式，yt-dlp 默认直接抛错（"This live event will begin in ..."），
+    # 拿不到 live_status / release_timestamp；忽略该错误才能得到 is_upcoming 与计划开播时间
+    watch_opts = {"quiet": True, "geo_bypass": True, "proxy": "", "source_address": "0.0.0.0",
+                  "ignore_no_formats_error": True}
+    watch_opts.update(cookie_opts())
+    with ydl_lease(watch_opts) as y2:
+        meta = y2.extract_info(vurl, download=False)
+    return (bool(meta.get("is_live")), meta.get("live_status"), meta.get("duration") or 0,
+            meta.get("release_timestamp"))
+
+def _recent_ids_via_rss(url: str):
+    uc = _playlist_uc(url)
+    if not uc:
         return None
-    return title, vid
+    try:
+        items = _feeds().entries(uc)
+        if items:
+            return [(title, vid, f"https://www.youtube.com/watch?v={vid}") for title, vid in items]
+    except (requests.RequestException, ET.ParseError) as e:
+        print(f"[提示] RSS 拉取失败：{e}")
+    return None
 
-def _get_latest_meta_from_playlist(url: str):
-    """yt-dlp 读 tab；失败且是 UU… 则 RSS 回退；watch 再取 is_live/duration。"""
-    # 1) playlist/tab
+def _recent_ids_via_playlist(url: str, window: int | None = None):
     try:
-        ydl_opts = _build_ydl_opts_for_meta()
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        ydl_opts = _build_ydl_opts_for_meta(playlistend=window or _windows.size(url))
+        with ydl_lease(ydl_opts) as ydl:
             info = ydl.extract_info(url, download=False)
+        out = []
         for entry in info.get("entries", []) or []:
             vid = entry.get("id")
-            title = entry.get("title") or ""
-            vurl = f"https://www.youtube.com/watch?v={vid}"
-            # watch 元数据：同样禁用代理 + IPv4
-            is_live, live_status, duration = False, None, 0
-            try:
-                watch_opts = {"quiet": True, "geo_bypass": True, "proxy": "", "source_address": "0.0.0.0"}
-                watch_opts["cookiesfrombrowser"] = ("firefox",)
-                with yt_dlp.YoutubeDL(watch_opts) as y2:
-                    meta = y2.extract_info(vurl, download=False)
-                is_live = bool(meta.get("is_live"))
-                live_status = meta.get("live_status")
-                duration = meta.get("duration") or 0
-            except Exception as e:
-                print(f"[警告] 获取 {vid} 详细信息失败：{e}")
-            return title, vid, vurl, is_live, live_status, duration
+            if vid:
+                out.append((entry.get("title") or "", vid, f"https://www.youtube.com/watch?v={vid}"))
+        if out:
+            return out
     except Exception as e:
         print(f"[提示] playlist/tab 提取失败：{e}")
+    return None
 
-    # 2) UU→UC→RSS 回退
-    m = re.search(r"(?:[?&]list=|^)([0-9A-Za-z_-]{24})", url.strip())
-    pid = m.group(1) if m else (url.strip() if re.fullmatch(r"[0-9A-Za-z_-]{24}", url.strip()) else "")
-    uc = _uu_to_uc(pid) if pid else None
-    if uc:
-        try:
-            rss = _rss_latest_by_uc(uc)
-            if rss:
-                title, vid = rss
-                vurl = f"https://www.youtube.com/watch?v={vid}"
-                is_live, live_status, duration = False, None, 0
-                try:
-                    watch_opts = {"quiet": True, "geo_bypass": True, "proxy": "", "source_address": "0.0.0.0"}
-                    watch_opts["cookiesfrombrowser"] = ("firefox",)
-                    with yt_dlp.YoutubeDL(watch_opts) as y2:
-                        meta = y2.extract_info(vurl, download=False)
-                    is_live = bool(meta.get("is_live"))
-                    live_status = meta.get("live_status")
-                    duration = meta.get("duration") or 0
-                except Exception as e:
-                    print(f"[警告] RSS→watch 取详细失败：{e}")
-                return title, vid, vurl, is_live, live_status, duration
-        except (urllib.error.HTTPError, urllib.error.URLError, ET.ParseError) as e:
-            print(f"[提示] RSS 回退失败：{e}")
-
-    return None, None, None, False, None, 0
+def _get_recent_ids_from_playlist(url: str):
+    """
+    轻量阶段：一次请求取最近若干条，返回 ([(title, vid, vurl), ...]（最新在前）, 来源 "rss" / "playlist")。
+    - rss 模式：UU/UC 频道先走条件请求的 Atom feed（未变化只花 304），失败再 yt-dlp 读 tab
+    - playlist 模式：yt-dlp 读 tab（窗口大小见 BurstWindow）；失败且是 UU… 则 RSS 回退
+    """
+    if POLL_MODE == "rss":
+        order = (("rss", _recent_ids_via_rss), ("playlist", _recent_ids_via_playlist))
+    else:
+        order = (("playlist", _recent_ids_via_playlist), ("rss", _recent_ids_via_rss))
+    for source, fn in order:
+        got = fn(url)
+        if got:
+            return got, source
+    return [], None
 
 # ---------- worker / producer ----------
 
-def worker_loop(idx: int, task_q: mp.Queue, stop_ev: mp.Event):
-    work_dir = os.path.join(BASE_DOWNLOAD_DIR, f"worker-{idx}")
-    os.makedirs(work_dir, exist_ok=True)
-    print(f"[Worker-{idx}] 启动：{work_dir}")
+def _finish_job(store: SeenStore, vid: str, work_dir: str, is_live: bool):
+    """任务收尾：成功 / 放弃 / 不再重试的删掉暂存，其余保留给重试续传（直播保留已录好的分 P 重新投稿）。"""
+    # 删除文件即释放其页缓存；保留的暂存只对本任务的文件做定向回收
+    status = store.job_status(vid)
+    if is_live and status == JOB_FAILED and not live_resumable(work_dir):
+        store.no_retry(vid)     # 一段都没录到的直播无从续传
+    if status in (JOB_DONE, JOB_SKIPPED) or (status == JOB_FAILED and not store.will_retry(vid)):
+        staging.discard(vid)
+    else:
+        staging.keep(vid)
+        page_cache.evict([work_dir])
+    if page_cache.PAGECACHE_DROP_GLOBAL:
+        try:
+            _clear_system_caches(non_blocking=True, timeout=2)
+        except Exception:
+            pass
+
+def _hand_off(upload_q: mp.Queue, job: dict, stop_ev: mp.Event) -> bool:
+    """交给上传阶段；上传队列满时阻塞（限制下载跑在上传前面的距离），收到退出信号则放弃。"""
+    while not stop_ev.is_set():
+        try:
+            upload_q.put(job, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def worker_loop(name: str, task_q: mp.Queue, upload_q: mp.Queue, enrich_q: mp.Queue, results,
+                stop_ev: mp.Event, gov: BandwidthGovernor | None = None, live_pool: bool = False):
+    """
+    下载 worker；live_pool=True 为直播录制池（只消费直播队列，可从头录制）。
+    标题翻译 / 标签由补全阶段并行完成，这里只下载，成品交给上传阶段与补全结果会合。
+    """
+    print(f"[{name}] 启动")
+    store = SeenStore()
+    bandwidth.install(gov)
 
     while not stop_ev.is_set():
         try:
@@ -293,123 +326,389 @@ def worker_loop(idx: int, task_q: mp.Queue, stop_ev: mp.Event):
             break
 
         title, video_url, is_live, live_cap = task
-        print(f"[Worker-{idx}] 处理：{title}  live={is_live} cap={live_cap}")
+        vid = video_id_from_url(video_url)
+        if store.is_finished(vid):
+            print(f"[{name}] [跳过] 已处理过：{title}")
+            enrich.discard(results, vid)
+            continue
+        # 补全注定失败的不必再下载
+        why = enrich.failed(results, vid)
+        if why:
+            print(f"[{name}] [跳过] {why}：{title}")
+            store.set_job(vid, JOB_FAILED, detail=why)
+            enrich.discard(results, vid)
+            continue
+        # 恢复 / 重新入队的任务生产者可能没提交过补全；重复提交会被忽略
+        enrich.submit(enrich_q, results, vid, title)
+        print(f"[{name}] 处理：{title}  live={is_live} cap={live_cap}")
+        store.set_job(vid, JOB_RUNNING)
+        # 每个视频一个持久暂存目录：失败 / 中断后重试时 yt-dlp 从 .part / 分片续传
+        work_dir = staging.job_dir(vid)
+        handed_off = False
 
         try:
-            vfile, cfile, desc, link = download_video(
-                video_url, work_dir=work_dir,
-                is_live=is_live,
-                live_max_sec=live_cap if is_live else None
-            )
-
-            # —— Gemini 标注/翻译/标签 ——
-            entities = gemini_extract_entities(title)
-            ctx_list = []
-            if entities["work"]:
-                ctx_list.append(get_bangumi_context(entities["work"]))
-            if entities["characters"]:
-                for name in entities["characters"]:
-                    ci = get_character_info(name)
-                    if ci: ctx_list.append(ci)
-            translated = translate_and_generate_tags(title, "\n".join([s for s in ctx_list if s]).strip())
-            if not translated:
-                print(f"[Worker-{idx}] [跳过] Gemini 翻译失败")
-                continue
-
-            lines = [x.strip() for x in translated.strip().splitlines() if x.strip()]
-            assert len(lines) >= 2 and lines[0].startswith("翻译：") and lines[1].startswith("标签："), f"Gemini 返回异常：{translated}"
-            translated_title = lines[0].replace("翻译：","").strip()
-            tags_line = lines[1].replace("标签：","").strip() or "YouTube搬运"
-            desc_for_post = (desc or "")[:1800]
-
-            # —— 解析第三行 “分区：<tid或中文名>” —— 
-            tid = DEFAULT_TID
-            if len(lines) >= 3 and lines[2].startswith("分区："):
-                val = lines[2].split("：", 1)[1].strip()
-                m = re.search(r"\d+", val)
-                if m:
-                    t = int(m.group())
-                    if t in TID_VALID:
-                        tid = t
-                else:
-                    tid = TID_NAME2ID.get(val, DEFAULT_TID)
-
-            _post_to_bilibili(
-                os.path.join(work_dir, vfile),
-                translated_title,
-                desc_for_post,
-                tags_line,
-                os.path.join(work_dir, cfile),
-                link,
-                tid=tid,
-            )
+            with bandwidth.session(bandwidth.DOWN, live=is_live):
+                vfile, cfile, desc, link = download_video(
+                    video_url, work_dir=work_dir,
+                    is_live=is_live,
+                    live_max_sec=live_cap if is_live else None,
+                    channel=store.job_channel(vid),
+                    live_from_start=live_pool and LIVE_FROM_START,
+                    # 点播池里的直播任务都来自重启恢复 / 自动重试：只投已录好的分段
+                    resume_only=is_live and not live_pool,
+                )
+
+            # —— 交给上传阶段，本 worker 立刻去下一个任务（下载与上一条的上传重叠）——
+            handed_off = _hand_off(upload_q, {
+                "vid": vid, "title": title, "is_live": is_live, "work_dir": work_dir,
+                # 分段直播录制时 vfile 是分 P 列表，一次多 P 投稿
+                "video": ([os.path.join(work_dir, v) for v in vfile] if isinstance(vfile, list)
+                          else os.path.join(work_dir, vfile)),
+                "cover": os.path.join(work_dir, cfile),
+                "desc": (desc or "")[:1800], "source": link,
+            }, stop_ev)
+            if handed_off:
+                print(f"[{name}] 已交给上传队列：{title}")
         except FrameOverflowError as e:
-            print(f"[Worker-{idx}] [熔断] {e}")
+            print(f"[{name}] [熔断] {e}")
+            store.set_job(vid, JOB_SKIPPED, detail=str(e))
+        except DiskSpaceDeferred as e:
+            # 空间不够不是任务本身的问题：放回队尾，等其他任务清理后再来
+            print(f"[{name}] [推迟] {e}")
+            try:
+                task_q.put_nowait(task)
+                store.set_job(vid, JOB_QUEUED, detail=str(e))
+            except Exception as qe:
+                store.set_job(vid, JOB_FAILED, detail=f"{e}；重新入队失败：{qe}")
         except DownloadError as e:
-            print(f"[Worker-{idx}] [下载错误] {e}")
+            print(f"[{name}] [下载错误] {e}")
+            store.set_job(vid, JOB_FAILED, detail=str(e))
         except Exception as e:
-            print(f"[Worker-{idx}] [异常] {e}")
+            print(f"[{name}] [异常] {e}")
+            store.set_job(vid, JOB_FAILED, detail=str(e))
         finally:
-            _clear_dir(work_dir)
-            try:
-                _clear_system_caches(non_blocking=True, timeout=2)
-            except Exception:
-                pass
-
-    print(f"[Worker-{idx}] 退出")
+            # 文件已全部落盘，预留不再需要；交出去的任务由上传阶段收尾
+            disk_space.release()
+            if not handed_off:
+                if store.job_status(vid) != JOB_QUEUED:
+                    enrich.discard(results, vid)
+                _finish_job(store, vid, work_dir, is_live)
+
+    store.close()
+    print(f"[{name}] 退出")
+
+def upload_loop(idx: int, upload_q: mp.Queue, results, stop_ev: mp.Event, gov: BandwidthGovernor | None = None):
+    """
+    上传阶段：biliup_rs 需要完整文件，无法边下边传；把上传拆成独立进程，
+    下载 worker 交出成品后即可开始下一个下载，总耗时趋近 max(下载, 上传) 而不是二者之和。
+    成品与补全结果在这里会合：补全通常早已完成，否则等到 ENRICH_WAIT_SEC。
+    """
+    print(f"[Uploader-{idx}] 启动")
+    store = SeenStore()
+    bandwidth.install(gov)
 
-def producer_loop(task_q: mp.Queue, stop_ev: mp.Event):
-    last_ids = defaultdict(str)
     while not stop_ev.is_set():
-        for pu in playlist_urls:
-            try:
-                title, vid, vurl, is_live, live_status, duration = _get_latest_meta_from_playlist(pu)
-            except Exception as e:
-                print(f"[警告] 拉取 {pu} 失败：{e}")
-                continue
+        try:
+            job = upload_q.get(timeout=1)
+        except Exception:
+            continue
+        if job is None:
+            break
 
-            if not vid:
-                continue
+        vid = job["vid"]
+        print(f"[Uploader-{idx}] 上传：{job['title']}")
+        try:
+            meta = enrich.wait_result(results, vid, stop_ev)
+            with bandwidth.session(bandwidth.UP, live=job["is_live"]):
+                _post_to_bilibili(
+                    job["video"],
+                    meta["bili_title"],
+                    job["desc"],
+                    meta["tags"],
+                    job["cover"],
+                    job["source"],
+                    tid=meta["tid"],
+                )
+            store.set_job(vid, JOB_DONE)
+        except EnrichError as e:
+            print(f"[Uploader-{idx}] [跳过] {e}")
+            store.set_job(vid, JOB_FAILED, detail=str(e)[:500])
+        except Exception as e:
+            print(f"[Uploader-{idx}] [上传失败] {e}")
+            store.set_job(vid, JOB_FAILED, detail=str(e))
+        finally:
+            _finish_job(store, vid, job["work_dir"], job["is_live"])
+
+    store.close()
+    print(f"[Uploader-{idx}] 退出")
+
+def _resume_pending(store: SeenStore, queues: Dict[str, mp.Queue]):
+    """
+    上次退出时未完成的任务重新入队。直播不续录，但已录好的分 P 照常投稿
+    （走点播队列，download_video 以 resume_only 只返回已有分 P，绝不重新开录）；一段都没录到的记为失败。
+    """
+    for vid, title, vurl, is_live in store.pending_jobs():
+        if is_live and not live_resumable(staging.job_path(vid)):
+            store.set_job(vid, JOB_FAILED, detail="重启中断（直播未录到分段）")
+            store.no_retry(vid)
+            continue
+        try:
+            queues["vod"].put_nowait((title, vurl, is_live, None))
+            enrich.submit(queues["enrich"], queues["results"], vid, title)
+            print(f"[恢复] 重新排队{'（投稿已录好的直播分段）' if is_live else ''}：{title}")
+        except Exception as e:
+            print(f"[警告] 恢复入队失败：{e}")
+
+def _resume_new(store: SeenStore, queues: Dict[str, mp.Queue]):
+    """上次记为已见、还没来得及查 watch 信息就退出的新视频：重新查并分派。"""
+    for vid, pu, title, vurl in store.new_jobs():
+        print(f"[恢复] 继续处理新视频：{title}")
+        _dispatch_new(store, queues, pu, title, vid, vurl)
+
+def _retry_failed(store: SeenStore, queues: Dict[str, mp.Queue]):
+    """
+    到了重试时刻的失败任务重新入队；暂存目录还在，yt-dlp 从 .part / 分片续传，
+    直播则把已录好的分 P 重新投稿（没有分段的直播不重试）。
+    """
+    for vid, title, vurl, is_live in store.retry_due():
+        if is_live and not live_resumable(staging.job_path(vid)):
+            store.no_retry(vid)
+            continue
+        if queues["vod"].full():
+            return          # 点播队列满，下一轮再试
+        # 先落库再入队，避免 worker 已开始处理后又被改回 queued
+        store.set_job(vid, JOB_QUEUED, detail="自动重试")
+        try:
+            queues["vod"].put_nowait((title, vurl, is_live, None))
+        except queue.Full:
+            store.set_job(vid, JOB_FAILED, detail="点播队列已满")
+            return
+        enrich.submit(queues["enrich"], queues["results"], vid, title)
+        print(f"[重试] 重新排队：{title}")
 
-            if not last_ids[pu]:
-                last_ids[pu] = vid
-                print(f"[首次记录] {pu} -> {vid} ({title})")
-                continue
+def _dispatch_new(store: SeenStore, queues: Dict[str, mp.Queue], pu: str, title: str, vid: str, vurl: str):
+    """新视频：懒加载 watch 详细信息后按类型投到直播 / 点播队列。"""
+    if store.is_finished(vid):
+        return
 
-            if vid == last_ids[pu]:
-                continue
+    is_live, live_status, start_at = False, None, None
+    try:
+        is_live, live_status, _, start_at = _get_watch_meta(vurl)
+    except Exception as e:
+        print(f"[警告] 获取 {vid} 详细信息失败：{e}")
 
-            last_ids[pu] = vid
+    if live_status == "is_upcoming":
+        _schedule_upcoming(store, pu, title, vid, vurl, start_at)
+        return
 
-            if live_status == "is_upcoming":
-                print(f"[跳过] 尚未开播：{title}")
-                continue
+    _enqueue(store, queues, pu, title, vid, vurl, bool(is_live or live_status == "is_live"))
 
-            is_live_task = bool(is_live or live_status == "is_live")
-            live_cap = LIVE_MAX_SEC if is_live_task else None
+def _enqueue(store: SeenStore, queues: Dict[str, mp.Queue], pu: str, title: str, vid: str, vurl: str,
+             is_live_task: bool):
+    live_cap = LIVE_MAX_SEC if is_live_task else None
 
-            try:
-                task_q.put_nowait((title, vurl, is_live_task, live_cap))
-                typ = "直播" if is_live_task else "视频"
-                print(f"[排队] {typ}：{title}")
-            except Exception as e:
-                print(f"[警告] 入队失败：{e}")
+    # 先落库再入队，避免 worker 已开始处理后又被改回 queued
+    store.set_job(vid, JOB_QUEUED, channel=pu, title=title, url=vurl, is_live=is_live_task)
+    # 直播队列很短：录制名额全满时排队等下去也赶不上直播，直接判失败
+    try:
+        queues["live" if is_live_task else "vod"].put_nowait((title, vurl, is_live_task, live_cap))
+        # 补全只需要标题：现在就开始，等下载完通常已经就绪
+        enrich.submit(queues["enrich"], queues["results"], vid, title)
+        typ = "直播" if is_live_task else "视频"
+        print(f"[排队] {typ}：{title}")
+    except queue.Full:
+        why = "直播录制名额已满" if is_live_task else "点播队列已满"
+        print(f"[警告] {why}：{title}")
+        store.set_job(vid, JOB_FAILED, detail=why)
+    except Exception as e:
+        print(f"[警告] 入队失败：{e}")
+        store.set_job(vid, JOB_FAILED, detail=f"入队失败：{e}")
+
+# 预约直播 / 首映：开播前 UPCOMING_LEAD_SEC 才开始查
+_upcoming = UpcomingScheduler()
+
+def _schedule_upcoming(store: SeenStore, pu: str, title: str, vid: str, vurl: str, start_at):
+    store.set_upcoming(vid, start_at, channel=pu, title=title, url=vurl)
+    _upcoming.add(vid, pu, title, vurl, start_at)
+    when = time.strftime("%m-%d %H:%M", time.localtime(start_at)) if start_at else "时间未知"
+    print(f"[预约] {title}：计划 {when} 开播，届时录制")
+
+def _restore_upcoming(store: SeenStore):
+    for vid, pu, title, vurl, start_at in store.upcoming_jobs():
+        _upcoming.add(vid, pu, title, vurl, start_at)
+    if len(_upcoming):
+        print(f"[恢复] {len(_upcoming)} 场预约直播 / 首映继续等待开播")
+
+def _check_upcoming(store: SeenStore, queues: Dict[str, mp.Queue]):
+    """查询到点的预约：开播 → 直播队列；已结束 / 变成普通视频 → 点播队列；改期 → 按新时间重排。"""
+    def _check(vurl):
+        _, live_status, _, start_at = _get_watch_meta(vurl)
+        return live_status, start_at
+
+    def _on_start(item: UpcomingItem, is_live: bool):
+        store.drop_upcoming(item.vid)
+        print(f"[预约] {'已开播' if is_live else '已结束 / 转为视频'}：{item.title}")
+        with _dispatch_lock:
+            _enqueue(store, queues, item.channel, item.title, item.vid, item.url, is_live)
+
+    def _on_drop(item: UpcomingItem):
+        store.drop_upcoming(item.vid)
+        why = "连续查询失败" if item.fails else "超过计划时间仍未开播"
+        store.set_job(item.vid, JOB_FAILED, detail=why)
+        print(f"[预约] {why}，放弃：{item.title}")
+
+    def _on_moved(item: UpcomingItem):
+        # 新时间落库，重启后按新时间等
+        store.set_upcoming(item.vid, item.start_at)
+        when = time.strftime("%m-%d %H:%M", time.localtime(item.start_at))
+        print(f"[预约] 改期至 {when}：{item.title}")
+
+    _upcoming.run_due(_check, _on_start, _on_drop, _on_moved)
+
+# 轮询线程与 WebSub 回调线程共用：同一新视频只入队一次
+_dispatch_lock = threading.Lock()
+
+def _handle_entries(store: SeenStore, queues: Dict[str, mp.Queue], pu: str, entries, source: str) -> int:
+    """处理某频道一次拉取（source 为 "rss" / "playlist"）或推送（"websub"）的结果，返回新视频条数。"""
+    with _dispatch_lock:
+        return _handle_entries_locked(store, queues, pu, entries, source)
+
+def _handle_entries_locked(store: SeenStore, queues: Dict[str, mp.Queue], pu: str, entries, source: str) -> int:
+    if not store.head(pu):
+        for title, vid, _ in reversed(entries):
+            store.mark_seen(pu, vid, title, head=False)
+        title, vid, _ = entries[0]
+        store.mark_seen(pu, vid, title)
+        print(f"[首次记录] {pu} -> {vid} ({title})")
+        return 0
+
+    # 增量：取到第一个已见 ID 为止，按发布顺序逐条入队。
+    # 窗口只作用于 yt-dlp 读 tab 的条数（playlistend）；RSS 已拉到的整张列表全部参与比较
+    new = diff_new(entries, lambda v: store.is_seen(pu, v))
+    if source == "playlist":
+        _windows.observe(pu, len(new), len(entries))
+    # 拉到的全是新视频（停机后 / 连发）：更早的可能还有，当场补拉一次更长的列表，
+    # 否则这次把最新的记为已见后，断档里的视频下一轮就再也比不出来了
+    if source != "websub" and len(new) == len(entries) and len(entries) < POLL_GAP_FILL:
+        wider = _recent_ids_via_playlist(pu, POLL_GAP_FILL)
+        if wider and len(wider) > len(entries):
+            # RSS 可能比 tab 新：以已拉到的为前缀，接上补拉结果里更早的部分
+            got = {e[1] for e in entries}
+            entries = entries + [e for e in wider if e[1] not in got]
+            new = diff_new(entries, lambda v: store.is_seen(pu, v))
+            print(f"[提示] {pu} 拉到的全是新视频，补拉 {len(entries)} 条，共 {len(new)} 条新视频")
+        if len(new) == len(entries):
+            print(f"[提示] {pu} {len(entries)} 条全是新视频，可能有更早的漏检")
+    for title, vid, vurl in new:
+        # 任务与已见同一事务落库，再去查（可能很慢 / 失败的）watch 信息
+        store.mark_new(pu, vid, title, vurl, head=(vid == entries[0][1]))
+        _dispatch_new(store, queues, pu, title, vid, vurl)
+    return len(new)
+
+def _start_websub(store: SeenStore, queues: Dict[str, mp.Queue]):
+    """订阅全部 UU/UC 频道；推送到达即走与轮询相同的去重入队逻辑。"""
+    uc2pu = {}
+    for pu in playlist_urls:
+        uc = _playlist_uc(pu)
+        if uc:
+            uc2pu.setdefault(uc, pu)
+
+    def _on_notify(uc, items):
+        pu = uc2pu.get(uc)
+        if not pu:
+            return
+        entries = [(title, vid, f"https://www.youtube.com/watch?v={vid}") for title, vid in items]
+        n = _handle_entries(store, queues, pu, entries, "websub")
+        if n:
+            print(f"[WebSub] {pu} 推送 {n} 条新视频")
 
-        for _ in range(CHECK_INTERVAL):
-            if stop_ev.is_set(): break
-            time.sleep(1)
+    push = WebSubSubscriber(uc2pu.keys(), _on_notify)
+    try:
+        push.start()
+    except Exception as e:
+        print(f"[WebSub] 启动失败，仅靠轮询：{e}")
+        return None
+    return push
+
+def producer_loop(queues: Dict[str, mp.Queue], stop_ev: mp.Event):
+    store = SeenStore()
+    print(f"[恢复] 已载入 {len(store.heads())} 个频道进度")
+    _resume_pending(store, queues)
+    _resume_new(store, queues)
+    _restore_upcoming(store)
+    # 每个频道按各自学到的节奏到期；轮询只取最近 ID 列表，watch 详细信息仅对新 ID 懒加载
+    # 启用 WebSub 后新视频由推送即时入队，轮询只作低频兜底
+    min_iv = WEBSUB_SAFETY_POLL if WEBSUB_ENABLED else POLL_MIN_INTERVAL
+    sched = PollScheduler(playlist_urls, base_interval=max(CHECK_INTERVAL, min_iv),
+                          history=store.upload_times(), min_interval=min_iv)
+    poller = ChannelPoller(_get_recent_ids_from_playlist)
+    push = _start_websub(store, queues) if WEBSUB_ENABLED else None
+    pruned_at = 0.0
+    try:
+        while not stop_ev.is_set():
+            if time.time() - pruned_at >= staging.STAGING_PRUNE_SEC:
+                staging.prune(store.job_status, will_retry=store.will_retry)
+                pruned_at = time.time()
+            due = sched.pop_due()
+            for pu, got, err in (poller.sweep(due) if due else []):
+                if err is not None:
+                    print(f"[警告] 拉取 {pu} 失败：{err}")
+                    sched.reschedule_failed(pu)
+                    continue
+                entries, source = got
+                new_count = _handle_entries(store, queues, pu, entries, source) if entries else 0
+                sched.report(pu, new_count)
+            _check_upcoming(store, queues)
+            _retry_failed(store, queues)
+
+            # 睡到下一个频道到期 / 下一场预约该查（按秒检查退出信号）
+            wait = min(sched.next_wakeup(), _upcoming.next_wakeup(), CHECK_INTERVAL)
+            while wait > 0 and not stop_ev.is_set():
+                time.sleep(min(1.0, wait))
+                wait -= 1.0
+    finally:
+        poller.close()
+        if push is not None:
+            push.close()
+        if _feed_watcher is not None:
+            _feed_watcher.close()
+        store.close()
 
 def main():
     os.makedirs(BASE_DOWNLOAD_DIR, exist_ok=True)
     manager = mp.Manager()
-    task_q: mp.Queue = manager.Queue(maxsize=200)
+    # 点播与直播各自一条队列、一组进程：长时间直播录制不再挡住点播
+    vod_q: mp.Queue = manager.Queue(maxsize=200)
+    live_q: mp.Queue = manager.Queue(maxsize=max(1, LIVE_WORKERS))
+    # 补全阶段：入队即按标题翻译 / 打标签，结果按视频 ID 放在共享 dict 里等上传阶段来取
+    enrich_q: mp.Queue = manager.Queue()
+    results = manager.dict()
+    queues = {"vod": vod_q, "live": live_q, "enrich": enrich_q, "results": results}
     stop_ev = mp.Event()
+    # 带宽预算（BW_DOWN / BW_UP）须在 fork 前建好共享内存，worker 继承
+    gov = BandwidthGovernor()
+
+    # 上传队列容量很小：下载最多领先上传这么多个成品，避免暂存堆积
+    upload_q: mp.Queue = manager.Queue(maxsize=max(1, UPLOAD_WORKERS))
 
     workers = []
     for i in range(NUM_WORKERS):
-        p = mp.Process(target=worker_loop, args=(i, task_q, stop_ev), daemon=True)
+        p = mp.Process(target=worker_loop, args=(f"Worker-{i}", vod_q, upload_q, enrich_q, results, stop_ev, gov), daemon=True)
         p.start()
-        workers.append(p)
+        workers.append((p, vod_q))
+    for i in range(max(1, LIVE_WORKERS)):
+        p = mp.Process(target=worker_loop, args=(f"Live-{i}", live_q, upload_q, enrich_q, results, stop_ev, gov, True), daemon=True)
+        p.start()
+        workers.append((p, live_q))
+    uploaders = []      # 上传与补全进程：都靠 stop_ev 退出
+    for i in range(max(1, UPLOAD_WORKERS)):
+        p = mp.Process(target=upload_loop, args=(i, upload_q, results, stop_ev, gov), daemon=True)
+        p.start()
+        uploaders.append(p)
+    for i in range(max(1, enrich.ENRICH_WORKERS)):
+        p = mp.Process(target=enrich.enrich_loop, args=(i, enrich_q, results, stop_ev), daemon=True)
+        p.start()
+        uploaders.append(p)
 
     def _sig(sig, frame):
         print("\n[主进程] 收到信号，准备退出")
@@ -418,14 +717,19 @@ def main():
     signal.signal(signal.SIGTERM, _sig)
 
     try:
-        producer_loop(task_q, stop_ev)
+        producer_loop(queues, stop_ev)
     finally:
         stop_ev.set()
-        for _ in workers:
-            task_q.put(None)
-        for p in workers:
+        for _, q in workers:
+            try:
+                q.put_nowait(None)
+            except queue.Full:
+                pass        # worker 每秒检查 stop_ev，照样会退出
+        # 上传进程靠 stop_ev 退出（队列可能是满的，不往里塞 None）；没传完的任务保持 running，重启后续上
+        procs = [p for p, _ in workers] + uploaders
+        for p in procs:
             p.join(timeout=10)
-        for p in workers:
+        for p in procs:
             if p.is_alive():
                 print(f"[主进程] 终止滞留的 worker PID={p.pid}")
                 p.terminate()
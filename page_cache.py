@@ -0,0 +1,120 @@
+# page_cache.py
+# 定向回收页缓存：只对本任务写过 / 读过的文件 posix_fadvise(POSIX_FADV_DONTNEED)，并报告回收了多少；
+# 不再每个任务后 sync + drop_caches=3 把整机的 dentry / inode / 页缓存全清掉（还可能要 sudo）。
+# 全局清缓存改为显式开启（PAGECACHE_DROP_GLOBAL=1）。
+# 可选 drop-behind：下载过程中每写够一段就把已落盘部分踢出缓存，效果近似 O_DIRECT 写大文件。
+
+import os, mmap, ctypes, ctypes.util
+from typing import Any, Dict, Iterable, List, Optional
+
+# -------- 可调参数 --------
+PAGECACHE_DROP_GLOBAL = os.getenv("PAGECACHE_DROP_GLOBAL", "0") == "1"   # 任务后仍执行全局 drop_caches（旧行为）
+PAGECACHE_DROP_BEHIND = int(os.getenv("PAGECACHE_DROP_BEHIND", "0"))     # 下载中每写这么多字节回收一次，0 为关闭
+# -------------------------
+
+_PAGE = mmap.PAGESIZE
+_libc = None
+
+def _lib():
+    global _libc
+    if _libc is None:
+        lib = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        lib.mmap.restype = ctypes.c_void_p
+        lib.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long]
+        lib.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+        lib.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.POINTER(ctypes.c_ubyte)]
+        _libc = lib
+    return _libc
+
+def resident_bytes(fd: int, size: int) -> Optional[int]:
+    """mincore 统计文件在页缓存中的字节数；平台不支持时返回 None。"""
+    if size <= 0:
+        return 0
+    try:
+        lib = _lib()
+        addr = lib.mmap(None, size, mmap.PROT_READ, mmap.MAP_SHARED, fd, 0)
+        if addr is None or addr == ctypes.c_void_p(-1).value:
+            return None
+        try:
+            n = (size + _PAGE - 1) // _PAGE
+            vec = (ctypes.c_ubyte * n)()
+            if lib.mincore(addr, size, vec) != 0:
+                return None
+            return sum(b & 1 for b in vec) * _PAGE
+        finally:
+            lib.munmap(addr, size)
+    except (OSError, AttributeError):
+        return None
+
+def _files(paths: Iterable[str]) -> List[str]:
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, _, names in os.walk(p):
+                out.extend(os.path.join(root, n) for n in names)
+        elif os.path.isfile(p):
+            out.append(p)
+    return out
+
+def evict(paths: Iterable[str], quiet: bool = False) -> int:
+    """
+    对 paths（文件或目录）里的每个文件：fdatasync 落盘脏页后 FADV_DONTNEED。
+    返回回收的字节数（mincore 前后差；不支持 mincore 时按文件大小估）。
+    """
+    reclaimed, n = 0, 0
+    for path in _files(paths):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            size = os.fstat(fd).st_size
+            before = resident_bytes(fd, size)
+            os.fdatasync(fd)        # 脏页不会被 DONTNEED 丢掉，先写回
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            after = resident_bytes(fd, size)
+            reclaimed += (before - after) if (before is not None and after is not None) else size
+            n += 1
+        except OSError as e:
+            print(f"[缓存] fadvise 失败（忽略）：{path} {e}")
+        finally:
+            os.close(fd)
+    if not quiet and n:
+        print(f"[缓存] 已回收 {n} 个文件的页缓存 {reclaimed / (1 << 20):.1f} MiB")
+    return reclaimed
+
+class _DropBehind:
+    """progress hook：下载中的临时文件每新增 PAGECACHE_DROP_BEHIND 字节，回收一次已写部分。"""
+
+    def __init__(self, step: int):
+        self._step = step
+        self._mark: Dict[str, int] = {}
+
+    def __call__(self, d: Dict[str, Any]):
+        path = d.get("tmpfilename") or d.get("filename")
+        if not path:
+            return
+        if d.get("status") == "finished":
+            self._mark.pop(path, None)
+            return
+        got = d.get("downloaded_bytes") or 0
+        if got - self._mark.get(path, 0) < self._step:
+            return
+        self._mark[path] = got
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+_drop_behind = _DropBehind(PAGECACHE_DROP_BEHIND) if PAGECACHE_DROP_BEHIND > 0 else None
+
+def progress_hooks() -> list:
+    """并入 yt-dlp progress_hooks；未开启 drop-behind 时为空。"""
+    return [_drop_behind] if _drop_behind is not None else []
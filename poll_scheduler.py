@@ -0,0 +1,164 @@
+# poll_scheduler.py
+# 按频道自适应的轮询调度：小顶堆存放每个频道的下次轮询时刻；
+# 从历史上传时间学习频道的更新节奏（间隔中位数）与时段分布（24 小时直方图），
+# 间隔由全局请求预算（POLL_BUDGET_RPM）反推：每个普通频道至少按基础间隔（CHECK_INTERVAL）轮询，
+# 预算的剩余部分按“此刻有新视频的可能性”分给各频道；只有真正休眠的频道才放慢到 POLL_MAX_INTERVAL。
+# 全局令牌桶兜底限制每分钟请求数。
+
+import os, time, heapq, random, statistics, threading
+from typing import Dict, Iterable, List, Optional
+
+# -------- 可调参数 --------
+POLL_MIN_INTERVAL = int(os.getenv("POLL_MIN_INTERVAL", "15"))      # 最短轮询间隔（秒）
+POLL_MAX_INTERVAL = int(os.getenv("POLL_MAX_INTERVAL", "1800"))    # 最长轮询间隔（秒）
+POLL_BUDGET_RPM   = int(os.getenv("POLL_BUDGET_RPM", "120"))       # 全局每分钟最多发起的频道请求数
+POLL_BUDGET_USE   = 0.8         # 排期只用预算的这一部分，余量留给刚更新频道的加密轮询与失败重试
+POLL_DORMANT_SEC  = int(os.getenv("POLL_DORMANT_SEC", str(30 * 86400)))   # 这么久没更新（且远超平常节奏）才算休眠
+POLL_DEFAULT_GAP  = 86400.0     # 没有历史的频道按每天一更估计可能性
+POLL_HOT_SEC      = 30 * 60     # 刚发现新视频后保持最短间隔的时长（连发窗口）
+POLL_HISTORY_MAX  = 50          # 每个频道保留的最近上传时间个数
+POLL_JITTER       = 0.1         # ±10% 随机抖动，避免所有频道同时到期
+# -------------------------
+
+class _TokenBucket:
+    def __init__(self, rpm: int):
+        self.capacity = max(1, rpm)
+        self.rate = self.capacity / 60.0
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+class PollScheduler:
+    """
+    - pop_due()：取出已到期的频道（受令牌桶限制，不够的留在堆里稍后再取）
+    - report(url, new_count)：一次轮询结束后回报结果，记录历史并安排下次时刻
+    - next_wakeup()：距最近一个到期频道还有多少秒
+    history 为 {url: [上传（发现）时间戳, ...]}，通常来自 SeenStore.upload_times()。
+    """
+
+    def __init__(self, urls: Iterable[str], base_interval: int,
+                 history: Optional[Dict[str, List[float]]] = None,
+                 min_interval: int = POLL_MIN_INTERVAL,
+                 max_interval: int = POLL_MAX_INTERVAL,
+                 budget_rpm: int = POLL_BUDGET_RPM):
+        self._base = base_interval
+        self._min = min_interval
+        self._max = max(min_interval, max_interval)
+        self._budget = max(1, budget_rpm) / 60.0 * POLL_BUDGET_USE      # 可排期的请求数 / 秒
+        self._bucket = _TokenBucket(budget_rpm)
+        self._lock = threading.Lock()
+        self._history: Dict[str, List[float]] = {}
+        self._hot_until: Dict[str, float] = {}
+        self._heap: List[tuple] = []
+        now = time.time()
+        for u in dict.fromkeys(urls):
+            self._history[u] = _collapse(sorted((history or {}).get(u, [])))[-POLL_HISTORY_MAX:]
+            # 启动时全部立即轮询一次，之后才按各自节奏错开
+            heapq.heappush(self._heap, (now, u))
+
+    # ---- 学习 ----
+    def _likelihood(self, url: str, now: float):
+        """(此刻每秒出新视频的估计频率, 是否休眠)。"""
+        hist = self._history.get(url) or []
+        if len(hist) < 3:
+            return 1.0 / POLL_DEFAULT_GAP, False
+        gaps = [b - a for a, b in zip(hist, hist[1:])]
+        since = now - hist[-1]
+        if since > max(4 * max(gaps), POLL_DORMANT_SEC):
+            return 0.0, True
+        rate = 1.0 / max(60.0, statistics.median(gaps))
+
+        # 时段：当前小时（本地时间）的上传占比相对平均的倍数，平滑后限制在 [0.25, 3]
+        hours = [0] * 24
+        for ts in hist:
+            hours[time.localtime(ts).tm_hour] += 1
+        share = (hours[time.localtime(now).tm_hour] + 0.5) / (len(hist) + 12.0)
+        rate *= min(3.0, max(0.25, share * 24))
+
+        # 距上次上传已远超平常节奏：可能性递减
+        if since > 4 * max(gaps):
+            rate /= 2
+        return rate, False
+
+    def interval_for(self, url: str, now: Optional[float] = None) -> float:
+        """
+        按预算分配：普通频道保底 1/基础间隔，休眠频道保底 1/最长间隔；
+        保底之外的剩余预算按可能性加权分给各频道。保底之和已超预算时按比例整体放慢。
+        """
+        now = now or time.time()
+        if self._hot_until.get(url, 0) > now:
+            return self._min
+        floors, weights = {}, {}
+        for u in self._history:
+            w, dormant = self._likelihood(u, now)
+            floors[u] = 1.0 / (self._max if dormant else self._base)
+            weights[u] = w
+        floor_sum, weight_sum = sum(floors.values()), sum(weights.values())
+        spare = self._budget - floor_sum
+        if spare <= 0:
+            rate = floors[url] * self._budget / floor_sum
+        else:
+            rate = floors[url] + (spare * weights[url] / weight_sum if weight_sum > 0 else 0.0)
+        return min(self._max, max(self._min, 1.0 / rate))
+
+    def report(self, url: str, new_count: int, when: Optional[float] = None):
+        now = when or time.time()
+        with self._lock:
+            hist = self._history.setdefault(url, [])
+            if new_count > 0:
+                if not hist or now - hist[-1] > 60:
+                    hist.append(now)
+                self._history[url] = hist[-POLL_HISTORY_MAX:]
+                self._hot_until[url] = now + POLL_HOT_SEC
+            iv = self.interval_for(url, now)
+            iv *= 1 + random.uniform(-POLL_JITTER, POLL_JITTER)
+            heapq.heappush(self._heap, (now + iv, url))
+
+    def reschedule_failed(self, url: str):
+        """拉取失败：按基础间隔重试，不计入历史。"""
+        with self._lock:
+            heapq.heappush(self._heap, (time.time() + self._base, url))
+
+    # ---- 出队 ----
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        now = now or time.time()
+        out: List[str] = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                if not self._bucket.take():
+                    break
+                out.append(heapq.heappop(self._heap)[1])
+        return out
+
+    def next_wakeup(self, now: Optional[float] = None) -> float:
+        now = now or time.time()
+        with self._lock:
+            if not self._heap:
+                return float(self._base)
+            wait = self._heap[0][0] - now
+            if wait <= 0:
+                wait = self._bucket.wait_time()
+        return max(0.0, wait)
+
+def _collapse(ts: List[float], within: float = 60.0) -> List[float]:
+    """同一分钟内的多条记录（首次记录 / 连发）合并为一次，避免把间隔学成 0。"""
+    out: List[float] = []
+    for t in ts:
+        if not out or t - out[-1] > within:
+            out.append(t)
+    return out
@@ -0,0 +1,93 @@
+# rss_feed.py
+# YouTube 频道 Atom feed 变化检测：requests.Session 连接池复用 keep-alive，
+# 携带 ETag / If-Modified-Since 做条件请求，未变化的 feed 只花一个 304。
+
+import os, re, threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+
+FEED_URL_TMPL    = "https://www.youtube.com/feeds/videos.xml?channel_id={uc}"
+FEED_TIMEOUT_SEC = int(os.getenv("FEED_TIMEOUT_SEC", "10"))
+FEED_POOL_SIZE   = int(os.getenv("FEED_POOL_SIZE", "16"))     # 与并发轮询在途数对齐
+
+_NS = {"atom": "http://www.w3.org/2005/Atom", "yt": "http://www.youtube.com/xml/schemas/2015"}
+
+def _ts(text: Optional[str]) -> Optional[float]:
+    """Atom 时间（2015-03-09T19:05:24.552394234+00:00）→ 时间戳；小数秒可能多于 6 位，截掉。"""
+    if not text:
+        return None
+    try:
+        return datetime.fromisoformat(re.sub(r"\.\d+", "", text.strip()).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+def parse_feed_times(data: bytes) -> List[Tuple[str, str, Optional[float], Optional[float]]]:
+    """解析 Atom feed，返回 [(title, video_id, published, updated), ...]，按 feed 顺序（最新在前）。"""
+    root = ET.fromstring(data)
+    out = []
+    for entry in root.findall("atom:entry", _NS):
+        vid = entry.findtext("yt:videoId", default="", namespaces=_NS)
+        title = entry.findtext("atom:title", default="", namespaces=_NS)
+        if vid:
+            out.append((title, vid, _ts(entry.findtext("atom:published", namespaces=_NS)),
+                        _ts(entry.findtext("atom:updated", namespaces=_NS))))
+    return out
+
+def parse_feed(data: bytes) -> List[Tuple[str, str]]:
+    """解析 Atom feed，返回 [(title, video_id), ...]，按 feed 顺序（最新在前）。"""
+    return [(title, vid) for title, vid, _, _ in parse_feed_times(data)]
+
+class FeedWatcher:
+    """
+    每个 UC 频道记住上次的 ETag/Last-Modified 与解析结果：
+    - 200：重新解析并更新缓存
+    - 304：直接返回缓存（无 body、无解析）
+    线程安全，可在 ChannelPoller 的线程池里共用一个实例。
+    """
+
+    def __init__(self, pool_size: int = FEED_POOL_SIZE, timeout: int = FEED_TIMEOUT_SEC):
+        self._timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self._session.mount("https://", adapter)
+        self._session.headers.update({"User-Agent": "Mozilla/5.0"})
+        self._session.trust_env = False          # 与 yt-dlp 一致：不走任何代理
+        self._lock = threading.Lock()
+        self._validators: Dict[str, Dict[str, str]] = {}
+        self._entries: Dict[str, List[Tuple[str, str]]] = {}
+
+    def entries(self, uc_id: str) -> List[Tuple[str, str]]:
+        """返回频道最新条目列表；网络/解析失败抛异常，由调用方决定回退。"""
+        with self._lock:
+            headers = dict(self._validators.get(uc_id) or {})
+        r = self._session.get(FEED_URL_TMPL.format(uc=uc_id), headers=headers, timeout=self._timeout)
+        if r.status_code == 304:
+            with self._lock:
+                cached = self._entries.get(uc_id)
+            if cached is not None:
+                return cached
+            # 缓存丢失却收到 304：去掉校验头再拉一次
+            r = self._session.get(FEED_URL_TMPL.format(uc=uc_id), timeout=self._timeout)
+        r.raise_for_status()
+
+        items = parse_feed(r.content)
+        validators = {}
+        if r.headers.get("ETag"):
+            validators["If-None-Match"] = r.headers["ETag"]
+        if r.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = r.headers["Last-Modified"]
+        with self._lock:
+            self._validators[uc_id] = validators
+            self._entries[uc_id] = items
+        return items
+
+    def latest(self, uc_id: str) -> Optional[Tuple[str, str]]:
+        """(title, video_id) 或 None。"""
+        items = self.entries(uc_id)
+        return items[0] if items else None
+
+    def close(self):
+        self._session.close()
@@ -0,0 +1,281 @@
+# seen_store.py
+# 持久化“已见 / 已处理”视频记录：SQLite（WAL 模式）+ 主键索引，进程重启后秒级恢复，
+# 不再每次重启都“首次记录”，也不会重复搬运已经投稿成功的视频。
+# 每个进程（生产者 / 各 worker）各自打开一个 SeenStore 实例，WAL 保证读写互不阻塞。
+
+import os, time, sqlite3, threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Tuple
+
+SEEN_DB_PATH = os.getenv("SEEN_DB_PATH", "seen_videos.db")
+JOB_RETRY_MAX         = int(os.getenv("JOB_RETRY_MAX", "3"))             # 失败的点播任务最多自动重试几次
+JOB_RETRY_BACKOFF_SEC = int(os.getenv("JOB_RETRY_BACKOFF_SEC", "900"))   # 首次重试等待，之后每次翻倍
+
+# 任务状态
+JOB_QUEUED  = "queued"
+JOB_RUNNING = "running"
+JOB_DONE    = "done"
+JOB_FAILED  = "failed"
+JOB_SKIPPED = "skipped"     # 熔断 / 超长 / 地区限制等主动放弃，不再重试
+JOB_UPCOMING = "upcoming"   # 预约直播 / 首映，等开播
+JOB_NEW     = "new"         # 刚发现、还没查 watch 信息（类型 / 时长）
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_head (
+    channel     TEXT PRIMARY KEY,
+    video_id    TEXT NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen (
+    channel     TEXT NOT NULL,
+    video_id    TEXT NOT NULL,
+    title       TEXT,
+    first_seen  REAL NOT NULL,
+    PRIMARY KEY (channel, video_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS jobs (
+    video_id    TEXT PRIMARY KEY,
+    channel     TEXT,
+    title       TEXT,
+    url         TEXT,
+    is_live     INTEGER NOT NULL DEFAULT 0,
+    status      TEXT NOT NULL,
+    detail      TEXT,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status);
+CREATE TABLE IF NOT EXISTS upcoming (
+    video_id    TEXT PRIMARY KEY,
+    start_at    REAL
+);
+CREATE TABLE IF NOT EXISTS retries (
+    video_id    TEXT PRIMARY KEY,
+    attempts    INTEGER NOT NULL,
+    next_at     REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS client_pref (
+    channel     TEXT PRIMARY KEY,
+    clients     TEXT NOT NULL,
+    updated_at  REAL NOT NULL
+);
+"""
+
+class SeenStore:
+    """
+    - channel_head：每个频道最近一次看到的最新 ID（替代内存里的 last_ids）
+    - seen：频道下所有见过的 ID；启动时整表载入内存 set，成员判断 O(1)
+    - jobs：每个视频的处理结果（new/queued/running/done/failed/skipped/upcoming）
+    - client_pref：每个频道上次拿到高清的 yt-dlp player_client，下次优先预检
+    - upcoming：预约直播 / 首映的计划开播时间（任务本身在 jobs 里，状态 upcoming）
+    - retries：失败任务的失败次数与下次重试时刻（指数退避，最多 JOB_RETRY_MAX 次）
+    """
+
+    def __init__(self, path: str = SEEN_DB_PATH):
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._seen: Dict[str, Set[str]] = {}
+        for ch, vid in self._db.execute("SELECT channel, video_id FROM seen"):
+            self._seen.setdefault(ch, set()).add(vid)
+
+    # ---- 频道进度 ----
+    def heads(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._db.execute("SELECT channel, video_id FROM channel_head"))
+
+    def head(self, channel: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT video_id FROM channel_head WHERE channel=?", (channel,)).fetchone()
+        return row[0] if row else None
+
+    def is_seen(self, channel: str, video_id: str) -> bool:
+        return video_id in self._seen.get(channel, ())
+
+    def mark_seen(self, channel: str, video_id: str, title: str = "", head: bool = True):
+        """记录已见；head=True 时同时推进该频道的最新 ID。"""
+        now = time.time()
+        with self._lock:
+            with self._tx():
+                self._insert_seen(channel, video_id, title, head, now)
+            self._seen.setdefault(channel, set()).add(video_id)
+
+    def mark_new(self, channel: str, video_id: str, title: str, url: str, head: bool = True):
+        """
+        新视频：建任务（状态 new）与记已见放在同一事务里，已有任务的保持原状。
+        之后查 watch 信息再慢再失败、进程中途崩溃，也不会留下“已见却没有任务”的视频：
+        重启后 new_jobs() 接着处理。
+        """
+        now = time.time()
+        with self._lock:
+            with self._tx():
+                self._db.execute(
+                    "INSERT OR IGNORE INTO jobs(video_id, channel, title, url, status, updated_at) VALUES (?,?,?,?,?,?)",
+                    (video_id, channel, title, url, JOB_NEW, now))
+                self._insert_seen(channel, video_id, title, head, now)
+            self._seen.setdefault(channel, set()).add(video_id)
+
+    @contextmanager
+    def _tx(self):
+        """显式事务（调用方持有 _lock）；任何一步出错都回滚，免得共享连接停在未结束的事务里。"""
+        self._db.execute("BEGIN")
+        try:
+            yield
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _insert_seen(self, channel: str, video_id: str, title: str, head: bool, now: float):
+        self._db.execute(
+            "INSERT OR IGNORE INTO seen(channel, video_id, title, first_seen) VALUES (?,?,?,?)",
+            (channel, video_id, title, now))
+        if head:
+            self._db.execute(
+                "INSERT INTO channel_head(channel, video_id, updated_at) VALUES (?,?,?) "
+                "ON CONFLICT(channel) DO UPDATE SET video_id=excluded.video_id, updated_at=excluded.updated_at",
+                (channel, video_id, now))
+
+    def upload_times(self) -> Dict[str, List[float]]:
+        """{channel: [首次见到各视频的时间戳, ...]}，升序；供轮询调度学习更新节奏。"""
+        out: Dict[str, List[float]] = {}
+        with self._lock:
+            for ch, ts in self._db.execute("SELECT channel, first_seen FROM seen ORDER BY first_seen"):
+                out.setdefault(ch, []).append(ts)
+        return out
+
+    # ---- 任务结果 ----
+    def job_status(self, video_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT status FROM jobs WHERE video_id=?", (video_id,)).fetchone()
+        return row[0] if row else None
+
+    def is_finished(self, video_id: str) -> bool:
+        return self.job_status(video_id) in (JOB_DONE, JOB_SKIPPED)
+
+    def set_job(self, video_id: str, status: str, channel: Optional[str] = None,
+                title: Optional[str] = None, url: Optional[str] = None,
+                is_live: Optional[bool] = None, detail: Optional[str] = None):
+        """插入或更新任务；未给出的字段保留原值。记为失败时累计失败次数并排好下次重试。"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs(video_id, channel, title, url, is_live, status, detail, updated_at) "
+                "VALUES (?,?,?,?,?,?,?,?) "
+                "ON CONFLICT(video_id) DO UPDATE SET "
+                "channel=COALESCE(excluded.channel, jobs.channel), "
+                "title=COALESCE(excluded.title, jobs.title), "
+                "url=COALESCE(excluded.url, jobs.url), "
+                "is_live=CASE WHEN ? IS NULL THEN jobs.is_live ELSE excluded.is_live END, "
+                "status=excluded.status, detail=excluded.detail, updated_at=excluded.updated_at",
+                (video_id, channel, title, url, int(bool(is_live)), status,
+                 (detail or "")[:500] or None, now, is_live))
+            if status == JOB_FAILED:
+                row = self._db.execute("SELECT attempts FROM retries WHERE video_id=?", (video_id,)).fetchone()
+                attempts = (row[0] if row else 0) + 1
+                self._db.execute(
+                    "INSERT INTO retries(video_id, attempts, next_at) VALUES (?,?,?) "
+                    "ON CONFLICT(video_id) DO UPDATE SET attempts=excluded.attempts, next_at=excluded.next_at",
+                    (video_id, attempts, now + JOB_RETRY_BACKOFF_SEC * 2 ** (attempts - 1)))
+            elif status in (JOB_DONE, JOB_SKIPPED):
+                self._db.execute("DELETE FROM retries WHERE video_id=?", (video_id,))
+
+    def job_channel(self, video_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT channel FROM jobs WHERE video_id=?", (video_id,)).fetchone()
+        return row[0] if row else None
+
+    # ---- 客户端偏好 ----
+    def client_pref(self, channel: str) -> Optional[List[str]]:
+        with self._lock:
+            row = self._db.execute("SELECT clients FROM client_pref WHERE channel=?", (channel,)).fetchone()
+        return row[0].split(",") if row else None
+
+    def set_client_pref(self, channel: str, clients: List[str]):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO client_pref(channel, clients, updated_at) VALUES (?,?,?) "
+                "ON CONFLICT(channel) DO UPDATE SET clients=excluded.clients, updated_at=excluded.updated_at",
+                (channel, ",".join(clients), time.time()))
+
+    def pending_jobs(self) -> List[Tuple[str, str, str, bool]]:
+        """上次退出时仍在排队 / 处理中的任务：[(video_id, title, url, is_live), ...]，按入队先后。"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT video_id, title, url, is_live FROM jobs WHERE status IN (?, ?) ORDER BY updated_at",
+                (JOB_QUEUED, JOB_RUNNING)).fetchall()
+        return [(vid, title or "", url, bool(live)) for vid, title, url, live in rows]
+
+    def new_jobs(self) -> List[Tuple[str, str, str, str]]:
+        """已记为已见、但上次退出前还没查完 watch 信息的视频：[(video_id, channel, title, url), ...]。"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT video_id, channel, title, url FROM jobs WHERE status=? ORDER BY updated_at",
+                (JOB_NEW,)).fetchall()
+        return [(vid, ch, title or "", url) for vid, ch, title, url in rows]
+
+    # ---- 失败重试 ----
+    def will_retry(self, video_id: str) -> bool:
+        """失败的任务是否还会自动重试（决定暂存目录保留还是删除）；直播只有录到分段的才续传。"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT j.status, r.attempts FROM jobs j "
+                "LEFT JOIN retries r ON r.video_id = j.video_id WHERE j.video_id=?", (video_id,)).fetchone()
+        if not row or row[0] != JOB_FAILED:
+            return False
+        return row[1] is not None and row[1] <= JOB_RETRY_MAX
+
+    def retry_due(self, now: Optional[float] = None) -> List[Tuple[str, str, str, bool]]:
+        """到了重试时刻的失败任务：[(video_id, title, url, is_live), ...]。"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT j.video_id, j.title, j.url, j.is_live FROM jobs j JOIN retries r ON r.video_id = j.video_id "
+                "WHERE j.status=? AND r.attempts<=? AND r.next_at<=? ORDER BY r.next_at",
+                (JOB_FAILED, JOB_RETRY_MAX, now or time.time())).fetchall()
+        return [(vid, title or "", url, bool(live)) for vid, title, url, live in rows if url]
+
+    def no_retry(self, video_id: str):
+        """不再自动重试（如没录到任何分段的直播）；任务状态与失败原因保持不变。"""
+        with self._lock:
+            self._db.execute("DELETE FROM retries WHERE video_id=?", (video_id,))
+
+    # ---- 预约直播 ----
+    def set_upcoming(self, video_id: str, start_at: Optional[float], channel: Optional[str] = None,
+                     title: Optional[str] = None, url: Optional[str] = None):
+        self.set_job(video_id, JOB_UPCOMING, channel=channel, title=title, url=url, is_live=True)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO upcoming(video_id, start_at) VALUES (?,?) "
+                "ON CONFLICT(video_id) DO UPDATE SET start_at=excluded.start_at",
+                (video_id, start_at))
+
+    def drop_upcoming(self, video_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM upcoming WHERE video_id=?", (video_id,))
+
+    def upcoming_jobs(self) -> List[Tuple[str, str, str, str, Optional[float]]]:
+        """仍在等开播的任务：[(video_id, channel, title, url, start_at), ...]。"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT j.video_id, j.channel, j.title, j.url, u.start_at FROM jobs j "
+                "LEFT JOIN upcoming u ON u.video_id = j.video_id WHERE j.status=?",
+                (JOB_UPCOMING,)).fetchall()
+        return [(vid, ch or "", title or "", url, start) for vid, ch, title, url, start in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def video_id_from_url(url: str) -> str:
+    """https://www.youtube.com/watch?v=<id> → <id>；取不到则原样返回。"""
+    from urllib.parse import urlparse, parse_qs
+    try:
+        q = parse_qs(urlparse(url).query)
+        if q.get("v"):
+            return q["v"][0]
+    except Exception:
+        pass
+    return url
@@ -0,0 +1,99 @@
+# staging.py
+# 按视频 ID 划分的持久暂存目录：downloads/jobs/<video_id>。
+# 失败 / 中断的任务保留 .part、分片与 .ytdl 进度文件，自动重试（SeenStore.retry_due）或重启后 yt-dlp 直接续传；
+# 成功 / 放弃 / 重试次数用尽的任务立即删除；其余按保留策略（时长 + 总量上限）定期清理。
+
+import os, time, shutil
+from typing import Callable, List, Optional, Tuple
+
+from seen_store import JOB_QUEUED, JOB_RUNNING, JOB_FAILED
+
+# -------- 可调参数 --------
+STAGING_DIR           = os.getenv("STAGING_DIR", os.path.join("downloads", "jobs"))
+STAGING_RETENTION_SEC = int(os.getenv("STAGING_RETENTION_SEC", str(48 * 3600)))   # 失败任务的暂存最多保留多久
+STAGING_MAX_BYTES     = int(os.getenv("STAGING_MAX_BYTES", str(50 << 30)))        # 暂存总量上限，超出从最旧的失败任务删起
+STAGING_PRUNE_SEC     = 3600        # 生产者多久清理一次
+# -------------------------
+
+def _safe_id(video_id: str) -> str:
+    vid = "".join(c for c in (video_id or "") if c.isalnum() or c in "-_")
+    if not vid:
+        raise ValueError(f"无效的视频 ID：{video_id!r}")
+    return vid
+
+def job_path(video_id: str, root: str = STAGING_DIR) -> str:
+    """该视频暂存目录的路径（只查看，不创建也不刷新 mtime）。"""
+    return os.path.join(root, _safe_id(video_id))
+
+def job_dir(video_id: str, root: str = STAGING_DIR) -> str:
+    """该视频的暂存目录（不存在则创建）；每次取用刷新 mtime，保留期从最近一次使用算起。"""
+    d = job_path(video_id, root)
+    existed = os.path.isdir(d)
+    os.makedirs(d, exist_ok=True)
+    os.utime(d)
+    if existed and os.listdir(d):
+        print(f"[暂存] 复用 {d}（上次未完成，尝试续传）")
+    return d
+
+def _size(path: str) -> int:
+    total = 0
+    for r, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(r, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def discard(video_id: str, root: str = STAGING_DIR):
+    d = os.path.join(root, _safe_id(video_id))
+    if not os.path.isdir(d):
+        return
+    freed = _size(d)
+    shutil.rmtree(d, ignore_errors=True)
+    print(f"[暂存] 已删除 {d}（{freed / (1 << 20):.0f} MiB）")
+
+def keep(video_id: str, root: str = STAGING_DIR):
+    d = os.path.join(root, _safe_id(video_id))
+    if os.path.isdir(d):
+        print(f"[暂存] 保留 {d}（{_size(d) / (1 << 20):.0f} MiB）供重试续传")
+
+def prune(job_status: Callable[[str], Optional[str]], root: str = STAGING_DIR,
+          retention_sec: int = STAGING_RETENTION_SEC, max_bytes: int = STAGING_MAX_BYTES,
+          will_retry: Optional[Callable[[str], bool]] = None):
+    """
+    - 排队 / 处理中的任务：保留（重启后 _resume_pending 会接着用）
+    - 失败的任务：不会再重试（will_retry 为假）或超过 retention_sec 删除
+    - 已完成 / 放弃 / 账上查不到的：删除
+    最后总量仍超 max_bytes 时，从最旧的失败任务开始删。
+    """
+    if not os.path.isdir(root):
+        return
+    now = time.time()
+    failed: List[Tuple[float, int, str]] = []
+    total, removed = 0, 0
+    for name in os.listdir(root):
+        d = os.path.join(root, name)
+        if not os.path.isdir(d):
+            continue
+        status = job_status(name)
+        if status in (JOB_QUEUED, JOB_RUNNING):
+            total += _size(d)
+            continue
+        mtime = os.path.getmtime(d)
+        if (status == JOB_FAILED and now - mtime <= retention_sec
+                and (will_retry is None or will_retry(name))):
+            sz = _size(d)
+            total += sz
+            failed.append((mtime, sz, d))
+            continue
+        shutil.rmtree(d, ignore_errors=True)
+        removed += 1
+    failed.sort()
+    while total > max_bytes and failed:
+        _, sz, d = failed.pop(0)
+        shutil.rmtree(d, ignore_errors=True)
+        total -= sz
+        removed += 1
+    if removed:
+        print(f"[暂存] 清理 {removed} 个过期目录，剩余 {total / (1 << 30):.1f} GiB")
@@ -0,0 +1,58 @@
+import os, time
+from http.cookiejar import Cookie
+
+import pytest
+from yt_dlp.cookies import YoutubeDLCookieJar
+
+import cookie_jar
+
+def _cookie(domain, name, value):
+    return Cookie(0, name, value, None, False, domain, True, domain.startswith("."), "/", True,
+                  True, int(time.time()) + 86400, False, None, None, {})
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    browser = {"other": "1"}
+
+    def _extract(name):
+        jar = YoutubeDLCookieJar()
+        jar.set_cookie(_cookie(".youtube.com", "SID", "yt"))
+        jar.set_cookie(_cookie(".example.com", "x", browser["other"]))
+        return jar
+    monkeypatch.setattr("yt_dlp.cookies.extract_cookies_from_browser", _extract)
+    monkeypatch.setattr(cookie_jar, "_browser_db_mtime", lambda b: time.time() + 60)
+    monkeypatch.setattr(cookie_jar, "COOKIE_MIN_AGE_SEC", -1)
+    monkeypatch.setattr(cookie_jar, "COOKIE_CHECK_SEC", 0)
+    monkeypatch.delenv("YTDLP_COOKIES", raising=False)
+    path = str(tmp_path / "c" / "cookies.txt")
+    return cookie_jar.CookieJarService(path=path), path, browser
+
+def test_default_export_path_is_outside_repo():
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert not os.path.abspath(cookie_jar.COOKIE_EXPORT_PATH).startswith(repo + os.sep)
+
+def test_export_keeps_only_youtube_cookies(service):
+    svc, path, _ = service
+    svc.ydl_opts()
+    text = open(path, encoding="utf-8").read()
+    assert "youtube.com" in text and "example.com" not in text
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+def test_unrelated_browser_changes_keep_cookie_object(service):
+    svc, _, browser = service
+    first = svc.ydl_opts()["cookiefile"]
+    browser["other"] = "2"          # 浏览器库变了，但不是 YouTube 的 cookie
+    assert svc.ydl_opts()["cookiefile"] is first
+
+def test_failed_export_is_not_retried_on_every_call(service, monkeypatch):
+    svc, _, _ = service
+    calls = []
+
+    def _broken(name):
+        calls.append(name)
+        raise OSError("keyring locked")
+    monkeypatch.setattr("yt_dlp.cookies.extract_cookies_from_browser", _broken)
+    monkeypatch.setattr(cookie_jar, "COOKIE_CHECK_SEC", 30)
+    for _ in range(5):
+        assert svc.ydl_opts() == {"cookiesfrombrowser": ("firefox",)}
+    assert len(calls) == 1
@@ -0,0 +1,27 @@
+import pytest
+
+dv = pytest.importorskip("download_video")
+
+def test_content_time_comes_from_bytes_not_wall_clock():
+    # 从头录：1 秒内拉下 10 MB、码率 8000 kbps → 已录 10 秒内容
+    d = {"status": "downloading", "downloaded_bytes": 10_000_000, "elapsed": 1.0,
+         "info_dict": {"tbr": 8000}}
+    assert dv._content_sec(d) == pytest.approx(10.0)
+
+def test_content_time_falls_back_to_elapsed():
+    assert dv._content_sec({"downloaded_bytes": 123, "elapsed": 42.0, "info_dict": {}}) == 42.0
+
+def test_live_cap_is_not_retried_with_other_clients(monkeypatch, tmp_path):
+    calls = []
+
+    def _download(url, opts, clients):
+        calls.append(clients)
+        raise dv.DownloadError("LIVE_TIME_LIMIT_REACHED")
+    monkeypatch.setattr(dv, "_base_ydl_opts", lambda work_dir, is_live=False: {})
+    monkeypatch.setattr(dv, "_hedged_probe", lambda url, order, opts: (None, None, None))
+    monkeypatch.setattr(dv.disk_space, "reserve", lambda *a, **k: None)
+    monkeypatch.setattr(dv, "_download_with_clients", _download)
+    with pytest.raises(dv.DownloadError, match="LIVE_TIME_LIMIT_REACHED"):
+        dv.download_video("https://www.youtube.com/watch?v=x", work_dir=str(tmp_path),
+                          is_live=True, live_max_sec=60)
+    assert len(calls) == 1
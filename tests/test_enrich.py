@@ -0,0 +1,35 @@
+import queue, threading
+import multiprocessing as mp
+
+import pytest
+
+enrich = pytest.importorskip("enrich")
+
+def test_concurrent_submit_enqueues_once():
+    with mp.Manager() as manager:
+        results, q = manager.dict(), queue.Queue()
+        start = threading.Barrier(8)
+
+        def _submit():
+            start.wait()
+            enrich.submit(q, results, "v", "标题")
+        threads = [threading.Thread(target=_submit) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert q.qsize() == 1
+        assert "pending" in results["v"]
+        assert enrich.failed(results, "v") is None
+
+def test_worker_discards_result_of_finished_job(monkeypatch, tmp_path):
+    m = pytest.importorskip("multiproc_main")
+    store = m.SeenStore(str(tmp_path / "seen.db"))
+    store.set_job("done1", m.JOB_DONE)
+    monkeypatch.setattr(m, "SeenStore", lambda: store)
+    results, tasks = {}, queue.Queue()
+    enrich.submit(queue.Queue(), results, "done1", "t")
+    tasks.put(("t", "https://www.youtube.com/watch?v=done1", False, None))
+    tasks.put(None)
+    m.worker_loop("W", tasks, queue.Queue(), queue.Queue(), results, threading.Event())
+    assert results == {}
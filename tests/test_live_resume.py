@@ -0,0 +1,91 @@
+import json, queue
+
+import pytest
+
+import seen_store
+import staging
+from seen_store import SeenStore, JOB_FAILED, JOB_RUNNING
+
+URL = "https://www.youtube.com/watch?v="
+
+def _recorded(root, vid, parts=("part_0000.mp4", "part_0001.mp4")):
+    d = root / vid
+    d.mkdir()
+    (d / "live.json").write_text(json.dumps({"cover": "cover.jpg", "description": "简介",
+                                             "source_link": URL + vid}), encoding="utf-8")
+    for p in parts:
+        (d / p).write_bytes(b"\0")
+    return str(d)
+
+def test_download_video_returns_recorded_parts(tmp_path):
+    dv = pytest.importorskip("download_video")
+    d = _recorded(tmp_path, "liv")
+    assert dv.live_resumable(d)
+    parts, cover, desc, link = dv.download_video(URL + "liv", work_dir=d, is_live=True)
+    assert parts == ["part_0000.mp4", "part_0001.mp4"]
+    assert (cover, desc, link) == ("cover.jpg", "简介", URL + "liv")
+
+@pytest.fixture
+def mp_main(monkeypatch, tmp_path):
+    m = pytest.importorskip("multiproc_main")
+    root = tmp_path / "jobs"
+    root.mkdir()
+    monkeypatch.setattr(staging, "job_path", lambda vid: str(root / vid))
+    return m, root
+
+def _queues():
+    return {"vod": queue.Queue(), "live": queue.Queue(), "enrich": queue.Queue(), "results": {}}
+
+def test_restart_uploads_recorded_live_parts(mp_main, tmp_path):
+    m, root = mp_main
+    _recorded(root, "rec")
+    s = SeenStore(str(tmp_path / "seen.db"))
+    s.set_job("rec", JOB_RUNNING, title="录了两段", url=URL + "rec", is_live=True)
+    s.set_job("none", JOB_RUNNING, title="没录到", url=URL + "none", is_live=True)
+    q = _queues()
+    m._resume_pending(s, q)
+    assert q["vod"].get_nowait() == ("录了两段", URL + "rec", True, None)
+    assert q["vod"].empty()
+    assert s.job_status("none") == JOB_FAILED and not s.will_retry("none")
+    s.close()
+
+def test_live_upload_failure_keeps_parts_for_retry(mp_main, tmp_path, monkeypatch):
+    m, root = mp_main
+    monkeypatch.setattr(seen_store, "JOB_RETRY_BACKOFF_SEC", 0)
+    d = _recorded(root, "up")
+    _recorded(root, "gone", parts=())
+    s = SeenStore(str(tmp_path / "seen.db"))
+    s.set_job("up", JOB_FAILED, title="上传失败", url=URL + "up", is_live=True, detail="boom")
+    s.set_job("gone", JOB_FAILED, title="没分段", url=URL + "gone", is_live=True, detail="boom")
+    m._finish_job(s, "up", d, True)
+    assert s.will_retry("up") and m.live_resumable(d)
+    q = _queues()
+    m._retry_failed(s, q)
+    assert q["vod"].get_nowait() == ("上传失败", URL + "up", True, None)
+    assert q["vod"].empty()
+    assert not s.will_retry("gone")
+    s.close()
+
+def test_recorder_meters_segment_growth(tmp_path, monkeypatch):
+    import bandwidth, live_recorder
+    got = []
+    monkeypatch.setattr(bandwidth, "meter_bytes", got.append)
+    rec = live_recorder.SegmentRecorder([], str(tmp_path), None)
+    seg = tmp_path / "seg_0000.ts"
+    seg.write_bytes(b"x" * 100)
+    rec._meter()
+    with open(seg, "ab") as f:
+        f.write(b"x" * 50)
+    rec._meter()
+    rec._meter()
+    assert got == [100, 50]
+
+def test_resume_never_starts_a_new_recording(tmp_path, monkeypatch):
+    dv = pytest.importorskip("download_video")
+    d = _recorded(tmp_path, "bad", parts=())
+    (tmp_path / "bad" / "seg_0000.ts").write_bytes(b"\0")
+    monkeypatch.setattr(dv.live_recorder, "_valid", lambda path: False)     # 残留分段全部无效
+    monkeypatch.setattr(dv, "_hedged_probe", lambda *a: pytest.fail("不应重新录制"))
+    with pytest.raises(RuntimeError, match="没有可续传的直播分段"):
+        dv.download_video(URL + "bad", work_dir=d, is_live=True, resume_only=True)
+    assert not dv.live_resumable(d)
@@ -0,0 +1,38 @@
+from collections import deque
+
+import pytest
+
+import seen_store
+from seen_store import SeenStore, JOB_FAILED, JOB_QUEUED, JOB_SKIPPED
+
+URL = "https://www.youtube.com/watch?v="
+
+@pytest.fixture
+def main(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)         # main 在导入时按相对路径打开 seen_videos.db
+    m = pytest.importorskip("main")
+    store = SeenStore(str(tmp_path / "seen.db"))
+    monkeypatch.setattr(m, "seen_store", store)
+    monkeypatch.setattr(m, "video_queue", deque())
+    monkeypatch.setattr(m, "_start_enrichment", lambda vid, title: None)
+    monkeypatch.setattr(seen_store, "JOB_RETRY_BACKOFF_SEC", 0)
+    yield m, store
+    store.close()
+
+def test_retry_after_failed_lookup_still_checks_length(main, monkeypatch):
+    m, store = main
+    store.mark_new("pu", "long", "长视频", URL + "long")
+    store.set_job("long", JOB_FAILED, detail="获取时长失败：timeout")
+    monkeypatch.setattr(m, "get_video_duration", lambda url: 2 * 3600)
+    m.retry_failed_jobs()
+    assert not m.video_queue
+    assert store.job_status("long") == JOB_SKIPPED
+
+def test_retry_queues_video_that_passes_checks(main, monkeypatch):
+    m, store = main
+    store.mark_new("pu", "ok", "短视频", URL + "ok")
+    store.set_job("ok", JOB_FAILED, detail="上传失败")
+    monkeypatch.setattr(m, "get_video_duration", lambda url: 600)
+    m.retry_failed_jobs()
+    assert list(m.video_queue) == [("短视频", URL + "ok")]
+    assert store.job_status("ok") == JOB_QUEUED
@@ -0,0 +1,46 @@
+import time
+
+from poll_scheduler import PollScheduler
+
+DAY = 86400.0
+NOW = time.time()
+
+def _daily(n=30, offset=0.0):
+    return [NOW - DAY * i - offset for i in range(n, 0, -1)]
+
+def _sched(history, urls=None, **kw):
+    urls = urls or list(history)
+    return PollScheduler(urls, base_interval=100, history=history, **kw)
+
+def _rpm(sched, urls):
+    return sum(60.0 / sched.interval_for(u, NOW) for u in urls)
+
+def test_daily_uploaders_stay_within_base_interval():
+    hist = {f"ch{i}": _daily(offset=i * 600) for i in range(70)}
+    s = _sched(hist)
+    ivs = [s.interval_for(u, NOW) for u in hist]
+    assert max(ivs) <= 100
+    assert min(ivs) < 60            # 预算有富余，都比基础间隔更勤
+    assert _rpm(s, hist) <= 120
+
+def test_spare_budget_goes_to_likely_channels():
+    hist = {"busy": [NOW - 3600 * i for i in range(30, 0, -1)], "weekly": _daily(10)[::7] + [NOW - DAY]}
+    hist.update({f"ch{i}": _daily() for i in range(20)})
+    s = _sched(hist)
+    assert s.interval_for("busy", NOW) < s.interval_for("ch0", NOW) <= 100
+    assert _rpm(s, hist) <= 120
+
+def test_dormant_channel_slows_down():
+    hist = {"dead": [NOW - 400 * DAY - DAY * i for i in range(5)][::-1], "live": _daily()}
+    s = _sched(hist, max_interval=1800)
+    assert s.interval_for("dead", NOW) == 1800
+    assert s.interval_for("live", NOW) <= 100
+
+def test_channels_without_history_use_base_or_better():
+    s = _sched({}, urls=[f"new{i}" for i in range(70)])
+    assert s.interval_for("new0", NOW) <= 100
+
+def test_over_budget_scales_everyone_down():
+    urls = [f"ch{i}" for i in range(400)]
+    s = _sched({}, urls=urls, budget_rpm=120)
+    assert _rpm(s, urls) <= 120 * 1.01
@@ -0,0 +1,57 @@
+import pytest
+
+def _feed(ids):
+    return [(f"t-{v}", v, f"https://www.youtube.com/watch?v={v}") for v in ids]
+
+@pytest.fixture
+def mp_main(monkeypatch, tmp_path):
+    m = pytest.importorskip("multiproc_main")
+    dispatched = []
+    monkeypatch.setattr(m, "_dispatch_new", lambda store, queues, pu, title, vid, vurl: dispatched.append(vid))
+    monkeypatch.setattr(m, "_windows", m.BurstWindow())
+    store = m.SeenStore(str(tmp_path / "seen.db"))
+    yield m, store, dispatched
+    store.close()
+
+def _seed(store, pu, ids):
+    for v in reversed(ids):
+        store.mark_seen(pu, v, head=False)
+    store.mark_seen(pu, ids[0])
+
+def test_rss_list_is_not_cut_to_window(mp_main):
+    m, store, dispatched = mp_main
+    ids = [f"v{i}" for i in range(15, 0, -1)]          # v15 最新
+    _seed(store, "pu", ids[10:])                          # v5..v1 已见
+    n = m._handle_entries(store, None, "pu", _feed(ids), "rss")
+    assert n == 10
+    assert dispatched == [f"v{i}" for i in range(6, 16)]
+
+def test_all_new_fetches_longer_list(mp_main, monkeypatch):
+    m, store, dispatched = mp_main
+    older = [f"o{i}" for i in range(5, 0, -1)]
+    _seed(store, "pu", older)
+    newest = [f"v{i}" for i in range(20, 0, -1)]        # 停机期间发了 20 条
+    monkeypatch.setattr(m, "_recent_ids_via_playlist", lambda url, window=None: _feed(newest + older)[:window])
+    n = m._handle_entries(store, None, "pu", _feed(newest[:15]), "rss")
+    assert n == 20
+    assert dispatched == [f"v{i}" for i in range(1, 21)]
+
+def test_push_does_not_trigger_gap_fill(mp_main, monkeypatch):
+    m, store, dispatched = mp_main
+    _seed(store, "pu", ["a"])
+    monkeypatch.setattr(m, "_recent_ids_via_playlist", lambda *a, **k: pytest.fail("不应补拉"))
+    assert m._handle_entries(store, None, "pu", _feed(["b"]), "websub") == 1
+
+def test_new_video_has_job_before_lookup(monkeypatch, tmp_path):
+    m = pytest.importorskip("multiproc_main")
+    store = m.SeenStore(str(tmp_path / "seen.db"))
+    _seed(store, "pu", ["a"])
+
+    def _killed(vurl):
+        raise KeyboardInterrupt         # 查 watch 信息时进程被杀
+    monkeypatch.setattr(m, "_get_watch_meta", _killed)
+    with pytest.raises(KeyboardInterrupt):
+        m._handle_entries(store, None, "pu", _feed(["b"]), "websub")
+    assert store.is_seen("pu", "b")
+    assert store.new_jobs() == [("b", "pu", "t-b", "https://www.youtube.com/watch?v=b")]
+    store.close()
@@ -0,0 +1,41 @@
+import os
+
+import staging
+from seen_store import SeenStore, JOB_FAILED, JOB_DONE, JOB_RETRY_MAX
+
+def test_failed_vod_job_is_retried_with_backoff(tmp_path):
+    s = SeenStore(str(tmp_path / "seen.db"))
+    s.set_job("v", JOB_FAILED, title="t", url="https://www.youtube.com/watch?v=v", detail="boom")
+    assert s.will_retry("v")
+    assert s.retry_due() == []                               # 还在退避
+    due = s.retry_due(now=1e12)
+    assert due == [("v", "t", "https://www.youtube.com/watch?v=v", False)]
+    for _ in range(JOB_RETRY_MAX):
+        s.set_job("v", JOB_FAILED)
+    assert not s.will_retry("v")
+    assert s.retry_due(now=1e12) == []
+    s.close()
+
+def test_finished_and_given_up_jobs_are_not_retried(tmp_path):
+    s = SeenStore(str(tmp_path / "seen.db"))
+    s.set_job("live", JOB_FAILED, url="u", is_live=True)
+    assert s.retry_due(now=1e12) == [("live", "", "u", True)]
+    s.no_retry("live")
+    s.set_job("ok", JOB_FAILED, url="u")
+    s.set_job("ok", JOB_DONE)
+    assert not s.will_retry("live")
+    assert s.job_status("live") == JOB_FAILED
+    assert s.retry_due(now=1e12) == []
+    s.close()
+
+def test_prune_keeps_only_retryable_failures(tmp_path):
+    s = SeenStore(str(tmp_path / "seen.db"))
+    root = str(tmp_path / "jobs")
+    for vid in ("retry", "spent"):
+        os.makedirs(os.path.join(root, vid))
+        s.set_job(vid, JOB_FAILED, url="u")
+    for _ in range(JOB_RETRY_MAX):
+        s.set_job("spent", JOB_FAILED)
+    staging.prune(s.job_status, root=root, will_retry=s.will_retry)
+    assert sorted(os.listdir(root)) == ["retry"]
+    s.close()
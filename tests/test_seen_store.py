@@ -0,0 +1,19 @@
+import sqlite3
+
+import pytest
+
+from seen_store import SeenStore, JOB_NEW
+
+def test_failed_write_rolls_back(tmp_path, monkeypatch):
+    s = SeenStore(str(tmp_path / "seen.db"))
+
+    def _locked(*a):
+        raise sqlite3.OperationalError("database is locked")
+    with monkeypatch.context() as mp:
+        mp.setattr(s, "_insert_seen", _locked)
+        with pytest.raises(sqlite3.OperationalError):
+            s.mark_new("pu", "v", "t", "u")
+    assert s.job_status("v") is None            # 建任务的那一步也回滚了
+    s.mark_new("pu", "v", "t", "u")              # 连接没有卡在未结束的事务里
+    assert s.job_status("v") == JOB_NEW and s.is_seen("pu", "v")
+    s.close()
@@ -0,0 +1,75 @@
+import time
+from contextlib import contextmanager
+
+import pytest
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+
+import upcoming
+from upcoming import UpcomingScheduler
+
+START_AT = int(time.time()) + 2 * 3600
+
+class _UpcomingIE(InfoExtractor):
+    """与 YouTube 提取器对预约直播的处理一致：没有格式时 raise_no_formats。"""
+    _VALID_URL = r"https?://fake\.test/watch\?v=(?P<id>\w+)"
+    IE_NAME = "fake_upcoming"
+
+    def _real_extract(self, url):
+        vid = self._match_id(url)
+        self.raise_no_formats("This live event will begin in 2 hours.", expected=True, video_id=vid)
+        return {"id": vid, "title": "预约", "formats": [], "live_status": "is_upcoming",
+                "release_timestamp": START_AT}
+
+@contextmanager
+def _fake_lease(opts):
+    ydl = yt_dlp.YoutubeDL(dict(opts), auto_init=False)
+    ydl.add_info_extractor(_UpcomingIE())
+    yield ydl
+
+@pytest.fixture
+def mp_main(monkeypatch):
+    m = pytest.importorskip("multiproc_main")
+    monkeypatch.setattr(m, "ydl_lease", _fake_lease)
+    monkeypatch.setattr(m, "cookie_opts", lambda: {})
+    monkeypatch.setattr(m, "_upcoming", UpcomingScheduler())
+    return m
+
+def test_watch_meta_reports_upcoming(mp_main):
+    is_live, status, _, start_at = mp_main._get_watch_meta("https://fake.test/watch?v=up1")
+    assert not is_live
+    assert status == "is_upcoming"
+    assert start_at == START_AT
+
+def test_upcoming_url_is_scheduled_not_queued(mp_main, tmp_path):
+    store = mp_main.SeenStore(str(tmp_path / "seen.db"))
+    queues = {"vod": None, "live": None, "enrich": None, "results": {}}    # 入队会直接报错
+    mp_main._dispatch_new(store, queues, "pu", "预约", "up1", "https://fake.test/watch?v=up1")
+    assert "up1" in mp_main._upcoming
+    assert store.job_status("up1") == "upcoming"
+    assert store.upcoming_jobs() == [("up1", "pu", "预约", "https://fake.test/watch?v=up1", START_AT)]
+    store.close()
+
+def test_failed_checks_stop_after_grace(monkeypatch):
+    monkeypatch.setattr(upcoming, "UPCOMING_LEAD_SEC", 10**9)     # 立即到点
+    s = UpcomingScheduler()
+    s.add("old", "pu", "t", "u", time.time() - upcoming.UPCOMING_GRACE_SEC - 1)
+    dropped = []
+
+    def _boom(url):
+        raise RuntimeError("private video")
+
+    s.run_due(_boom, lambda i, live: None, dropped.append)
+    assert [i.vid for i in dropped] == ["old"]
+    assert len(s) == 0
+    assert s.next_wakeup() == float("inf")
+
+def test_failed_checks_give_up_without_start_time(monkeypatch):
+    s = UpcomingScheduler()
+    item = s.add("x", "pu", "t", "u", None)
+    dropped = []
+    for _ in range(upcoming.UPCOMING_MAX_FAILS):
+        item.due = 0.0
+        s._push(item, 0.0)
+        s.run_due(lambda url: 1 / 0, lambda i, live: None, dropped.append)
+    assert [i.vid for i in dropped] == ["x"]
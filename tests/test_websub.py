@@ -0,0 +1,133 @@
+import hmac, socket, hashlib, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode
+
+import pytest
+import requests
+
+from websub import WebSubSubscriber, topic_for
+
+UC = "UCxxxxxxxxxxxxxxxxxxxxxx"
+
+_FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">
+  <link rel="self" href="{topic}"/>
+  <entry>
+    <yt:videoId>{vid}</yt:videoId>
+    <yt:channelId>{uc}</yt:channelId>
+    <title>{title}</title>
+    <published>{published}</published>
+    <updated>{updated}</updated>
+  </entry>
+</feed>"""
+
+def _feed(vid, published, updated, title="标题"):
+    return _FEED.format(topic=topic_for(UC), vid=vid, uc=UC, title=title,
+                        published=published, updated=updated).encode()
+
+class _FakeHub:
+    """本地假 hub：收到订阅请求回 202，再异步到回调地址做 GET 确认（与真 hub 流程一致）。"""
+
+    def __init__(self):
+        self.requests = []
+        self.verified = threading.Event()
+        hub = self
+
+        class _H(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                pass
+
+            def do_POST(self):
+                n = int(self.headers.get("Content-Length") or 0)
+                form = {k: v[0] for k, v in parse_qs(self.rfile.read(n).decode()).items()}
+                hub.requests.append(form)
+                self.send_response(202)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                threading.Thread(target=hub._verify, args=(form,), daemon=True).start()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _H)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/subscribe"
+
+    def _verify(self, form):
+        q = {"hub.mode": form["hub.mode"], "hub.topic": form["hub.topic"],
+             "hub.challenge": "c-123", "hub.lease_seconds": "600"}
+        r = requests.get(form["hub.callback"] + "?" + urlencode(q), timeout=5)
+        if r.status_code == 200 and r.text == "c-123":
+            self.verified.set()
+
+    def notify(self, body: bytes, secret: str):
+        sig = "sha1=" + hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+        cb = self.requests[-1]["hub.callback"]
+        return requests.post(cb, data=body, timeout=5,
+                             headers={"X-Hub-Signature": sig, "Link": f'<{topic_for(UC)}>; rel="self"'})
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@pytest.fixture
+def hub_and_sub():
+    hub = _FakeHub()
+    got = []
+    notified = threading.Event()
+
+    def _on_notify(uc, entries):
+        got.append((uc, entries))
+        notified.set()
+
+    port = _free_port()
+    sub = WebSubSubscriber([UC], _on_notify, hub=hub.url, callback_url=f"http://127.0.0.1:{port}/websub",
+                           listen=("127.0.0.1", port), secret="s3cret")
+    sub.start()
+    yield hub, sub, got, notified
+    sub.close()
+    hub.close()
+
+def test_subscribe_is_verified(hub_and_sub):
+    hub, sub, _, _ = hub_and_sub
+    assert hub.verified.wait(5)
+    form = hub.requests[0]
+    assert form["hub.mode"] == "subscribe"
+    assert form["hub.topic"] == topic_for(UC)
+    assert form["hub.secret"] == "s3cret"
+    assert sub._expires[topic_for(UC)] > 0
+
+def test_signed_notify_is_dispatched(hub_and_sub):
+    hub, _, got, notified = hub_and_sub
+    assert hub.verified.wait(5)
+    r = hub.notify(_feed("NEWvid", "2025-07-01T10:00:00+00:00", "2025-07-01T10:00:05.123456789+00:00"), "s3cret")
+    assert r.status_code == 204
+    assert notified.wait(5)
+    assert got == [(UC, [("标题", "NEWvid")])]
+
+def test_bad_signature_is_ignored(hub_and_sub):
+    hub, _, got, notified = hub_and_sub
+    assert hub.verified.wait(5)
+    r = hub.notify(_feed("NEWvid", "2025-07-01T10:00:00+00:00", "2025-07-01T10:00:05+00:00"), "wrong")
+    assert r.status_code == 204            # 规范要求仍回 2xx
+    assert not notified.wait(0.5)
+    assert got == []
+
+def test_edit_of_old_video_is_ignored(hub_and_sub):
+    hub, _, got, notified = hub_and_sub
+    assert hub.verified.wait(5)
+    hub.notify(_feed("OLDvid", "2019-01-01T00:00:00+00:00", "2025-07-01T10:00:00+00:00"), "s3cret")
+    assert not notified.wait(0.5)
+    assert got == []
+
+def test_renewal_follows_granted_lease():
+    sub = WebSubSubscriber([UC], lambda uc, entries: None, hub="http://127.0.0.1:9/", callback_url="http://x/",
+                           lease_sec=5 * 86400, secret="s")
+    topic = topic_for(UC)
+    assert sub._renew_due(topic, 0)                 # 未确认
+    sub.confirmed(topic, 600)                       # hub 只给了 10 分钟
+    t0 = sub._expires[topic] - 600
+    assert not sub._renew_due(topic, t0 + 60)
+    assert sub._renew_due(topic, t0 + 500)          # 过了 80%
@@ -0,0 +1,27 @@
+from ydl_pool import YdlPool, _opts_key
+
+def _job_opts(vid, hook):
+    return {"quiet": True, "format": "bv*+ba/best", "outtmpl": f"downloads/jobs/{vid}/%(id)s.%(ext)s",
+            "ratelimit": 1000 + len(vid), "progress_hooks": [hook]}
+
+def test_per_job_options_do_not_split_the_pool():
+    a, b = _job_opts("aaa", lambda d: None), _job_opts("bbbbb", lambda d: None)
+    assert _opts_key(a) == _opts_key(b)
+    assert _opts_key(a) != _opts_key(dict(a, format="best"))
+
+def test_leased_instance_is_reused_with_this_jobs_options():
+    pool = YdlPool()
+    hook_a, hook_b = (lambda d: None), (lambda d: None)
+    with pool.lease(_job_opts("aaa", hook_a)) as y1:
+        assert y1.params["outtmpl"]["default"].startswith("downloads/jobs/aaa/")
+        assert y1._progress_hooks == [hook_a]
+    with pool.lease(_job_opts("bbbbb", hook_b)) as y2:
+        assert y2 is y1
+        assert y2.params["outtmpl"]["default"].startswith("downloads/jobs/bbbbb/")
+        assert y2.params["ratelimit"] == 1005
+        assert y2._progress_hooks == [hook_b]
+    with pool.lease({"quiet": True, "format": "bv*+ba/best"}) as y3:
+        assert y3 is y1
+        assert "ratelimit" not in y3.params
+        assert y3._progress_hooks == []
+    pool.close()
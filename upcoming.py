@@ -0,0 +1,154 @@
+# upcoming.py
+# 预约直播 / 首映调度：按计划开播时间（release_timestamp）放进最小堆，
+# 平时完全不碰；到开播前 UPCOMING_LEAD_SEC 才开始查，只在开播窗口内退避轮询，一开播就交给直播队列。
+# 计划持久化在 SeenStore 的 upcoming 表，重启后接着等。
+
+import os, time, heapq, threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+# -------- 可调参数 --------
+UPCOMING_LEAD_SEC  = int(os.getenv("UPCOMING_LEAD_SEC", "60"))      # 计划开播前多久开始查
+UPCOMING_POLL_MIN  = 15.0       # 开播窗口内的首个查询间隔（秒）
+UPCOMING_POLL_MAX  = 120.0      # 退避上限
+UPCOMING_BACKOFF   = 1.5
+UPCOMING_GRACE_SEC = int(os.getenv("UPCOMING_GRACE_SEC", str(2 * 3600)))   # 过了计划时间仍未开播，最多再等多久
+UPCOMING_NO_TIME   = 1800       # 拿不到计划时间时的复查间隔
+UPCOMING_MAX_FAILS = 20         # 连续查询失败这么多次就放弃（视频被删 / 设为私享等）
+# -------------------------
+
+class UpcomingItem:
+    __slots__ = ("vid", "channel", "title", "url", "start_at", "interval", "due", "fails")
+
+    def __init__(self, vid: str, channel: str, title: str, url: str, start_at: Optional[float]):
+        self.vid = vid
+        self.channel = channel
+        self.title = title
+        self.url = url
+        self.start_at = start_at
+        self.interval = UPCOMING_POLL_MIN
+        self.due = 0.0
+        self.fails = 0
+
+class UpcomingScheduler:
+    """
+    - add(...)：登记 / 更新一场预约（计划时间变了就按新时间重排，退避清零）
+    - pop_due()：到点需要查询的条目
+    - outcome(item, live_status, start_at)：查询结果回报，返回 "live" / "vod" / "moved" / "wait" / "drop"
+    - next_wakeup()：距下一次需要查询的秒数
+    轮询线程与 WebSub 回调线程都会调用，内部加锁。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: Dict[str, UpcomingItem] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = 0
+
+    def _push(self, item: UpcomingItem, at: float):
+        self._seq += 1
+        item.due = at
+        heapq.heappush(self._heap, (at, self._seq, item.vid))
+
+    @staticmethod
+    def _first_check(item: UpcomingItem, now: float) -> float:
+        if item.start_at is None:
+            return now + UPCOMING_NO_TIME
+        return max(now, item.start_at - UPCOMING_LEAD_SEC)
+
+    def add(self, vid: str, channel: str, title: str, url: str, start_at: Optional[float]) -> UpcomingItem:
+        now = time.time()
+        with self._lock:
+            item = self._items.get(vid)
+            if item is None:
+                item = self._items[vid] = UpcomingItem(vid, channel, title, url, start_at)
+            else:
+                item.start_at, item.interval = start_at, UPCOMING_POLL_MIN
+            # 旧的堆条目留着，弹出时与 item.due 对不上的直接丢弃
+            self._push(item, self._first_check(item, now))
+            return item
+
+    def __contains__(self, vid: str) -> bool:
+        return vid in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def pop_due(self) -> List[UpcomingItem]:
+        now = time.time()
+        out = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                at, _, vid = heapq.heappop(self._heap)
+                item = self._items.get(vid)
+                if item is not None and item.due == at:
+                    item.due = float("inf")
+                    out.append(item)
+        return out
+
+    def outcome(self, item: UpcomingItem, live_status: Optional[str], start_at: Optional[float]) -> str:
+        now = time.time()
+        with self._lock:
+            item.fails = 0
+            if live_status in ("is_live", "post_live", "was_live", "not_live") or live_status is None:
+                self._items.pop(item.vid, None)
+                return "live" if live_status == "is_live" else "vod"
+            # 仍是 is_upcoming
+            if start_at and (item.start_at is None or abs(start_at - item.start_at) > 60):
+                # 改期：按新时间重新等，退避清零
+                item.start_at, item.interval = start_at, UPCOMING_POLL_MIN
+                self._push(item, self._first_check(item, now))
+                return "moved"
+            if item.start_at is not None and now > item.start_at + UPCOMING_GRACE_SEC:
+                self._items.pop(item.vid, None)
+                return "drop"
+            if item.start_at is None or now < item.start_at - UPCOMING_LEAD_SEC:
+                self._push(item, self._first_check(item, now))
+            else:
+                self._push(item, now + item.interval)
+                item.interval = min(UPCOMING_POLL_MAX, item.interval * UPCOMING_BACKOFF)
+            return "wait"
+
+    def retry(self, item: UpcomingItem) -> bool:
+        """查询失败：按当前退避间隔再查；已过宽限期或连续失败太多则移除并返回 False（不会无限重查）。"""
+        now = time.time()
+        with self._lock:
+            item.fails += 1
+            if item.fails >= UPCOMING_MAX_FAILS or (
+                    item.start_at is not None and now > item.start_at + UPCOMING_GRACE_SEC):
+                self._items.pop(item.vid, None)
+                return False
+            self._push(item, now + item.interval)
+            item.interval = min(UPCOMING_POLL_MAX, item.interval * UPCOMING_BACKOFF)
+            return True
+
+    def next_wakeup(self) -> float:
+        with self._lock:
+            while self._heap and self._heap[0][0] != getattr(self._items.get(self._heap[0][2]), "due", None):
+                heapq.heappop(self._heap)
+            if not self._heap:
+                return float("inf")
+            return max(0.0, self._heap[0][0] - time.time())
+
+    def run_due(self, check: Callable[[str], Tuple[Optional[str], Optional[float]]],
+                on_start: Callable[[UpcomingItem, bool], None],
+                on_drop: Callable[[UpcomingItem], None],
+                on_moved: Optional[Callable[[UpcomingItem], None]] = None):
+        """
+        查询所有到点条目：check(url) -> (live_status, start_at)；
+        开播（或已变成普通视频）时 on_start(item, is_live)，超时未开播 on_drop(item)，改期 on_moved(item)。
+        """
+        for item in self.pop_due():
+            try:
+                status, start_at = check(item.url)
+            except Exception as e:
+                print(f"[预约] 查询 {item.vid} 失败：{e}")
+                if not self.retry(item):
+                    on_drop(item)
+                continue
+            res = self.outcome(item, status, start_at)
+            if res in ("live", "vod"):
+                on_start(item, res == "live")
+            elif res == "drop":
+                on_drop(item)
+            elif res == "moved" and on_moved is not None:
+                on_moved(item)
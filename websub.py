@@ -0,0 +1,213 @@
+# websub.py
+# WebSub（PubSubHubbub）推送接入：向 hub 订阅各频道的 Atom feed，内置一个小型 HTTP 回调服务，
+# 收到通知即解析 yt:videoId 交给上层入队；轮询退化为低频兜底。
+# hub 对旧视频改标题 / 简介也会推送：published 远早于 updated 的条目视为编辑，不当新视频。
+# hub / 回调地址均可配置，可对着本地假 hub 测试（见 WEBSUB_HUB）。
+
+import os, hmac, time, hashlib, secrets, threading
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import requests
+
+from rss_feed import FEED_URL_TMPL, parse_feed_times
+
+# -------- 可调参数 --------
+WEBSUB_ENABLED       = os.getenv("WEBSUB_ENABLED", "0") == "1"
+WEBSUB_HUB           = os.getenv("WEBSUB_HUB", "https://pubsubhubbub.appspot.com/subscribe")
+WEBSUB_CALLBACK_URL  = os.getenv("WEBSUB_CALLBACK_URL", "")            # hub 能访问到的公网地址，如 https://example.com/websub
+WEBSUB_LISTEN_HOST   = os.getenv("WEBSUB_LISTEN_HOST", "0.0.0.0")
+WEBSUB_LISTEN_PORT   = int(os.getenv("WEBSUB_LISTEN_PORT", "8765"))
+WEBSUB_LEASE_SEC     = int(os.getenv("WEBSUB_LEASE_SEC", str(5 * 24 * 3600)))
+WEBSUB_SAFETY_POLL   = int(os.getenv("WEBSUB_SAFETY_POLL", "1800"))    # 启用推送后兜底轮询的最短间隔（秒）
+WEBSUB_RENEW_MARGIN  = 0.8                                             # 租期过 80% 即续订
+WEBSUB_EDIT_GAP_SEC  = int(os.getenv("WEBSUB_EDIT_GAP_SEC", "3600"))   # updated 比 published 晚这么多即视为旧视频的编辑
+# -------------------------
+
+# 通知回调：(uc_id, [(title, video_id), ...])，条目最新在前
+NotifyFn = Callable[[str, List[Tuple[str, str]]], None]
+
+def topic_for(uc_id: str) -> str:
+    return FEED_URL_TMPL.format(uc=uc_id)
+
+def _uc_from_topic(topic: str) -> str:
+    q = parse_qs(urlparse(topic).query)
+    return (q.get("channel_id") or [""])[0]
+
+def _make_handler(sub: "WebSubSubscriber"):
+    class _Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def _reply(self, code: int, body: bytes = b""):
+            self.send_response(code)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            # hub 的订阅确认：原样回显 hub.challenge
+            q = parse_qs(urlparse(self.path).query)
+            mode = (q.get("hub.mode") or [""])[0]
+            topic = (q.get("hub.topic") or [""])[0]
+            challenge = (q.get("hub.challenge") or [""])[0]
+            if not challenge or not sub.wants(topic, mode):
+                self._reply(404)
+                return
+            if mode == "subscribe":
+                lease = (q.get("hub.lease_seconds") or [""])[0]
+                sub.confirmed(topic, int(lease) if lease.isdigit() else sub.lease)
+            self._reply(200, challenge.encode())
+
+        def do_POST(self):
+            n = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(n) if n > 0 else b""
+            if not sub.verify_signature(body, self.headers.get("X-Hub-Signature", "")):
+                # 规范要求签名不符也回 2xx，但忽略内容
+                print("[WebSub] 签名校验失败，已忽略")
+                self._reply(204)
+                return
+            self._reply(204)
+            sub.dispatch(body, self.headers.get("Link", ""))
+
+    return _Handler
+
+class WebSubSubscriber:
+    """
+    - start()：启动回调服务 + 订阅全部频道 + 后台续订线程
+    - on_notify(uc_id, entries)：收到新条目时调用（在回调服务线程内执行）
+    """
+
+    def __init__(self, uc_ids: Iterable[str], on_notify: NotifyFn,
+                 hub: str = WEBSUB_HUB, callback_url: str = WEBSUB_CALLBACK_URL,
+                 listen: Tuple[str, int] = (WEBSUB_LISTEN_HOST, WEBSUB_LISTEN_PORT),
+                 lease_sec: int = WEBSUB_LEASE_SEC, secret: Optional[str] = None):
+        self._topics = {topic_for(uc) for uc in dict.fromkeys(uc_ids)}
+        self._on_notify = on_notify
+        self._hub = hub
+        self._callback = callback_url
+        self._listen = listen
+        self._lease = lease_sec
+        self._secret = secret if secret is not None else (os.getenv("WEBSUB_SECRET") or secrets.token_hex(16))
+        self._lock = threading.Lock()
+        self._expires: Dict[str, float] = {}
+        self._granted: Dict[str, int] = {}       # hub 实际给的租期（可能与申请的不同）
+        self._retry_at: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._session = requests.Session()
+        self._session.trust_env = False
+
+    # ---- 回调服务使用 ----
+    def wants(self, topic: str, mode: str) -> bool:
+        return topic in self._topics and mode in ("subscribe", "unsubscribe")
+
+    @property
+    def lease(self) -> int:
+        return self._lease
+
+    def confirmed(self, topic: str, lease_sec: int):
+        with self._lock:
+            self._expires[topic] = time.time() + lease_sec
+            self._granted[topic] = lease_sec
+        print(f"[WebSub] 订阅已确认：{_uc_from_topic(topic)}（租期 {lease_sec}s）")
+
+    def verify_signature(self, body: bytes, header: str) -> bool:
+        algo, _, digest = (header or "").partition("=")
+        if algo not in ("sha1", "sha256", "sha384", "sha512") or not digest:
+            return False
+        mac = hmac.new(self._secret.encode(), body, getattr(hashlib, algo)).hexdigest()
+        return hmac.compare_digest(mac, digest)
+
+    def dispatch(self, body: bytes, link_header: str = ""):
+        try:
+            parsed = parse_feed_times(body)
+        except ET.ParseError as e:
+            print(f"[WebSub] 通知解析失败：{e}")
+            return
+        if not parsed:
+            return      # 删除通知（at:deleted-entry）等，没有 videoId
+        entries = []
+        for title, vid, published, updated in parsed:
+            if published is not None and updated is not None and updated - published > WEBSUB_EDIT_GAP_SEC:
+                print(f"[WebSub] 忽略旧视频的更新通知：{vid}（{title}）")
+                continue
+            entries.append((title, vid))
+        if not entries:
+            return
+        uc = ""
+        for part in (link_header or "").split(","):
+            if 'rel="self"' in part and "<" in part:
+                uc = _uc_from_topic(part[part.index("<") + 1:part.index(">")])
+        if not uc:
+            root = ET.fromstring(body)
+            ch = root.find(".//{http://www.youtube.com/xml/schemas/2015}channelId")
+            uc = (ch.text or "").strip() if ch is not None else ""
+        try:
+            self._on_notify(uc, entries)
+        except Exception as e:
+            print(f"[WebSub] 处理通知异常：{e}")
+
+    # ---- 订阅 ----
+    def subscribe(self, topic: str, mode: str = "subscribe") -> bool:
+        data = {
+            "hub.mode": mode,
+            "hub.topic": topic,
+            "hub.callback": self._callback,
+            "hub.verify": "async",
+            "hub.lease_seconds": str(self._lease),
+            "hub.secret": self._secret,
+        }
+        try:
+            r = self._session.post(self._hub, data=data, timeout=15)
+            if r.status_code in (202, 204):
+                return True
+            print(f"[WebSub] {mode} 被拒（{r.status_code}）：{_uc_from_topic(topic)} {r.text[:200]}")
+        except requests.RequestException as e:
+            print(f"[WebSub] {mode} 请求失败：{e}")
+        return False
+
+    def _renew_due(self, topic: str, now: float) -> bool:
+        """未确认 / hub 实际给的租期已过 80%：该 (重新) 订阅；提交后 10 分钟内等待 hub 确认，不重复提交。"""
+        with self._lock:
+            exp = self._expires.get(topic)
+            granted = self._granted.get(topic, self._lease)
+            retry_at = self._retry_at.get(topic, 0.0)
+        if now < retry_at:
+            return False
+        return exp is None or now > exp - granted * (1 - WEBSUB_RENEW_MARGIN)
+
+    def _renew_loop(self):
+        while not self._stop.is_set():
+            now = time.time()
+            for topic in sorted(self._topics):
+                if self._renew_due(topic, now):
+                    self.subscribe(topic)
+                    with self._lock:
+                        self._retry_at[topic] = now + 600
+                if self._stop.is_set():
+                    return
+            self._stop.wait(60)
+
+    def start(self):
+        if not self._callback:
+            raise ValueError("WEBSUB_CALLBACK_URL 未设置，hub 无法回调")
+        self._server = ThreadingHTTPServer(self._listen, _make_handler(self))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="websub-http", daemon=True).start()
+        threading.Thread(target=self._renew_loop, name="websub-renew", daemon=True).start()
+        host, port = self._server.server_address[:2]
+        print(f"[WebSub] 回调服务 {host}:{port}，订阅 {len(self._topics)} 个频道 → {self._hub}")
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1] if self._server else 0
+
+    def close(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        self._session.close()
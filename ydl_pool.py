@@ -0,0 +1,129 @@
+# ydl_pool.py
+# 进程内 YoutubeDL 实例池：按选项分组复用长寿命实例（提取器 / cookies / HTTP 连接都保留），
+# 每次调用 lease() 独占借出，用完归还；避免每次探测 / 下载都重建实例、重新握手。
+
+import os, json, time, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+import yt_dlp
+
+# -------- 可调参数 --------
+YDL_POOL_MAX      = int(os.getenv("YDL_POOL_MAX", "24"))        # 本进程最多保留的空闲实例数
+YDL_POOL_PER_KEY  = int(os.getenv("YDL_POOL_PER_KEY", "8"))     # 同一组选项最多保留的空闲实例数
+YDL_POOL_TTL_SEC  = int(os.getenv("YDL_POOL_TTL_SEC", "1800"))  # 实例最长寿命（让 cookies 刷新能生效）
+# -------------------------
+
+# 按任务变化的选项（输出路径、限速份额、进度回调、从头录直播）：不参与分组，借出时直接写到实例上。
+# 否则每个任务的键都不同，探测 / 下载实例永远复用不上，只会在池里堆积空闲实例
+_PER_LEASE = ("outtmpl", "progress_hooks", "ratelimit", "throttledratelimit", "live_from_start")
+
+def _opts_key(opts: Dict[str, Any]) -> str:
+    # 回调 / cookies 对象等不可序列化的值按对象身份区分（repr 带地址）
+    stable = {k: v for k, v in opts.items() if k not in _PER_LEASE}
+    return json.dumps(stable, sort_keys=True, default=repr)
+
+def _apply_per_lease(ydl: yt_dlp.YoutubeDL, opts: Dict[str, Any]):
+    """把本次调用的按任务选项写到实例上（上一个借用者留下的一并清掉）。"""
+    for k in _PER_LEASE:
+        if k == "progress_hooks":
+            continue
+        if k in opts:
+            ydl.params[k] = opts[k]
+        else:
+            ydl.params.pop(k, None)
+    # YoutubeDL 在构造时把 progress_hooks 登记到 _progress_hooks，下载时从那里取
+    ydl._progress_hooks = list(opts.get("progress_hooks") or [])
+    ydl._parse_outtmpl()        # 字符串 outtmpl 规范成 {"default": ...}，缺省时补默认模板
+
+class YdlPool:
+    def __init__(self, max_idle: int = YDL_POOL_MAX, per_key: int = YDL_POOL_PER_KEY,
+                 ttl_sec: int = YDL_POOL_TTL_SEC):
+        self._max_idle = max_idle
+        self._per_key = per_key
+        self._ttl = ttl_sec
+        self._lock = threading.Lock()
+        # key -> [(created_at, ydl), ...]；OrderedDict 维持 LRU 顺序
+        self._idle: "OrderedDict[str, List[Tuple[float, yt_dlp.YoutubeDL]]]" = OrderedDict()
+        self._n_idle = 0
+
+    def _take(self, key: str):
+        now = time.time()
+        expired = []
+        got = None
+        with self._lock:
+            items = self._idle.get(key) or []
+            while items:
+                created, ydl = items.pop()
+                self._n_idle -= 1
+                if now - created <= self._ttl:
+                    got = (created, ydl)
+                    break
+                expired.append(ydl)
+            if key in self._idle:
+                if items:
+                    self._idle.move_to_end(key)
+                else:
+                    del self._idle[key]
+        for ydl in expired:
+            _close_quietly(ydl)
+        return got
+
+    def _give_back(self, key: str, created: float, ydl: yt_dlp.YoutubeDL):
+        evicted = []
+        with self._lock:
+            items = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if len(items) >= self._per_key:
+                evicted.append(ydl)
+            else:
+                items.append((created, ydl))
+                self._n_idle += 1
+            # 超出总量：从最久未用的分组里淘汰
+            while self._n_idle > self._max_idle and self._idle:
+                old_key, old_items = next(iter(self._idle.items()))
+                evicted.append(old_items.pop(0)[1])
+                self._n_idle -= 1
+                if not old_items:
+                    del self._idle[old_key]
+        for y in evicted:
+            _close_quietly(y)
+
+    @contextmanager
+    def lease(self, opts: Dict[str, Any]) -> Iterator[yt_dlp.YoutubeDL]:
+        """借出一个与 opts 对应的实例；调用中抛异常则丢弃该实例，不放回池中。"""
+        key = _opts_key(opts)
+        got = self._take(key)
+        if got is None:
+            # YoutubeDL 会往传入的 dict 里补默认值，传副本以免调用方的选项（及分组键）被改
+            got = (time.time(), yt_dlp.YoutubeDL(dict(opts)))
+        created, ydl = got
+        _apply_per_lease(ydl, opts)
+        try:
+            yield ydl
+        except BaseException:
+            _close_quietly(ydl)
+            raise
+        else:
+            _apply_per_lease(ydl, {})     # 不让空闲实例继续持有上个任务的回调与路径
+            self._give_back(key, created, ydl)
+
+    def close(self):
+        with self._lock:
+            all_items = [y for items in self._idle.values() for _, y in items]
+            self._idle.clear()
+            self._n_idle = 0
+        for y in all_items:
+            _close_quietly(y)
+
+def _close_quietly(ydl: yt_dlp.YoutubeDL):
+    try:
+        ydl.close()
+    except Exception:
+        pass
+
+_pool = YdlPool()
+
+def lease(opts: Dict[str, Any]):
+    """本进程共享池：with lease(opts) as ydl: ydl.extract_info(...)"""
+    return _pool.lease(opts)